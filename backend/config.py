@@ -8,6 +8,12 @@ env_path = Path(__file__).resolve().parent.parent / ".env"
 load_dotenv(env_path)
 
 
+def _env_or_none(name: str, cast=int):
+    """Optional override: None when the variable is unset or empty."""
+    value = os.getenv(name, "")
+    return cast(value) if value else None
+
+
 class Settings:
     PROJECT_NAME: str = "CareFlow AI"
     VERSION: str = "0.1.0"
@@ -19,6 +25,34 @@ class Settings:
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
     CLAUDE_MODEL: str = os.getenv("CLAUDE_MODEL", "claude-sonnet-4-20250514")
     CLAUDE_MAX_TOKENS: int = int(os.getenv("CLAUDE_MAX_TOKENS", "4096"))
+    CLAUDE_PROMPT_CACHING: bool = os.getenv("CLAUDE_PROMPT_CACHING", "true").lower() == "true"
+
+    # Response cache for deterministic LLM calls (triage, codes, SOAP)
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_TTL_SECONDS: int = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+    LLM_CACHE_DISK_PATH: str = os.getenv("LLM_CACHE_DISK_PATH", "")  # SQLite file; empty = memory only
+
+    # LLM scheduler: concurrent calls, provider budgets (0 = unlimited) and
+    # retries of 429/503/529 responses with jittered exponential backoff
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_REQUESTS_PER_MINUTE: int = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+    LLM_TOKENS_PER_MINUTE: int = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "4"))
+    LLM_RETRY_BASE_SECONDS: float = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1.0"))
+    LLM_RETRY_MAX_SECONDS: float = float(os.getenv("LLM_RETRY_MAX_SECONDS", "60"))
+
+    # Ask the provider for schema-constrained SOAP notes (tool use / JSON mode)
+    STRUCTURED_SOAP_OUTPUT: bool = os.getenv("STRUCTURED_SOAP_OUTPUT", "true").lower() == "true"
+
+    # Code index files: "CODE DESCRIPTION" per line, sorted, codes without dots
+    # (CMS icd10cm_codes_<year>.txt layout). The bundled ICD-10-CM file covers
+    # common primary-care codes; point this at the CMS release for the full set.
+    ICD10_INDEX_PATH: str = os.getenv(
+        "ICD10_INDEX_PATH",
+        str(Path(__file__).resolve().parent / "modules" / "ambient_doc" / "data" / "icd10cm_codes.txt"),
+    )
+    CPT_INDEX_PATH: str = os.getenv("CPT_INDEX_PATH", "")  # CPT is AMA-licensed; none is bundled
 
     # Groq API
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
@@ -28,6 +62,25 @@ class Settings:
     WHISPER_MODEL_SIZE: str = os.getenv("WHISPER_MODEL_SIZE", "base")
     WHISPER_DEVICE: str = os.getenv("WHISPER_DEVICE", "cpu")
     WHISPER_COMPUTE_TYPE: str = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+    WHISPER_PRELOAD: bool = os.getenv("WHISPER_PRELOAD", "true").lower() == "true"
+    WHISPER_WARMUP: bool = os.getenv("WHISPER_WARMUP", "true").lower() == "true"
+    # Concurrent transcriptions, and CPU threads each one may use
+    TRANSCRIBE_WORKERS: int = int(os.getenv("TRANSCRIBE_WORKERS", str(max(1, (os.cpu_count() or 1) // 4))))
+    WHISPER_CPU_THREADS: int = int(os.getenv("WHISPER_CPU_THREADS", str(max(1, (os.cpu_count() or 1) // TRANSCRIBE_WORKERS))))
+    TRANSCRIBE_MAX_QUEUE: int = int(os.getenv("TRANSCRIBE_MAX_QUEUE", "4"))  # waiting calls before 503
+    # Long recordings are split at silences into chunks of about this length (0 = single pass)
+    TRANSCRIBE_CHUNK_SECONDS: float = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "120"))
+    # Transcription profiles: fast / balanced (WHISPER_MODEL_SIZE) / accurate
+    WHISPER_FAST_MODEL: str = os.getenv("WHISPER_FAST_MODEL", "tiny")
+    WHISPER_ACCURATE_MODEL: str = os.getenv("WHISPER_ACCURATE_MODEL", "large-v3")
+    WHISPER_MODEL_MEMORY_MB: int = int(os.getenv("WHISPER_MODEL_MEMORY_MB", "4096"))  # resident models
+    TRANSCRIPTION_DEFAULT_PROFILE: str = os.getenv("TRANSCRIPTION_DEFAULT_PROFILE", "balanced")
+    # Label transcript segments clinician/patient unless the request says otherwise
+    DIARIZATION_ENABLED: bool = os.getenv("DIARIZATION_ENABLED", "false").lower() == "true"
+    # "hospital_id:profile,hospital_id:profile"
+    TRANSCRIPTION_HOSPITAL_PROFILES: dict = dict(
+        pair.split(":", 1) for pair in os.getenv("TRANSCRIPTION_HOSPITAL_PROFILES", "").split(",") if ":" in pair
+    )
 
     # Database
     _raw_db_url: str = os.getenv(
@@ -37,10 +90,65 @@ class Settings:
     # Render/Heroku use postgres:// but SQLAlchemy requires postgresql://
     DATABASE_URL: str = _raw_db_url.replace("postgres://", "postgresql://", 1) if _raw_db_url.startswith("postgres://") else _raw_db_url
 
+    # Connection pools (per engine, per worker process). DB_PROFILE picks the
+    # defaults in database/db.py: "local" (SQLite in WAL mode) or "server"
+    # (PostgreSQL: recycled connections instead of a ping per checkout).
+    # Each DB_POOL_* variable overrides its profile value.
+    DB_PROFILE: str = os.getenv("DB_PROFILE", "local" if DATABASE_URL.startswith("sqlite") else "server")
+    DB_POOL_SIZE: int | None = _env_or_none("DB_POOL_SIZE")
+    DB_MAX_OVERFLOW: int | None = _env_or_none("DB_MAX_OVERFLOW")
+    DB_POOL_TIMEOUT: float | None = _env_or_none("DB_POOL_TIMEOUT", float)  # seconds waiting for a connection
+    DB_POOL_RECYCLE: int | None = _env_or_none("DB_POOL_RECYCLE")  # max connection age in seconds, -1 = never
+    DB_POOL_PRE_PING: bool | None = _env_or_none("DB_POOL_PRE_PING", lambda v: v.lower() == "true")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+    # Conversation sessions ("memory" per-process LRU, or "database" shared across workers)
+    SESSION_STORE_BACKEND: str = os.getenv("SESSION_STORE_BACKEND", "memory")
+    SESSION_MAX_ENTRIES: int = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+    SESSION_TTL_SECONDS: int = int(os.getenv("SESSION_TTL_SECONDS", "7200"))
+
+    # Opt-in write-behind for nurse chat messages and triage records: rows are
+    # buffered and group-committed every FLUSH_MS or MAX_ROWS rows, so replies
+    # don't wait on a commit. Drained at shutdown; a crash loses the last interval.
+    # Past MAX_PENDING buffered rows (e.g. database down) turns are written directly,
+    # as are escalations. Needs SESSION_STORE_BACKEND=memory (checked at startup).
+    CHAT_WRITE_BEHIND: bool = os.getenv("CHAT_WRITE_BEHIND", "false").lower() == "true"
+    CHAT_WRITE_BEHIND_FLUSH_MS: int = int(os.getenv("CHAT_WRITE_BEHIND_FLUSH_MS", "200"))
+    CHAT_WRITE_BEHIND_MAX_ROWS: int = int(os.getenv("CHAT_WRITE_BEHIND_MAX_ROWS", "500"))
+    CHAT_WRITE_BEHIND_MAX_PENDING: int = int(os.getenv("CHAT_WRITE_BEHIND_MAX_PENDING", "10000"))
+
+    # Chat history token budgets per flow (older turns are summarized)
+    CHAT_HISTORY_TOKEN_BUDGET: int = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "3000"))
+    INTAKE_HISTORY_TOKEN_BUDGET: int = int(os.getenv("INTAKE_HISTORY_TOKEN_BUDGET", "4000"))
+    FOLLOWUP_HISTORY_TOKEN_BUDGET: int = int(os.getenv("FOLLOWUP_HISTORY_TOKEN_BUDGET", "3000"))
+    HISTORY_SUMMARY_TOKEN_BUDGET: int = int(os.getenv("HISTORY_SUMMARY_TOKEN_BUDGET", "500"))
+
+    # Background jobs (audio pipeline)
+    JOB_QUEUE_BACKEND: str = os.getenv("JOB_QUEUE_BACKEND", "inprocess")
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_STALE_SECONDS: int = int(os.getenv("JOB_STALE_SECONDS", "1800"))
+    # How often /jobs/{id}/events re-reads the job row (and sends a keep-alive)
+    JOB_EVENTS_POLL_SECONDS: float = float(os.getenv("JOB_EVENTS_POLL_SECONDS", "3"))
+
+    # Note backfill jobs: encounters per page/bulk insert and concurrent LLM calls
+    BACKFILL_PAGE_SIZE: int = int(os.getenv("BACKFILL_PAGE_SIZE", "50"))
+    BACKFILL_CONCURRENCY: int = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+
     # Audio
     UPLOAD_DIR: Path = Path(__file__).resolve().parent / "uploads"
     MAX_AUDIO_SIZE_MB: int = 50
 
+    # Pre-processing: decoded uploads are cached by content hash; long pauses are shortened
+    AUDIO_TRIM_SILENCE: bool = os.getenv("AUDIO_TRIM_SILENCE", "true").lower() == "true"
+    AUDIO_MAX_PAUSE_SECONDS: float = float(os.getenv("AUDIO_MAX_PAUSE_SECONDS", "3.0"))
+    AUDIO_KEEP_PAUSE_SECONDS: float = float(os.getenv("AUDIO_KEEP_PAUSE_SECONDS", "1.0"))
+    AUDIO_CACHE_MB: int = int(os.getenv("AUDIO_CACHE_MB", "256"))
+
+    # Live transcription over WebSocket (sliding window, seconds)
+    STREAM_STEP_SECONDS: float = float(os.getenv("STREAM_STEP_SECONDS", "1.0"))
+    STREAM_WINDOW_SECONDS: float = float(os.getenv("STREAM_WINDOW_SECONDS", "20"))
+    STREAM_SILENCE_SECONDS: float = float(os.getenv("STREAM_SILENCE_SECONDS", "0.5"))
+
     # JWT Auth
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "change-me-in-production")
     JWT_EXPIRY_HOURS: int = int(os.getenv("JWT_EXPIRY_HOURS", "24"))
@@ -1,35 +1,177 @@
-"""Database connection and session management."""
+"""Database connection and session management.
 
-from sqlalchemy import create_engine
+Request handlers use the async engine (``get_db`` yields an ``AsyncSession``
+on aiosqlite or asyncpg). The sync engine remains for table creation,
+seeding and the background job workers.
+"""
+
+import asyncio
+import logging
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from config import settings
+from modules.shared.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Pool defaults per deployment. Pre-ping costs a round trip on every
+# checkout, so instead connections are recycled before a server or proxy
+# would drop them idle, and a connection that does die invalidates the
+# pool so only the request that hit it fails.
+ENGINE_PROFILES = {
+    # SQLite on local disk: connections never go stale
+    "local": {"pool_size": 5, "max_overflow": 10, "pool_timeout": 30, "pool_recycle": -1, "pool_pre_ping": False},
+    # PostgreSQL over the network (e.g. Render)
+    "server": {"pool_size": 10, "max_overflow": 5, "pool_timeout": 10, "pool_recycle": 1800, "pool_pre_ping": False},
+}
+
+
+class _MeteredPool:
+    """Counts checkouts, time spent waiting for a connection, and pool timeouts."""
+
+    def _do_get(self):
+        label = "async" if self._dialect.is_async else "sync"
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metrics.incr(f"db.pool.{label}.timeouts")
+            raise
+        finally:
+            metrics.incr(f"db.pool.{label}.checkouts")
+            metrics.incr(f"db.pool.{label}.wait_seconds", time.perf_counter() - started)
+
+
+class MeteredQueuePool(_MeteredPool, QueuePool):
+    pass
+
+
+class MeteredAsyncQueuePool(_MeteredPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def async_database_url(url: str) -> URL:
+    """The same database addressed through its asyncio driver.
+
+    ``sqlite://`` becomes ``sqlite+aiosqlite://`` and ``postgresql://``
+    becomes ``postgresql+asyncpg://``; asyncpg takes ``ssl`` where libpq
+    takes ``sslmode``, so that query parameter is renamed.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite")
+    if backend == "postgresql":
+        query = dict(parsed.query)
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        return parsed.set(drivername="postgresql+asyncpg", query=query)
+    return parsed
+
+
+def engine_options(url: str) -> dict:
+    """Pool arguments from ``DB_PROFILE`` with any ``DB_POOL_*`` overrides applied."""
+    if settings.DB_PROFILE not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{settings.DB_PROFILE}' (expected one of {', '.join(ENGINE_PROFILES)})")
+    if make_url(url).database in (None, "", ":memory:"):
+        return {}  # in-memory SQLite keeps its single-connection pool
+    options = dict(ENGINE_PROFILES[settings.DB_PROFILE])
+    overrides = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    options.update({name: value for name, value in overrides.items() if value is not None})
+    return options
 
-# SQLite needs check_same_thread=False; PostgreSQL does not
-connect_args = {}
-if settings.DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args=connect_args,
-    pool_pre_ping=True,  # verify connections are alive before using
-    echo=False,
-)
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")  # readers no longer block the writer
+    cursor.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints, safe with WAL
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def _on_error(context):
+    if context.is_disconnect:
+        metrics.incr("db.disconnects")
+        logger.warning("Database connection lost; invalidating pooled connections")
+
+
+def _instrument(sync_engine):
+    event.listen(sync_engine, "handle_error", _on_error)
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+
+
+def make_engine(url: str):
+    options = engine_options(url)
+    if options:
+        options["poolclass"] = MeteredQueuePool
+    # SQLite needs check_same_thread=False; PostgreSQL does not
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    sync_engine = create_engine(url, connect_args=connect_args, echo=False, **options)
+    _instrument(sync_engine)
+    return sync_engine
+
+
+def make_async_engine(url: str):
+    options = engine_options(url)
+    if options:
+        options["poolclass"] = MeteredAsyncQueuePool
+    new_engine = create_async_engine(async_database_url(url), echo=False, **options)
+    _instrument(new_engine.sync_engine)
+    return new_engine
+
+
+engine = make_engine(settings.DATABASE_URL)
+async_engine = make_async_engine(settings.DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Objects stay usable after commit; lazy refreshes would need an awaited load
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+
+def database_unreachable(error: BaseException) -> bool:
+    """Whether an error says the database could not be reached rather than the statement was bad.
+
+    Covers failed connects, dropped connections and an exhausted pool.
+    """
+    return isinstance(error, (OSError, asyncio.TimeoutError, OperationalError, InterfaceError, PoolTimeoutError)) or (
+        getattr(error, "connection_invalidated", False)
+    )
+
+
+def pool_status() -> dict[str, int]:
+    """Current pool occupancy for ``/api/metrics``."""
+    status = {}
+    for label, pool in (("async", async_engine.pool), ("sync", engine.pool)):
+        if isinstance(pool, QueuePool):
+            status[f"db.pool.{label}.size"] = pool.size()
+            status[f"db.pool.{label}.checked_out"] = pool.checkedout()
+            status[f"db.pool.{label}.overflow"] = max(pool.overflow(), 0)
+    return status
+
 
 class Base(DeclarativeBase):
     pass
 
 
-def get_db():
-    """FastAPI dependency that provides a database session."""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """FastAPI dependency that provides an async database session."""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 def init_db():
@@ -40,8 +182,10 @@ def init_db():
         Patient,
         Encounter,
         ClinicalNote,
+        NoteRevision,
         ChatSession,
         ChatMessageRecord,
         TriageRecord,
+        Job,
     )
     Base.metadata.create_all(bind=engine)
@@ -12,6 +12,7 @@ from sqlalchemy import (
     Boolean,
     ForeignKey,
     JSON,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import relationship
 from database.db import Base
@@ -45,7 +46,7 @@ class AdminUser(Base):
     username = Column(String, unique=True, nullable=False, index=True)
     hashed_password = Column(String, nullable=False)
     role = Column(String, default="hospital_admin")  # super_admin or hospital_admin
-    hospital_id = Column(String, ForeignKey("hospitals.id"), nullable=True)  # null for super_admin
+    hospital_id = Column(String, ForeignKey("hospitals.id"), nullable=True, index=True)  # null for super_admin
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -116,6 +117,31 @@ class ClinicalNote(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     encounter = relationship("Encounter", back_populates="notes")
+    revisions = relationship("NoteRevision", back_populates="note", order_by="NoteRevision.version.desc()")
+
+
+class NoteRevision(Base):
+    """A superseded version of a clinical note.
+
+    ``diff`` is a reverse line diff: applied to the next version's
+    ``raw_text`` it yields this version's. The note row itself always holds
+    the latest text.
+    """
+
+    __tablename__ = "note_revisions"
+    __table_args__ = (UniqueConstraint("note_id", "version"),)
+
+    id = Column(String, primary_key=True, default=gen_id)
+    note_id = Column(String, ForeignKey("clinical_notes.id"), nullable=False, index=True)
+    version = Column(Integer, nullable=False)
+    diff = Column(JSON, nullable=False)
+    status = Column(String)
+    provider_edited = Column(Boolean, default=False)
+    edited_by = Column(String)  # who replaced this version
+    created_at = Column(DateTime)  # when this version was written
+    superseded_at = Column(DateTime, default=datetime.utcnow)
+
+    note = relationship("ClinicalNote", back_populates="revisions")
 
 
 class ChatSession(Base):
@@ -164,3 +190,21 @@ class TriageRecord(Base):
     escalate_to_nurse = Column(Boolean, default=False)
     red_flags = Column(JSON, default=list)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True, default=gen_id)
+    job_type = Column(String, nullable=False)
+    hospital_id = Column(String, ForeignKey("hospitals.id"), nullable=True, index=True)
+    status = Column(String, default="queued", index=True)  # queued, running, completed, failed
+    stage = Column(String, nullable=True)
+    progress = Column(Float, default=0.0)
+    payload = Column(JSON, default=dict)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
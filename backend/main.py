@@ -1,17 +1,25 @@
 """CareFlow AI — FastAPI application entry point."""
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import settings
-from database.db import init_db, SessionLocal
-from modules.ambient_doc.router import router as ambient_router
+from database.db import init_db, get_db, AsyncSessionLocal, async_engine, database_unreachable, pool_status
+from modules.ambient_doc.router import router as ambient_router, ws_router as ambient_ws_router
 from modules.virtual_nurse.router import router as nurse_router
 from modules.auth.router import router as auth_router
 from modules.hospitals.router import router as hospitals_router
 from modules.auth.utils import get_current_user, get_hospital_id, hash_password
+from modules.ambient_doc.engine import engine as transcription_engine
+from modules.shared.jobs import job_queue
+from modules.virtual_nurse.persistence import chat_log
 
 logging.basicConfig(
     level=logging.INFO,
@@ -23,13 +31,12 @@ DEFAULT_ADMIN_USERNAME = "admin"
 DEFAULT_ADMIN_PASSWORD = "admin123"
 
 
-def _ensure_default_admin():
+async def _ensure_default_admin():
     """Create or upgrade the default admin user to super_admin."""
     from database.schemas import AdminUser
 
-    db = SessionLocal()
-    try:
-        existing = db.query(AdminUser).filter(AdminUser.username == DEFAULT_ADMIN_USERNAME).first()
+    async with AsyncSessionLocal() as db:
+        existing = await db.scalar(select(AdminUser).where(AdminUser.username == DEFAULT_ADMIN_USERNAME))
         if not existing:
             admin = AdminUser(
                 username=DEFAULT_ADMIN_USERNAME,
@@ -37,34 +44,43 @@ def _ensure_default_admin():
                 role="super_admin",
             )
             db.add(admin)
-            db.commit()
+            await db.commit()
             logger.info("Default super_admin user created (username: %s)", DEFAULT_ADMIN_USERNAME)
         elif existing.role != "super_admin":
             existing.role = "super_admin"
             existing.hospital_id = None
-            db.commit()
+            await db.commit()
             logger.info("Upgraded admin user '%s' to super_admin", DEFAULT_ADMIN_USERNAME)
         else:
             logger.info("Super admin user already exists")
-    finally:
-        db.close()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application startup and shutdown."""
+    if settings.CHAT_WRITE_BEHIND and settings.SESSION_STORE_BACKEND == "database":
+        # The database store rebuilds sessions from rows the log may not have written yet
+        raise RuntimeError("CHAT_WRITE_BEHIND requires SESSION_STORE_BACKEND=memory")
     logger.info("Starting CareFlow AI v%s", settings.VERSION)
     db_display = settings.DATABASE_URL.split("@")[-1] if "@" in settings.DATABASE_URL else settings.DATABASE_URL
     logger.info("Connecting to database: %s", db_display)
     init_db()
     logger.info("Database initialized successfully")
-    _ensure_default_admin()
+    await _ensure_default_admin()
 
     if not settings.ANTHROPIC_API_KEY:
         logger.warning("ANTHROPIC_API_KEY not set — Claude features will fail")
 
+    await transcription_engine.start()
+    await job_queue.start()
+    if settings.CHAT_WRITE_BEHIND:
+        await chat_log.start()
     yield
     logger.info("Shutting down CareFlow AI")
+    await chat_log.stop()
+    await job_queue.stop()
+    transcription_engine.shutdown()
+    await async_engine.dispose()
 
 
 app = FastAPI(
@@ -83,10 +99,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(SQLAlchemyError)
+async def database_unavailable_handler(request: Request, exc: SQLAlchemyError):
+    """A failed connect, dropped connection or exhausted pool is transient: ask the client to retry."""
+    if database_unreachable(exc):
+        logger.warning("Database unavailable for %s: %s", request.url.path, exc)
+        return JSONResponse(
+            {"detail": "Database temporarily unavailable, please retry"},
+            status_code=503,
+            headers={"Retry-After": "1"},
+        )
+    raise exc
+
+
 # Routers — auth is public, others are protected via their own dependencies
 app.include_router(auth_router)
 app.include_router(hospitals_router)
 app.include_router(ambient_router)
+app.include_router(ambient_ws_router)
 app.include_router(nurse_router)
 
 
@@ -108,39 +138,52 @@ async def health_check():
     }
 
 
+@app.get("/api/metrics")
+async def get_metrics(_user: dict = Depends(get_current_user)):
+    """Per-worker counters (LLM token usage, prompt-cache hits/misses), scheduler load and DB pools."""
+    from modules.shared.metrics import metrics
+    from modules.shared.llm_scheduler import llm_scheduler
+    return {
+        **metrics.snapshot(),
+        "llm.scheduler.queued": llm_scheduler.queued,
+        "llm.scheduler.in_flight": llm_scheduler.in_flight,
+        "chat_log.pending": chat_log.pending,
+        **pool_status(),
+    }
+
+
 @app.get("/api/patients")
-async def list_patients(current_user: dict = Depends(get_current_user)):
+async def list_patients(
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
     """List patients filtered by hospital_id for hospital admins."""
     from database.schemas import Patient
 
     hospital_id = get_hospital_id(current_user)
 
-    db = SessionLocal()
-    try:
-        query = db.query(Patient).order_by(Patient.last_name)
-        if hospital_id:
-            query = query.filter(Patient.hospital_id == hospital_id)
-        patients = query.all()
-        return [
-            {
-                "id": p.id,
-                "first_name": p.first_name,
-                "last_name": p.last_name,
-                "date_of_birth": p.date_of_birth,
-                "sex": p.sex,
-                "medical_history": p.medical_history,
-                "allergies": p.allergies,
-                "medications": p.medications,
-            }
-            for p in patients
-        ]
-    finally:
-        db.close()
+    query = select(Patient).order_by(Patient.last_name)
+    if hospital_id:
+        query = query.where(Patient.hospital_id == hospital_id)
+    patients = (await db.scalars(query)).all()
+    return [
+        {
+            "id": p.id,
+            "first_name": p.first_name,
+            "last_name": p.last_name,
+            "date_of_birth": p.date_of_birth,
+            "sex": p.sex,
+            "medical_history": p.medical_history,
+            "allergies": p.allergies,
+            "medications": p.medications,
+        }
+        for p in patients
+    ]
 
 
 @app.post("/api/seed")
 async def seed_data(_user: dict = Depends(get_current_user)):
     """Seed the database with sample data. Requires auth."""
     from database.seed_data import seed_database
-    seed_database()
+    await asyncio.to_thread(seed_database)  # bulk sync load, kept off the event loop
     return {"message": "Database seeded successfully"}
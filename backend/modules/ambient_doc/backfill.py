@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+"""Background regeneration of notes for stored encounter transcripts."""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from config import settings
+from database.db import SessionLocal
+from database.schemas import Encounter, ClinicalNote, Patient, gen_id
+from modules.ambient_doc.note_generator import generate_documentation
+from modules.shared.jobs import JobContext, job_queue
+from modules.shared.metrics import metrics
+from modules.shared.llm_scheduler import Priority, llm_context
+
+logger = logging.getLogger(__name__)
+
+NOTE_BACKFILL_JOB = "note_backfill"
+MAX_REPORTED_FAILURES = 50
+
+
+def _encounter_query(db, payload: dict, hospital_id: str | None):
+    """Encounters selected by the job payload, scoped to the job's hospital."""
+    query = db.query(Encounter).filter(Encounter.transcript.isnot(None), Encounter.transcript != "")
+    if hospital_id:
+        query = query.join(Patient, Encounter.patient_id == Patient.id).filter(
+            Patient.hospital_id == hospital_id
+        )
+    if payload.get("encounter_ids"):
+        query = query.filter(Encounter.id.in_(payload["encounter_ids"]))
+    if payload.get("encounter_type"):
+        query = query.filter(Encounter.encounter_type == payload["encounter_type"])
+    if payload.get("since"):
+        query = query.filter(Encounter.date >= datetime.fromisoformat(payload["since"]))
+    if payload.get("until"):
+        query = query.filter(Encounter.date < datetime.fromisoformat(payload["until"]))
+    return query
+
+
+def _fetch_page(payload: dict, hospital_id: str | None, after_id: str, size: int) -> list[tuple]:
+    db = SessionLocal()
+    try:
+        rows = (
+            _encounter_query(db, payload, hospital_id)
+            .filter(Encounter.id > after_id)
+            .order_by(Encounter.id)
+            .with_entities(Encounter.id, Encounter.encounter_type, Encounter.transcript)
+            .limit(size)
+            .all()
+        )
+    finally:
+        db.close()
+    return [tuple(r) for r in rows]
+
+
+async def iter_encounter_pages(payload: dict, hospital_id: str | None, page_size: int):
+    """Yield ``[(id, encounter_type, transcript)]`` pages in id order.
+
+    Pages are fetched by keyset (``id > last``) with a short-lived session
+    each, on a worker thread, so no read cursor stays open while notes are
+    written and only one page of transcripts is in memory at a time.
+    """
+    last_id = ""
+    remaining = payload.get("limit")
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        rows = await asyncio.to_thread(_fetch_page, payload, hospital_id, last_id, size)
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+def count_encounters(payload: dict, hospital_id: str | None) -> int:
+    db = SessionLocal()
+    try:
+        total = _encounter_query(db, payload, hospital_id).count()
+    finally:
+        db.close()
+    return min(total, payload["limit"]) if payload.get("limit") else total
+
+
+def save_notes(generated: list[tuple[str, object, object]]) -> int:
+    """Insert one new ``ClinicalNote`` per encounter in a single statement.
+
+    ``generated`` holds ``(encounter_id, note, codes)``. Each note is a new
+    row at edit version 1; the encounter's earlier notes are left as they
+    are, and the newest ``created_at`` is the current one.
+    """
+    if not generated:
+        return 0
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        db.execute(insert(ClinicalNote), [
+            {
+                "id": gen_id(),
+                "encounter_id": encounter_id,
+                "version": 1,
+                "note_type": "soap",
+                "subjective": note.subjective,
+                "objective": note.objective,
+                "assessment": note.assessment,
+                "plan": note.plan,
+                "raw_text": note.raw_text,
+                "icd10_codes": [c.model_dump() for c in codes.icd10_codes],
+                "cpt_codes": [c.model_dump() for c in codes.cpt_codes],
+                "status": "draft",
+                "ai_generated": True,
+                "provider_edited": False,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for encounter_id, note, codes in generated
+        ])
+        db.commit()
+    finally:
+        db.close()
+    return len(generated)
+
+
+async def _generate(transcript: str, encounter_type: str, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        return await generate_documentation(transcript, encounter_type)
+
+
+async def run_note_backfill(job: JobContext) -> dict:
+    """Regenerate notes (with codes) for stored encounters.
+
+    Payload keys, all optional: ``encounter_ids``, ``encounter_type``,
+    ``since``/``until`` (ISO dates), ``limit``, ``concurrency``. Each page
+    of encounters is generated with at most ``concurrency`` LLM calls in
+    flight and saved as new notes in one insert. Calls run at batch
+    priority, so the scheduler serves triage, chat and documentation first
+    and handles rate-limit retries. Failures are counted and reported, not
+    fatal.
+    """
+    payload = job.payload
+    concurrency = max(1, min(payload.get("concurrency") or settings.BACKFILL_CONCURRENCY, 32))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    total = await asyncio.to_thread(count_encounters, payload, job.hospital_id)
+    started = time.monotonic()
+    processed = created = 0
+    failures: list[dict] = []
+    await job.progress("generating", 0.0, total=total, processed=0, created=0, failed=0)
+
+    async for page in iter_encounter_pages(payload, job.hospital_id, settings.BACKFILL_PAGE_SIZE):
+        with llm_context(priority=Priority.BATCH):
+            results = await asyncio.gather(
+                *(_generate(transcript, encounter_type or "office_visit", semaphore)
+                  for _, encounter_type, transcript in page),
+                return_exceptions=True,
+            )
+        generated = []
+        for (encounter_id, _, _), result in zip(page, results):
+            if isinstance(result, BaseException):
+                logger.warning("Backfill failed for encounter %s: %s", encounter_id, result)
+                failures.append({"encounter_id": encounter_id, "error": str(result)})
+            else:
+                generated.append((encounter_id, *result))
+        created += await asyncio.to_thread(save_notes, generated)
+        processed += len(page)
+
+        elapsed = time.monotonic() - started
+        await job.progress(
+            "generating",
+            processed / total if total else 1.0,
+            total=total,
+            processed=processed,
+            created=created,
+            failed=len(failures),
+            notes_per_minute=round(created / elapsed * 60, 1) if elapsed else 0.0,
+        )
+
+    elapsed = time.monotonic() - started
+    metrics.incr("backfill.notes_created", created)
+    logger.info("Backfill job %s created %d notes in %.1fs (%d failed)", job.id, created, elapsed, len(failures))
+    return {
+        "total": total,
+        "processed": processed,
+        "created": created,
+        "failed": len(failures),
+        "failures": failures[:MAX_REPORTED_FAILURES],
+        "elapsed_seconds": round(elapsed, 1),
+        "notes_per_minute": round(created / elapsed * 60, 1) if elapsed else 0.0,
+    }
+
+
+job_queue.register(NOTE_BACKFILL_JOB, run_note_backfill)
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+"""Memory-mapped ICD-10-CM / CPT code index for validation and lookup."""
+
+import bisect
+import logging
+import mmap
+import re
+import threading
+from array import array
+from pathlib import Path
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+ICD10_PATTERN = re.compile(r"^[A-Z]\d[0-9A-Z]{1,5}$")
+CPT_PATTERN = re.compile(r"^\d{4}[0-9FTU]$")
+CODE_QUERY = re.compile(r"^[A-Za-z]?\d[0-9A-Za-z.]*$")
+
+
+def normalize_code(code: str) -> str:
+    """Uppercase and drop the dot: ``g43.909`` -> ``G43909``."""
+    return code.strip().upper().replace(".", "")
+
+
+class CodeIndex:
+    """Sorted code file searched in place through ``mmap``.
+
+    The file has one ``CODE DESCRIPTION`` line per code, sorted by code,
+    with codes written without dots — the layout of the CMS
+    ``icd10cm_codes_<year>.txt`` release, so the full code set can be
+    dropped in via settings. Only an array of line offsets is built in
+    memory (on first use); exact lookups and prefix searches are binary
+    searches over it, and description search is one regex pass over the
+    mapped file.
+    """
+
+    def __init__(self, path: str | Path, dotted: bool = False):
+        self.path = Path(path)
+        self.dotted = dotted
+        self._mm: mmap.mmap | None = None
+        self._offsets = array("L")
+        self._lock = threading.Lock()
+
+    def _ensure(self) -> mmap.mmap:
+        if self._mm is None:
+            with self._lock:
+                if self._mm is None:
+                    with open(self.path, "rb") as f:
+                        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    offsets = array("L", [0])
+                    offsets.extend(m.end() for m in re.finditer(rb"\n", mm) if m.end() < len(mm))
+                    self._offsets = offsets
+                    self._mm = mm
+                    logger.info("Loaded code index %s (%d codes)", self.path.name, len(offsets))
+        return self._mm
+
+    def __len__(self) -> int:
+        self._ensure()
+        return len(self._offsets)
+
+    def _line(self, i: int) -> tuple[str, str]:
+        mm = self._ensure()
+        start = self._offsets[i]
+        end = mm.find(b"\n", start)
+        code, _, description = mm[start:end if end >= 0 else len(mm)].decode().partition(" ")
+        return code, description.strip()
+
+    def _code_at(self, i: int) -> str:
+        return self._line(i)[0]
+
+    def _bisect(self, key: str) -> int:
+        self._ensure()
+        return bisect.bisect_left(range(len(self._offsets)), key, key=self._code_at)
+
+    def format(self, code: str) -> str:
+        """Display form of a stored code (ICD-10 gets its dot back)."""
+        return f"{code[:3]}.{code[3:]}" if self.dotted and len(code) > 3 else code
+
+    def lookup(self, code: str) -> str | None:
+        """Description for an exact code, or None if the index does not have it."""
+        key = normalize_code(code)
+        i = self._bisect(key)
+        if i < len(self._offsets):
+            found, description = self._line(i)
+            if found == key:
+                return description
+        return None
+
+    def has_prefix(self, prefix: str) -> bool:
+        """True if any code starts with ``prefix`` (e.g. an ICD-10 category)."""
+        key = normalize_code(prefix)
+        i = self._bisect(key)
+        return i < len(self._offsets) and self._code_at(i).startswith(key)
+
+    def prefix(self, prefix: str, limit: int = 20) -> list[dict]:
+        """Codes starting with ``prefix``, in code order."""
+        key = normalize_code(prefix)
+        results = []
+        i = self._bisect(key)
+        while i < len(self._offsets) and len(results) < limit:
+            code, description = self._line(i)
+            if not code.startswith(key):
+                break
+            results.append({"code": self.format(code), "description": description})
+            i += 1
+        return results
+
+    def search_descriptions(self, query: str, limit: int = 20) -> list[dict]:
+        """Codes whose description contains every word of ``query`` as a word prefix."""
+        words = [w for w in re.split(r"\W+", query) if w]
+        if not words:
+            return []
+        mm = self._ensure()
+        lookaheads = b"".join(rb"(?=[^\n]*\b" + re.escape(w.encode()) + rb")" for w in words)
+        pattern = re.compile(rb"^(\S+)[ \t]+" + lookaheads + rb"([^\n]*)$", re.IGNORECASE | re.MULTILINE)
+        results = []
+        for match in pattern.finditer(mm):
+            results.append({
+                "code": self.format(match.group(1).decode()),
+                "description": match.group(2).decode().strip(),
+            })
+            if len(results) >= limit:
+                break
+        return results
+
+    def search(self, query: str, limit: int = 20) -> list[dict]:
+        """Autocomplete: code prefix search for code-like input, else description search."""
+        query = query.strip()
+        if not query:
+            return []
+        if CODE_QUERY.match(query):
+            return self.prefix(query, limit)
+        return self.search_descriptions(query, limit)
+
+
+_icd10_index: CodeIndex | None = None
+_cpt_index: CodeIndex | None = None
+
+
+def get_icd10_index() -> CodeIndex | None:
+    """The ICD-10-CM index, or None if the configured file is missing."""
+    global _icd10_index
+    if _icd10_index is None and Path(settings.ICD10_INDEX_PATH).is_file():
+        _icd10_index = CodeIndex(settings.ICD10_INDEX_PATH, dotted=True)
+    return _icd10_index
+
+
+def get_cpt_index() -> CodeIndex | None:
+    """The CPT index if a licensed code file is configured (none is bundled)."""
+    global _cpt_index
+    if _cpt_index is None and settings.CPT_INDEX_PATH and Path(settings.CPT_INDEX_PATH).is_file():
+        _cpt_index = CodeIndex(settings.CPT_INDEX_PATH)
+    return _cpt_index
+
+
+def is_icd10_shaped(code: str) -> bool:
+    return bool(ICD10_PATTERN.match(normalize_code(code)))
+
+
+def is_cpt_shaped(code: str) -> bool:
+    return bool(CPT_PATTERN.match(normalize_code(code)))
@@ -5,11 +5,19 @@ from __future__ import annotations
 import logging
 from modules.shared.claude_client import llm_client
 from modules.shared.models import CodeSuggestionResponse, CodeSuggestion
+from modules.ambient_doc.code_index import (
+    CodeIndex,
+    get_icd10_index,
+    get_cpt_index,
+    is_icd10_shaped,
+    is_cpt_shaped,
+    normalize_code,
+)
 
 logger = logging.getLogger(__name__)
 
 
-def suggest_codes(note_text: str, encounter_type: str = "office_visit") -> CodeSuggestionResponse:
+async def suggest_codes(note_text: str, encounter_type: str = "office_visit") -> CodeSuggestionResponse:
     """Analyze a clinical note and suggest ICD-10/CPT codes.
 
     Args:
@@ -21,39 +29,51 @@ def suggest_codes(note_text: str, encounter_type: str = "office_visit") -> CodeS
     """
     logger.info("Suggesting codes for note (%d chars)", len(note_text))
 
-    raw_response = llm_client.suggest_codes(note_text, encounter_type)
+    raw_response = await llm_client.asuggest_codes(note_text, encounter_type)
     data = llm_client.extract_json(raw_response)
 
     if not data:
         logger.warning("Could not parse code suggestions from Claude response")
         return CodeSuggestionResponse()
 
-    icd10 = [
-        CodeSuggestion(
-            code=c.get("code", ""),
-            description=c.get("description", ""),
-            confidence=c.get("confidence", "low"),
-            evidence=c.get("evidence", ""),
-        )
-        for c in data.get("icd10_codes", [])
-    ]
-
-    cpt = [
-        CodeSuggestion(
-            code=c.get("code", ""),
-            description=c.get("description", ""),
-            confidence=c.get("confidence", "low"),
-            evidence=c.get("evidence", ""),
-        )
-        for c in data.get("cpt_codes", [])
-    ]
+    result = codes_from_data(data)
+    logger.info("Suggested %d ICD-10 and %d CPT codes", len(result.icd10_codes), len(result.cpt_codes))
+    return result
+
 
-    result = CodeSuggestionResponse(
-        icd10_codes=icd10,
-        cpt_codes=cpt,
+def codes_from_data(data: dict) -> CodeSuggestionResponse:
+    """Build the code suggestion response from the model's JSON.
+
+    Codes are checked against the local code index: malformed codes are
+    dropped, known codes get the official description, and ``verified``
+    says whether the index had the code (None when no index is available).
+    """
+    return CodeSuggestionResponse(
+        icd10_codes=_checked_codes(data.get("icd10_codes", []), get_icd10_index(), is_icd10_shaped),
+        cpt_codes=_checked_codes(data.get("cpt_codes", []), get_cpt_index(), is_cpt_shaped),
         em_level=data.get("em_level", ""),
         documentation_gaps=data.get("documentation_gaps", []),
     )
 
-    logger.info("Suggested %d ICD-10 and %d CPT codes", len(icd10), len(cpt))
-    return result
+
+def _checked_codes(items: list[dict], index: CodeIndex | None, shaped) -> list[CodeSuggestion]:
+    suggestions = []
+    seen = set()
+    for c in items:
+        code = c.get("code", "")
+        key = normalize_code(code)
+        if key in seen:
+            continue
+        if not shaped(code):
+            logger.warning("Dropping malformed code suggestion %r", code)
+            continue
+        seen.add(key)
+        description = index.lookup(key) if index else None
+        suggestions.append(CodeSuggestion(
+            code=index.format(key) if index else code.strip().upper(),
+            description=description or c.get("description", ""),
+            confidence=c.get("confidence", "low"),
+            evidence=c.get("evidence", ""),
+            verified=None if index is None else description is not None,
+        ))
+    return suggestions
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+"""CPU-only two-speaker diarization for clinician/patient encounters."""
+
+import logging
+import math
+from pathlib import Path
+
+from modules.ambient_doc.preprocess import SAMPLE_RATE, prepare_audio
+
+logger = logging.getLogger(__name__)
+
+FRAME = 400  # 25 ms
+HOP = 160  # 10 ms
+BANDS = 20
+MIN_SPEAKER_SHARE = 0.1  # below this share of speech, treat the recording as one speaker
+
+CLINICIAN_CUES = (
+    "any ", "do you", "have you", "how long", "how often", "let's", "let me",
+    "i'll", "we'll", "i'm going to", "prescribe", "take a deep breath",
+    "blood pressure", "exam", "follow up", "follow-up", "lab", "refer",
+)
+PATIENT_CUES = (
+    "i've been", "i have been", "it hurts", "i feel", "my ", "i can't",
+    "i noticed", "i think it", "it started", "it's been", "since last",
+)
+
+
+def segment_features(audio, segments: list[dict]) -> list[list[float]]:
+    """Spectral voice features per segment: mean and spread of log band energies.
+
+    ``audio`` is a 16 kHz mono float32 array (as decoded for Whisper). Only
+    the louder half of each segment's frames is used so pauses inside a
+    segment do not blur the speaker's profile.
+    """
+    import numpy as np
+
+    window = np.hanning(FRAME)
+    edges = np.unique(np.geomspace(2, FRAME // 2, BANDS + 1).astype(int))
+    features = []
+    for segment in segments:
+        clip = audio[int(segment["start"] * SAMPLE_RATE):int(segment["end"] * SAMPLE_RATE)]
+        if len(clip) < FRAME:
+            clip = np.pad(clip, (0, FRAME - len(clip)))
+        count = 1 + (len(clip) - FRAME) // HOP
+        frames = clip[np.arange(FRAME)[None, :] + HOP * np.arange(count)[:, None]] * window
+        power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+        bands = np.stack([power[:, a:b].sum(axis=1) for a, b in zip(edges[:-1], edges[1:])], axis=1)
+        log_bands = np.log(bands + 1e-10)
+        loudness = log_bands.sum(axis=1)
+        voiced = log_bands[loudness >= np.median(loudness)]
+        features.append(np.concatenate([voiced.mean(axis=0), voiced.std(axis=0)]).tolist())
+    return features
+
+
+def _standardize(features: list[list[float]]) -> list[list[float]]:
+    dims = len(features[0])
+    means = [sum(f[d] for f in features) / len(features) for d in range(dims)]
+    stds = [
+        math.sqrt(sum((f[d] - means[d]) ** 2 for f in features) / len(features)) or 1.0
+        for d in range(dims)
+    ]
+    return [[(f[d] - means[d]) / stds[d] for d in range(dims)] for f in features]
+
+
+def _distance(a: list[float], b: list[float]) -> float:
+    return sum((x - y) ** 2 for x, y in zip(a, b))
+
+
+def two_means(features: list[list[float]], weights: list[float] | None = None, iterations: int = 20) -> list[int]:
+    """Cluster feature vectors into two groups (weighted k-means, k=2).
+
+    Seeds are the first vector and the vector farthest from it, so the
+    result is deterministic. ``weights`` (segment durations) make long
+    segments count more towards the centroids.
+    """
+    if len(features) < 2:
+        return [0] * len(features)
+    points = _standardize(features)
+    weights = weights or [1.0] * len(points)
+    centroids = [points[0], max(points, key=lambda p: _distance(p, points[0]))]
+    labels: list[int] = []
+    for _ in range(iterations):
+        new_labels = [0 if _distance(p, centroids[0]) <= _distance(p, centroids[1]) else 1 for p in points]
+        if new_labels == labels:
+            break
+        labels = new_labels
+        for k in (0, 1):
+            members = [(p, w) for p, l, w in zip(points, labels, weights) if l == k]
+            total = sum(w for _, w in members)
+            if total:
+                centroids[k] = [sum(p[d] * w for p, w in members) / total for d in range(len(points[0]))]
+    return labels
+
+
+def _role_score(texts: list[str]) -> float:
+    """How clinician-like a speaker's lines are: questions and clinical phrasing."""
+    if not texts:
+        return 0.0
+    score = 0.0
+    for text in texts:
+        lowered = text.lower()
+        score += text.rstrip().endswith("?")
+        score += sum(cue in lowered for cue in CLINICIAN_CUES)
+        score -= sum(cue in lowered for cue in PATIENT_CUES)
+    return score / len(texts)
+
+
+def assign_roles(segments: list[dict], labels: list[int]) -> list[dict]:
+    """Label segments ``clinician``/``patient`` from their cluster ids.
+
+    The cluster that asks more questions and uses more clinical phrasing is
+    the clinician; ties go to whoever spoke first. If one cluster holds less
+    than ``MIN_SPEAKER_SHARE`` of the speech, the split is treated as noise
+    and segments are returned unlabeled.
+    """
+    durations = [max(s["end"] - s["start"], 0.0) for s in segments]
+    total = sum(durations) or 1.0
+    share = sum(d for d, l in zip(durations, labels) if l == 1) / total
+    if not segments or min(share, 1 - share) < MIN_SPEAKER_SHARE:
+        return [{**s, "speaker": None} for s in segments]
+
+    scores = [_role_score([s["text"] for s, l in zip(segments, labels) if l == k]) for k in (0, 1)]
+    if scores[0] == scores[1]:
+        clinician = labels[0]
+    else:
+        clinician = 0 if scores[0] > scores[1] else 1
+    return [
+        {**s, "speaker": "clinician" if l == clinician else "patient"}
+        for s, l in zip(segments, labels)
+    ]
+
+
+def format_speaker_turns(segments: list[dict]) -> str:
+    """Compact transcript with one line per speaker turn.
+
+    Consecutive segments from the same speaker are merged, so the note
+    prompt gets ``Clinician: ...`` / ``Patient: ...`` lines instead of
+    having to infer who said what.
+    """
+    turns: list[tuple[str | None, list[str]]] = []
+    for segment in segments:
+        if not segment["text"]:
+            continue
+        speaker = segment.get("speaker")
+        if turns and turns[-1][0] == speaker:
+            turns[-1][1].append(segment["text"])
+        else:
+            turns.append((speaker, [segment["text"]]))
+    return "\n".join(
+        f"{speaker.capitalize()}: {' '.join(texts)}" if speaker else " ".join(texts)
+        for speaker, texts in turns
+    )
+
+
+def diarize(audio_path: str | Path, segments: list[dict]) -> list[dict]:
+    """Attach a ``speaker`` role to each transcript segment."""
+    spoken = [s for s in segments if s["text"]]
+    if len(spoken) < 2:
+        return [{**s, "speaker": None} for s in segments]
+    prepared = prepare_audio(audio_path)  # cached from transcription
+    processed = [
+        {**s, "start": prepared.to_processed(s["start"]), "end": prepared.to_processed(s["end"])}
+        for s in spoken
+    ]
+    labels = two_means(
+        segment_features(prepared.audio, processed),
+        weights=[max(s["end"] - s["start"], 0.1) for s in spoken],
+    )
+    labeled = assign_roles(spoken, labels)
+    logger.info(
+        "Diarized %d segments (%d clinician)",
+        len(labeled),
+        sum(s["speaker"] == "clinician" for s in labeled),
+    )
+    return labeled
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+"""Bounded executor for Whisper inference with startup preloading."""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, TypeVar
+
+from config import settings
+from modules.ambient_doc.transcriber import (
+    SAMPLE_RATE,
+    get_profile,
+    transcribe_audio,
+    get_whisper_model,
+    warm_up_model,
+    load_chunks,
+    transcribe_samples,
+    stitch_chunks,
+)
+from modules.ambient_doc.diarization import diarize as diarize_segments, format_speaker_turns
+from modules.shared.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TranscriptionBusyError(RuntimeError):
+    """Raised when the engine's queue is full; callers should retry later."""
+
+
+class TranscriptionEngine:
+    """Runs transcription off the event loop with a bounded backlog.
+
+    Inference runs on a thread pool of ``TRANSCRIBE_WORKERS`` threads that
+    share one model: CTranslate2 releases the GIL while decoding and the
+    model is built with a matching ``num_workers``, so threads give real
+    parallelism without a model copy per process. At most
+    ``TRANSCRIBE_MAX_QUEUE`` calls wait behind the running ones; beyond
+    that interactive callers get ``TranscriptionBusyError`` (a 503) instead
+    of piling up.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="whisper")
+        self._depth = 0
+        self._depth_lock = threading.Lock()
+
+    @property
+    def depth(self) -> int:
+        """Calls running or waiting for a worker."""
+        return self._depth
+
+    def has_capacity(self) -> bool:
+        return self._depth < self.workers + self.max_queue
+
+    async def run(self, fn: Callable[..., T], *args, wait: bool = False) -> T:
+        """Run ``fn(*args)`` on the inference pool.
+
+        With ``wait`` the call queues even when the backlog is full; use it
+        for work that is already bounded elsewhere (job workers, a stream
+        that was admitted on connect). A cancelled caller stops waiting, but
+        the call counts toward the backlog until the worker is done with it.
+        """
+        if not wait and not self.has_capacity():
+            metrics.incr("transcription.rejected")
+            raise TranscriptionBusyError("Transcription service is busy, try again shortly")
+        with self._depth_lock:
+            self._depth += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        # Registered before wrap_future so the slot is free by the time the caller resumes
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future: Future | None) -> None:
+        with self._depth_lock:
+            self._depth -= 1
+
+    async def transcribe(
+        self,
+        audio_path: str | Path,
+        language: str = "en",
+        profile: str | None = None,
+        wait: bool = False,
+        diarize: bool = False,
+    ) -> dict:
+        """``transcribe_audio`` on the inference pool.
+
+        With more than one worker and ``TRANSCRIBE_CHUNK_SECONDS`` set,
+        recordings are split at silences and the chunks decoded in parallel.
+        With ``diarize`` segments get a ``speaker`` role and the result a
+        ``speaker_transcript`` with one line per speaker turn.
+        """
+        if self.workers > 1 and settings.TRANSCRIBE_CHUNK_SECONDS > 0:
+            result = await self.transcribe_chunked(audio_path, language, profile, wait=wait)
+        else:
+            result = await self.run(transcribe_audio, audio_path, language, profile, wait=wait)
+        if diarize:
+            segments = await self.run(diarize_segments, audio_path, result["segments"], wait=True)
+            result["segments"] = segments
+            result["speaker_transcript"] = format_speaker_turns(segments)
+        return result
+
+    async def transcribe_chunked(
+        self,
+        audio_path: str | Path,
+        language: str = "en",
+        profile: str | None = None,
+        wait: bool = False,
+    ) -> dict:
+        """Decode VAD-delimited chunks concurrently and stitch the segments.
+
+        Only the first step (decode + VAD) is subject to the backlog limit;
+        the chunks of an admitted recording always queue.
+        """
+        prepared, chunks = await self.run(
+            load_chunks, audio_path, settings.TRANSCRIBE_CHUNK_SECONDS, profile, wait=wait
+        )
+        results = await asyncio.gather(*(
+            self.run(
+                transcribe_samples, prepared.audio[start:end], language, start / SAMPLE_RATE, profile, wait=True
+            )
+            for start, end in chunks
+        ))
+        return stitch_chunks([prepared.restore(r) for r in results], prepared.duration, language)
+
+    async def start(self) -> None:
+        """Load (and optionally warm up) the default profile's model before serving requests."""
+        if not settings.WHISPER_PRELOAD:
+            return
+        try:
+            if settings.WHISPER_WARMUP:
+                await self.run(warm_up_model, wait=True)
+            else:
+                await self.run(get_whisper_model, get_profile(None)["model_size"], wait=True)
+        except Exception as e:
+            logger.error("Whisper preload failed: %s", e)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+engine = TranscriptionEngine(workers=settings.TRANSCRIBE_WORKERS, max_queue=settings.TRANSCRIBE_MAX_QUEUE)
@@ -4,15 +4,47 @@ from __future__ import annotations
 
 import logging
 import re
+from config import settings
 from modules.shared.claude_client import llm_client
-from modules.shared.models import SOAPNote
+from modules.shared.models import SOAPNote, CodeSuggestionResponse
+from modules.ambient_doc.code_suggester import suggest_codes, codes_from_data
+from modules.ambient_doc.code_index import CodeIndex, get_icd10_index, is_icd10_shaped, normalize_code
 
 logger = logging.getLogger(__name__)
 
 
-def generate_note(transcript: str) -> SOAPNote:
+SECTIONS = ("subjective", "objective", "assessment", "plan")
+
+# Header words recognized at the start of a line; single letters need a colon
+SECTION_HEADERS = {
+    "subjective": "subjective",
+    "objective": "objective",
+    "assessment": "assessment",
+    "plan": "plan",
+    "s": "subjective",
+    "o": "objective",
+    "a": "assessment",
+    "p": "plan",
+}
+
+# A header word, an optional "and Plan" / "& P" / "/P", an optional
+# parenthesized qualifier ("Subjective (per patient):") and the colon
+HEADER_PATTERN = re.compile(
+    r"(?P<word>[^\W\d_]+)"
+    r"(?:\s*(?:and|&|/)\s*(?P<plan>plan|p)\b)?"
+    r"\s*(?P<qualifier>\([^)]*\))?"
+    r"[*_ ]*(?P<colon>[:：])?",
+    re.IGNORECASE,
+)
+
+
+async def generate_note(transcript: str) -> SOAPNote:
     """Generate a structured SOAP note from an encounter transcript.
 
+    The provider is asked for schema-constrained output first; if that is
+    disabled or returns nothing usable, the free-text completion is parsed
+    with ``parse_soap_note``.
+
     Args:
         transcript: The transcribed doctor-patient conversation.
 
@@ -21,38 +53,132 @@ def generate_note(transcript: str) -> SOAPNote:
     """
     logger.info("Generating SOAP note from transcript (%d chars)", len(transcript))
 
-    raw_text = llm_client.generate_soap_note(transcript)
+    if settings.STRUCTURED_SOAP_OUTPUT:
+        try:
+            note = note_from_structured(await llm_client.agenerate_soap_note_structured(transcript))
+            if note is not None:
+                logger.info("SOAP note generated successfully (structured)")
+                return note
+            logger.warning("Structured SOAP output was incomplete, falling back to text")
+        except Exception as e:
+            logger.warning("Structured SOAP output failed, falling back to text: %s", e)
+
+    raw_text = await llm_client.agenerate_soap_note(transcript)
 
     note = parse_soap_note(raw_text)
     logger.info("SOAP note generated successfully")
     return note
 
 
+async def generate_documentation(
+    transcript: str,
+    encounter_type: str = "office_visit",
+) -> tuple[SOAPNote, CodeSuggestionResponse]:
+    """Generate the SOAP note and its code suggestions together.
+
+    One structured completion returns both, so the note is never sent back
+    to the model for coding. Without structured output (or if it fails)
+    this falls back to ``generate_note`` followed by ``suggest_codes``.
+    """
+    logger.info("Generating documentation from transcript (%d chars)", len(transcript))
+
+    if settings.STRUCTURED_SOAP_OUTPUT:
+        try:
+            data = await llm_client.agenerate_documentation(transcript, encounter_type)
+            note = note_from_structured(data)
+            if note is not None:
+                codes = codes_from_data(data)
+                logger.info(
+                    "Documentation generated in one call (%d ICD-10, %d CPT)",
+                    len(codes.icd10_codes),
+                    len(codes.cpt_codes),
+                )
+                return note, codes
+            logger.warning("Structured documentation was incomplete, falling back to two calls")
+        except Exception as e:
+            logger.warning("Structured documentation failed, falling back to two calls: %s", e)
+
+    note = await generate_note(transcript)
+    return note, await suggest_codes(note.raw_text, encounter_type)
+
+
+def render_soap_note(sections: dict) -> str:
+    """Render sections in the markdown layout the text prompt produces."""
+    return "\n\n".join(f"## {name.capitalize()}\n{sections[name]}" for name in SECTIONS)
+
+
+def note_from_structured(data: dict) -> SOAPNote | None:
+    """Build a SOAPNote from a ``SOAP_NOTE_TOOL`` result; None if sections are missing."""
+    if not all(isinstance(data.get(name), str) for name in SECTIONS):
+        return None
+    sections = {name: data[name].strip() for name in SECTIONS}
+    raw_text = render_soap_note(sections)
+    index = get_icd10_index()
+    icd10_codes = []
+    seen = set()
+    for c in data.get("icd10_codes") or []:
+        if not isinstance(c, dict) or not is_icd10_shaped(c.get("code") or ""):
+            continue
+        code = normalize_code(c["code"])
+        code = index.format(code) if index else c["code"].strip().upper()
+        if code in seen:
+            continue
+        seen.add(code)
+        entry = _icd10_entry(code, "structured", index, c.get("description", ""))
+        if entry is not None:
+            icd10_codes.append(entry)
+    return SOAPNote(**sections, icd10_codes=icd10_codes or extract_icd10_codes(raw_text), raw_text=raw_text)
+
+
+def _section_header(line: str) -> tuple[tuple[str, ...], str] | None:
+    """Recognize a section header line, returning ``(sections, inline_text)``.
+
+    Accepts ``## Subjective``, ``**Objective:**``, ``Assessment: ...``,
+    ``P: ...`` and ``Subjective (per patient):``; "Assessment and Plan:" and
+    "A/P:" open both sections. A header must start the line, so "O:" inside
+    a sentence is plain text, and a full word without a colon only counts
+    when it stands alone ("Plan to recheck" is text).
+    """
+    text = line.strip().lstrip("#").strip().lstrip("*_").strip()
+    match = HEADER_PATTERN.match(text)
+    if match is None:
+        return None
+    section = SECTION_HEADERS.get(match["word"].lower())
+    if section is None:
+        return None
+    sections = (section,)
+    if match["plan"]:
+        if section != "assessment":
+            return None
+        sections = ("assessment", "plan")
+    has_colon = match["colon"] is not None
+    rest = text[match.end():].strip().lstrip("*_").strip()
+    if (len(match["word"]) == 1 or match["qualifier"]) and not has_colon:
+        return None
+    if not has_colon and rest:
+        return None
+    return sections, rest
+
+
 def parse_soap_note(text: str) -> SOAPNote:
-    """Parse Claude's response into structured SOAP sections."""
-    sections = {
-        "subjective": "",
-        "objective": "",
-        "assessment": "",
-        "plan": "",
-    }
-
-    # Match sections by headers (## Subjective, **Subjective**, Subjective:, S:, etc.)
-    patterns = [
-        (r"(?:#{1,3}\s*)?(?:\*{0,2})(?:S(?:ubjective)?)\s*[:：\*]*\s*\n?(.*?)(?=(?:#{1,3}\s*)?(?:\*{0,2})(?:O(?:bjective)?)\s*[:：\*]|\Z)",
-         "subjective"),
-        (r"(?:#{1,3}\s*)?(?:\*{0,2})(?:O(?:bjective)?)\s*[:：\*]*\s*\n?(.*?)(?=(?:#{1,3}\s*)?(?:\*{0,2})(?:A(?:ssessment)?)\s*[:：\*]|\Z)",
-         "objective"),
-        (r"(?:#{1,3}\s*)?(?:\*{0,2})(?:A(?:ssessment)?)\s*[:：\*]*\s*\n?(.*?)(?=(?:#{1,3}\s*)?(?:\*{0,2})(?:P(?:lan)?)\s*[:：\*]|\Z)",
-         "assessment"),
-        (r"(?:#{1,3}\s*)?(?:\*{0,2})(?:P(?:lan)?)\s*[:：\*]*\s*\n?(.*?)(?=\Z)",
-         "plan"),
-    ]
-
-    for pattern, section in patterns:
-        match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
-        if match:
-            sections[section] = match.group(1).strip()
+    """Parse a free-text completion into SOAP sections in one pass over its lines.
+
+    Text under a combined "Assessment and Plan" header goes into both sections.
+    """
+    collected: dict[str, list[str]] = {name: [] for name in SECTIONS}
+    current: tuple[str, ...] = ()
+    for line in text.splitlines():
+        header = _section_header(line)
+        if header is not None:
+            current, inline = header
+            if inline:
+                for name in current:
+                    collected[name].append(inline)
+        else:
+            for name in current:
+                collected[name].append(line)
+
+    sections = {name: "\n".join(lines).strip() for name, lines in collected.items()}
 
     # Extract ICD-10 codes from the text
     icd10_codes = extract_icd10_codes(text)
@@ -68,15 +194,39 @@ def parse_soap_note(text: str) -> SOAPNote:
 
 
 def extract_icd10_codes(text: str) -> list[dict]:
-    """Extract ICD-10 codes mentioned in the note text."""
-    # Match patterns like G43.909, J06.9, M54.5
-    code_pattern = r"([A-Z]\d{2}(?:\.\d{1,4})?)"
+    """Extract ICD-10 codes mentioned in the note text.
+
+    Matches are checked against the local ICD-10 index so words that only
+    look like codes ("vitamin B12") are skipped; known codes carry their
+    official description.
+    """
+    # Match patterns like G43.909, J06.9, M54.50
+    code_pattern = r"\b([A-Z]\d{2}(?:\.[0-9A-Z]{1,4})?)\b"
     matches = re.findall(code_pattern, text)
+    index = get_icd10_index()
 
     codes = []
     seen = set()
     for code in matches:
-        if code not in seen:
-            seen.add(code)
-            codes.append({"code": code, "source": "auto-extracted"})
+        if code in seen:
+            continue
+        seen.add(code)
+        entry = _icd10_entry(code, "auto-extracted", index)
+        if entry is not None:
+            codes.append(entry)
     return codes
+
+
+def _icd10_entry(code: str, source: str, index: CodeIndex | None, description: str = "") -> dict | None:
+    """A note's ICD-10 entry for ``code``, or None if the index rules it out.
+
+    An undotted code the index neither knows nor has as a category prefix is
+    rejected; a known code carries its official description.
+    """
+    official = index.lookup(code) if index else None
+    if index and official is None and "." not in code and not index.has_prefix(code):
+        return None
+    entry = {"code": code, "source": source}
+    if official or description:
+        entry["description"] = official or description
+    return entry
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+"""Background audio → transcript → SOAP note → codes pipeline."""
+
+import asyncio
+import logging
+from pathlib import Path
+
+from database.db import SessionLocal
+from database.schemas import Encounter, ClinicalNote, gen_id
+from modules.ambient_doc.engine import engine
+from modules.ambient_doc.note_generator import generate_documentation
+from modules.shared.jobs import JobContext, job_queue
+
+logger = logging.getLogger(__name__)
+
+AMBIENT_PIPELINE_JOB = "ambient_pipeline"
+
+
+def _save_documentation(
+    patient_id: str,
+    encounter_type: str,
+    transcript: str,
+    duration_seconds: float | None,
+    note,
+    codes,
+) -> tuple[str, str]:
+    encounter_id = gen_id()
+    note_id = gen_id()
+    db = SessionLocal()
+    try:
+        db.add(Encounter(
+            id=encounter_id,
+            patient_id=patient_id,
+            encounter_type=encounter_type,
+            transcript=transcript,
+            duration_seconds=duration_seconds,
+            status="documented",
+        ))
+        db.add(ClinicalNote(
+            id=note_id,
+            encounter_id=encounter_id,
+            subjective=note.subjective,
+            objective=note.objective,
+            assessment=note.assessment,
+            plan=note.plan,
+            raw_text=note.raw_text,
+            icd10_codes=[c.model_dump() for c in codes.icd10_codes],
+            cpt_codes=[c.model_dump() for c in codes.cpt_codes],
+        ))
+        db.commit()
+    finally:
+        db.close()
+    return encounter_id, note_id
+
+
+async def run_ambient_pipeline(job: JobContext) -> dict:
+    """Transcribe an uploaded recording, draft the note and suggest codes.
+
+    Payload keys: ``audio_path``, ``language``, ``profile``, ``diarize``,
+    ``patient_id``, ``encounter_type``. With ``diarize`` the note is drafted
+    from the speaker-turn transcript. The recording is deleted once the job
+    finishes, whether or not it succeeded.
+    """
+    audio_path = Path(job.payload["audio_path"])
+    encounter_type = job.payload.get("encounter_type", "office_visit")
+
+    try:
+        await job.progress("transcribing", 0.1)
+        transcription = await engine.transcribe(
+            audio_path,
+            job.payload.get("language", "en"),
+            job.payload.get("profile"),
+            wait=True,
+            diarize=job.payload.get("diarize", False),
+        )
+        transcript = transcription.get("speaker_transcript") or transcription["transcript"]
+        if not transcript.strip():
+            raise ValueError("No speech detected in the recording")
+
+        await job.progress("generating_note", 0.5)
+        note, codes = await generate_documentation(transcript, encounter_type)
+    finally:
+        audio_path.unlink(missing_ok=True)
+
+    encounter_id, note_id = await asyncio.to_thread(
+        _save_documentation,
+        job.payload.get("patient_id") or "unknown",
+        encounter_type,
+        transcript,
+        transcription.get("duration_seconds"),
+        note,
+        codes,
+    )
+
+    logger.info("Ambient pipeline job %s produced encounter %s", job.id, encounter_id)
+    return {
+        "encounter_id": encounter_id,
+        "note_id": note_id,
+        "transcript": transcript,
+        "note": note.model_dump(),
+        "codes": codes.model_dump(),
+    }
+
+
+job_queue.register(AMBIENT_PIPELINE_JOB, run_ambient_pipeline)
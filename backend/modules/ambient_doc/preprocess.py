@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+"""Decode-once audio preparation: 16 kHz mono, silence trimming, decode cache."""
+
+import bisect
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.02
+SPEECH_PAD_SECONDS = 0.25  # kept around detected speech
+RELATIVE_FLOOR_DB = -45.0  # frames this far below the loudest frame are silence
+ABSOLUTE_FLOOR_DB = -60.0
+
+
+class PreparedAudio:
+    """Decoded, trimmed audio plus the map back to the original timeline.
+
+    ``spans`` lists the kept regions as ``(processed_start, original_start,
+    length)`` in seconds, in order. Whisper sees ``audio``; timestamps it
+    returns go through ``to_original`` before reaching callers.
+    """
+
+    def __init__(self, audio, duration: float, spans: list[tuple[float, float, float]]):
+        self.audio = audio
+        self.duration = duration
+        self.spans = spans
+        self._processed_starts = [s[0] for s in spans]
+        self._original_starts = [s[1] for s in spans]
+
+    @property
+    def processed_duration(self) -> float:
+        return len(self.audio) / SAMPLE_RATE
+
+    @property
+    def nbytes(self) -> int:
+        return int(getattr(self.audio, "nbytes", 0))
+
+    def to_original(self, t: float) -> float:
+        """Map a time in the trimmed audio to the original recording."""
+        if not self.spans:
+            return t
+        i = max(bisect.bisect_right(self._processed_starts, t) - 1, 0)
+        processed_start, original_start, length = self.spans[i]
+        return original_start + min(max(t - processed_start, 0.0), length)
+
+    def to_processed(self, t: float) -> float:
+        """Map an original time into the trimmed audio (removed gaps clamp forward)."""
+        if not self.spans:
+            return t
+        i = bisect.bisect_right(self._original_starts, t) - 1
+        if i < 0:
+            return 0.0
+        processed_start, original_start, length = self.spans[i]
+        if t - original_start <= length:
+            return processed_start + (t - original_start)
+        if i + 1 < len(self.spans):
+            return self.spans[i + 1][0]
+        return processed_start + length
+
+    def restore(self, segments: list[dict]) -> list[dict]:
+        """Copy segments with timestamps moved back to the original timeline."""
+        return [
+            {
+                **s,
+                "start": round(self.to_original(s["start"]), 2),
+                "end": round(self.to_original(s["end"]), 2),
+            }
+            for s in segments
+        ]
+
+
+def plan_keep(
+    voiced: list[bool],
+    total_seconds: float,
+    max_pause: float,
+    keep_pause: float,
+    frame_seconds: float = FRAME_SECONDS,
+    pad: float = SPEECH_PAD_SECONDS,
+) -> list[tuple[float, float]]:
+    """Choose which ``(start, end)`` regions of a recording to keep.
+
+    Leading and trailing silence is dropped, pauses up to ``max_pause`` are
+    kept whole and longer ones are shortened to ``keep_pause``. With no
+    detected speech the whole recording is kept, since a too-quiet file is
+    better transcribed than discarded.
+    """
+    regions: list[list[float]] = []
+    run_start = None
+    for i, is_voiced in enumerate(voiced + [False]):
+        if is_voiced and run_start is None:
+            run_start = i
+        elif not is_voiced and run_start is not None:
+            start = max(run_start * frame_seconds - pad, 0.0)
+            end = min(i * frame_seconds + pad, total_seconds)
+            if regions and start - regions[-1][1] <= max_pause:
+                regions[-1][1] = end
+            else:
+                if regions:
+                    regions[-1][1] = min(regions[-1][1] + keep_pause, start)
+                regions.append([start, end])
+            run_start = None
+    if not regions:
+        return [(0.0, total_seconds)]
+    return [(start, end) for start, end in regions]
+
+
+def detect_voiced(audio) -> list[bool]:
+    """Per-frame speech flags from RMS energy relative to the loudest frame."""
+    import numpy as np
+
+    frame = int(FRAME_SECONDS * SAMPLE_RATE)
+    count = len(audio) // frame
+    if count == 0:
+        return []
+    frames = audio[: count * frame].reshape(count, frame)
+    rms_db = 10 * np.log10(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-12)
+    threshold = max(rms_db.max() + RELATIVE_FLOOR_DB, ABSOLUTE_FLOOR_DB)
+    return (rms_db > threshold).tolist()
+
+
+def trim_audio(audio) -> PreparedAudio:
+    """Drop leading/trailing silence and shorten long pauses."""
+    import numpy as np
+
+    duration = len(audio) / SAMPLE_RATE
+    keep = plan_keep(
+        detect_voiced(audio),
+        duration,
+        max_pause=settings.AUDIO_MAX_PAUSE_SECONDS,
+        keep_pause=settings.AUDIO_KEEP_PAUSE_SECONDS,
+    )
+    pieces, spans, processed = [], [], 0.0
+    for start, end in keep:
+        piece = audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+        pieces.append(piece)
+        spans.append((processed, start, len(piece) / SAMPLE_RATE))
+        processed += len(piece) / SAMPLE_RATE
+    trimmed = np.concatenate(pieces) if pieces else audio[:0]
+    return PreparedAudio(trimmed, duration, spans)
+
+
+class DecodedAudioCache:
+    """LRU of prepared audio keyed by file content hash, bounded in bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, PreparedAudio] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> PreparedAudio | None:
+        with self._lock:
+            prepared = self._entries.get(key)
+            if prepared is not None:
+                self._entries.move_to_end(key)
+            return prepared
+
+    def set(self, key: str, prepared: PreparedAudio) -> None:
+        if prepared.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key).nbytes
+            self._entries[key] = prepared
+            self._size += prepared.nbytes
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.nbytes
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+
+_cache = DecodedAudioCache(settings.AUDIO_CACHE_MB * 1024 * 1024)
+
+
+def content_hash(path: str | Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def prepare_audio(path: str | Path) -> PreparedAudio:
+    """Decode a recording to 16 kHz mono and trim it, reusing earlier work.
+
+    The same upload (a retry, a re-transcription with another profile, or
+    the diarization pass) is decoded only once.
+    """
+    key = content_hash(path)
+    prepared = _cache.get(key)
+    if prepared is not None:
+        return prepared
+
+    from faster_whisper.audio import decode_audio
+
+    audio = decode_audio(str(path), sampling_rate=SAMPLE_RATE)
+    if settings.AUDIO_TRIM_SILENCE:
+        prepared = trim_audio(audio)
+    else:
+        prepared = PreparedAudio(audio, len(audio) / SAMPLE_RATE, [(0.0, 0.0, len(audio) / SAMPLE_RATE)])
+    logger.info(
+        "Prepared %s: %.1fs -> %.1fs after trimming silence",
+        Path(path).name,
+        prepared.duration,
+        prepared.processed_duration,
+    )
+    _cache.set(key, prepared)
+    return prepared
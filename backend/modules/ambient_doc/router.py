@@ -2,55 +2,101 @@ from __future__ import annotations
 
 """API endpoints for ambient clinical documentation."""
 
+import asyncio
+import json
 import uuid
 import logging
-from pathlib import Path
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from sqlalchemy.orm import Session
+from contextlib import suppress
+from datetime import datetime
+from fastapi import (
+    APIRouter,
+    UploadFile,
+    File,
+    Form,
+    HTTPException,
+    Depends,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.websockets import WebSocketState
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, defer
 
 from config import settings
 from database.db import get_db
-from database.schemas import Encounter, ClinicalNote, Patient
+from database.schemas import Encounter, ClinicalNote, NoteRevision, Patient
 from modules.shared.models import (
     NoteGenerationRequest,
     NoteGenerationResponse,
+    DocumentationRequest,
+    DocumentationResponse,
+    BackfillRequest,
     TranscriptionResponse,
     CodeSuggestionRequest,
     CodeSuggestionResponse,
     NoteUpdateRequest,
+    TranscriptionProfile,
 )
-from modules.ambient_doc.transcriber import transcribe_audio
-from modules.ambient_doc.note_generator import generate_note
+from modules.ambient_doc.engine import engine, TranscriptionBusyError
+from modules.ambient_doc.transcriber import resolve_profile
+from modules.ambient_doc.note_generator import generate_note, generate_documentation, parse_soap_note, SECTIONS
+from modules.ambient_doc.versioning import reverse_diff, reconstruct
 from modules.ambient_doc.code_suggester import suggest_codes
-from modules.auth.utils import get_current_user, get_hospital_id
+from modules.ambient_doc.code_index import get_icd10_index, get_cpt_index
+from modules.ambient_doc.pipeline import AMBIENT_PIPELINE_JOB
+from modules.ambient_doc.backfill import NOTE_BACKFILL_JOB
+from modules.ambient_doc.streaming import StreamingTranscriber
+from modules.shared.jobs import job_queue, get_job
+from modules.shared.uploads import save_upload
+from modules.auth.utils import get_current_user, get_hospital_id, bind_llm_tenant, decode_token
 
 logger = logging.getLogger(__name__)
+MAX_AUDIO_BYTES = settings.MAX_AUDIO_SIZE_MB * 1024 * 1024
+
 router = APIRouter(
     prefix="/api/ambient",
     tags=["Ambient Documentation"],
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(bind_llm_tenant)],
 )
 
+# Browsers cannot set an Authorization header on a WebSocket handshake, so
+# socket routes live on their own router and check a ``token`` query param.
+ws_router = APIRouter(prefix="/api/ambient", tags=["Ambient Documentation"])
+
 
 @router.post("/transcribe", response_model=TranscriptionResponse)
 async def transcribe_audio_endpoint(
     file: UploadFile = File(...),
     language: str = "en",
+    profile: TranscriptionProfile | None = None,
+    diarize: bool | None = None,
+    current_user: dict = Depends(get_current_user),
 ):
-    """Upload an audio file and get a transcript."""
-    # Validate file size
-    contents = await file.read()
-    if len(contents) > settings.MAX_AUDIO_SIZE_MB * 1024 * 1024:
-        raise HTTPException(413, f"File too large. Max size: {settings.MAX_AUDIO_SIZE_MB}MB")
+    """Upload an audio file and get a transcript.
 
-    # Save temporarily
-    file_ext = Path(file.filename or "audio.wav").suffix or ".wav"
-    temp_path = settings.UPLOAD_DIR / f"{uuid.uuid4()}{file_ext}"
-    temp_path.write_bytes(contents)
+    ``profile`` trades accuracy for latency; without it the hospital's
+    configured profile (or the server default) is used. ``diarize`` adds
+    clinician/patient labels and a ``speaker_transcript`` to pass to
+    ``/generate-note``.
+    """
+    profile_name = resolve_profile(profile and profile.value, get_hospital_id(current_user))
+    temp_path = await save_upload(file, settings.UPLOAD_DIR, MAX_AUDIO_BYTES, default_name="audio.wav")
 
     try:
-        result = transcribe_audio(temp_path, language=language)
-        return TranscriptionResponse(**result)
+        result = await engine.transcribe(
+            temp_path,
+            language=language,
+            profile=profile_name,
+            diarize=settings.DIARIZATION_ENABLED if diarize is None else diarize,
+        )
+        return TranscriptionResponse(**result, profile=profile_name)
+    except TranscriptionBusyError as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "5"})
     except Exception as e:
         logger.error("Transcription failed: %s", e)
         raise HTTPException(500, f"Transcription failed: {str(e)}")
@@ -58,17 +104,214 @@ async def transcribe_audio_endpoint(
         temp_path.unlink(missing_ok=True)
 
 
+@router.post("/jobs", status_code=202)
+async def create_pipeline_job(
+    file: UploadFile = File(...),
+    language: str = Form("en"),
+    patient_id: str | None = Form(None),
+    encounter_type: str = Form("office_visit"),
+    profile: TranscriptionProfile | None = Form(None),
+    diarize: bool | None = Form(None),
+    current_user: dict = Depends(get_current_user),
+):
+    """Queue a recording for transcription, note generation and coding.
+
+    Returns immediately with a job id; poll ``/jobs/{job_id}`` or follow
+    ``/jobs/{job_id}/events`` for progress.
+    """
+    hospital_id = get_hospital_id(current_user)
+    profile_name = resolve_profile(profile and profile.value, hospital_id)
+    audio_path = await save_upload(
+        file, settings.UPLOAD_DIR / "jobs", MAX_AUDIO_BYTES, default_name="audio.wav"
+    )
+
+    job_id = await job_queue.enqueue(
+        AMBIENT_PIPELINE_JOB,
+        {
+            "audio_path": str(audio_path),
+            "language": language,
+            "profile": profile_name,
+            "diarize": settings.DIARIZATION_ENABLED if diarize is None else diarize,
+            "patient_id": patient_id,
+            "encounter_type": encounter_type,
+        },
+        hospital_id=hospital_id,
+    )
+    return {"job_id": job_id, "status": "queued"}
+
+
+@router.post("/backfill", status_code=202)
+async def create_backfill_job(
+    request: BackfillRequest,
+    current_user: dict = Depends(get_current_user),
+):
+    """Queue regeneration of notes for stored encounter transcripts.
+
+    Each selected encounter gets a new draft note; hospital admins
+    only reach their own hospital's encounters. Progress and throughput are
+    reported on ``/jobs/{job_id}``.
+    """
+    job_id = await job_queue.enqueue(
+        NOTE_BACKFILL_JOB,
+        request.model_dump(mode="json", exclude_none=True),
+        hospital_id=get_hospital_id(current_user),
+    )
+    return {"job_id": job_id, "status": "queued"}
+
+
+async def _get_accessible_job(job_id: str, current_user: dict) -> dict:
+    job = await asyncio.to_thread(get_job, job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    job_hospital_id = job.pop("hospital_id")
+    hospital_id = get_hospital_id(current_user)
+    if hospital_id and job_hospital_id != hospital_id:
+        raise HTTPException(403, "Access denied to this job")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def get_pipeline_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Get a job's status, current stage and, once finished, its result."""
+    return await _get_accessible_job(job_id, current_user)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_pipeline_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Follow a job over Server-Sent Events until it completes or fails.
+
+    Works whichever process runs the job: the row is re-read every
+    ``JOB_EVENTS_POLL_SECONDS``, with a keep-alive comment when nothing changed.
+    """
+    await _get_accessible_job(job_id, current_user)
+
+    async def body():
+        async for state in job_queue.watch(job_id, settings.JOB_EVENTS_POLL_SECONDS):
+            if state is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: job\ndata: {json.dumps(state)}\n\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@ws_router.websocket("/transcribe/stream")
+async def transcribe_stream(
+    websocket: WebSocket,
+    token: str = "",
+    language: str = "en",
+    profile: TranscriptionProfile | None = None,
+):
+    """Transcribe a recording while it is being made.
+
+    The client sends binary frames of 16 kHz mono PCM16 audio and a text
+    frame ``{"type": "stop"}`` when the visit ends. The server sends
+    ``partial`` and ``final`` segment events as speech is recognized, then
+    ``done`` with the full transcript.
+    """
+    try:
+        user = decode_token(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    profile_name = resolve_profile(profile and profile.value, get_hospital_id(user))
+    await websocket.accept()
+    if not engine.has_capacity():
+        await websocket.send_json({"type": "error", "detail": "Transcription service is busy, try again shortly"})
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    session = StreamingTranscriber(language=language, profile=profile_name)
+    new_audio = asyncio.Event()
+    stopping = asyncio.Event()
+    worker = asyncio.create_task(_stream_transcription(websocket, session, new_audio, stopping))
+
+    try:
+        while True:
+            # Wait on the worker too, so a failed decode ends the loop instead
+            # of leaving it parked on a receive the client may never send.
+            receive = asyncio.ensure_future(websocket.receive())
+            await asyncio.wait({receive, worker}, return_when=asyncio.FIRST_COMPLETED)
+            if not receive.done():
+                receive.cancel()
+                await _close_if_open(websocket, status.WS_1011_INTERNAL_ERROR)
+                break
+            message = receive.result()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                if session.received_bytes + len(message["bytes"]) > MAX_AUDIO_BYTES:
+                    await websocket.send_json({"type": "error", "detail": "Recording too large"})
+                    await websocket.close(code=status.WS_1009_MESSAGE_TOO_BIG)
+                    break
+                session.feed(message["bytes"])
+                new_audio.set()
+            elif message.get("text"):
+                try:
+                    command = json.loads(message["text"])
+                except json.JSONDecodeError:
+                    command = {}
+                if command.get("type") == "stop":
+                    stopping.set()
+                    new_audio.set()
+                    await worker
+                    await _close_if_open(websocket)
+                    break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        worker.cancel()
+
+
+async def _close_if_open(websocket: WebSocket, code: int = status.WS_1000_NORMAL_CLOSURE):
+    """Close the socket unless the transcription worker already closed it."""
+    if websocket.application_state == WebSocketState.CONNECTED:
+        await websocket.close(code=code)
+
+
+async def _stream_transcription(
+    websocket: WebSocket,
+    session: StreamingTranscriber,
+    new_audio: asyncio.Event,
+    stopping: asyncio.Event,
+):
+    """Decode buffered audio whenever a step's worth has arrived.
+
+    Runs apart from the receive loop so slow decodes coalesce incoming
+    chunks instead of queueing one decode per chunk.
+    """
+    try:
+        while not stopping.is_set():
+            await new_audio.wait()
+            new_audio.clear()
+            if session.ready() and not stopping.is_set():
+                for event in await engine.run(session.process, wait=True):
+                    await websocket.send_json(event)
+        for event in await engine.run(session.process, True, wait=True):
+            await websocket.send_json(event)
+        await websocket.send_json({"type": "done", **session.result()})
+    except Exception as e:
+        logger.error("Streaming transcription failed: %s", e)
+        with suppress(Exception):  # the client may already be gone
+            await websocket.send_json({"type": "error", "detail": f"Transcription failed: {str(e)}"})
+            await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+
+
 @router.post("/generate-note", response_model=NoteGenerationResponse)
 async def generate_note_endpoint(
     request: NoteGenerationRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Generate a SOAP note from a transcript."""
     if not request.transcript.strip():
         raise HTTPException(400, "Transcript cannot be empty")
 
     try:
-        note = generate_note(request.transcript)
+        note = await generate_note(request.transcript)
 
         # Save encounter and note to database
         encounter_id = str(uuid.uuid4())
@@ -92,14 +335,58 @@ async def generate_note_endpoint(
             icd10_codes=note.icd10_codes,
         )
         db.add(note_record)
-        db.commit()
+        await db.commit()
 
         return NoteGenerationResponse(note=note, encounter_id=encounter_id)
+    except SQLAlchemyError:
+        raise  # the app-level handler turns an unavailable database into a 503
     except Exception as e:
         logger.error("Note generation failed: %s", e)
         raise HTTPException(500, f"Note generation failed: {str(e)}")
 
 
+@router.post("/document", response_model=DocumentationResponse)
+async def document_endpoint(
+    request: DocumentationRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """Generate a SOAP note and its ICD-10/CPT codes from a transcript in one pass."""
+    if not request.transcript.strip():
+        raise HTTPException(400, "Transcript cannot be empty")
+
+    try:
+        note, codes = await generate_documentation(request.transcript, request.encounter_type)
+
+        encounter_id = str(uuid.uuid4())
+        note_id = str(uuid.uuid4())
+        db.add(Encounter(
+            id=encounter_id,
+            patient_id=request.patient_id or "unknown",
+            encounter_type=request.encounter_type,
+            transcript=request.transcript,
+            status="documented",
+        ))
+        db.add(ClinicalNote(
+            id=note_id,
+            encounter_id=encounter_id,
+            subjective=note.subjective,
+            objective=note.objective,
+            assessment=note.assessment,
+            plan=note.plan,
+            raw_text=note.raw_text,
+            icd10_codes=[c.model_dump() for c in codes.icd10_codes],
+            cpt_codes=[c.model_dump() for c in codes.cpt_codes],
+        ))
+        await db.commit()
+
+        return DocumentationResponse(note=note, codes=codes, encounter_id=encounter_id, note_id=note_id)
+    except SQLAlchemyError:
+        raise
+    except Exception as e:
+        logger.error("Documentation failed: %s", e)
+        raise HTTPException(500, f"Documentation failed: {str(e)}")
+
+
 @router.post("/suggest-codes", response_model=CodeSuggestionResponse)
 async def suggest_codes_endpoint(request: CodeSuggestionRequest):
     """Suggest ICD-10 and CPT codes from a clinical note."""
@@ -107,26 +394,39 @@ async def suggest_codes_endpoint(request: CodeSuggestionRequest):
         raise HTTPException(400, "Note text cannot be empty")
 
     try:
-        return suggest_codes(request.note_text, request.encounter_type)
+        return await suggest_codes(request.note_text, request.encounter_type)
     except Exception as e:
         logger.error("Code suggestion failed: %s", e)
         raise HTTPException(500, f"Code suggestion failed: {str(e)}")
 
 
+@router.get("/codes/search")
+async def search_codes(
+    q: str = Query(..., min_length=1, max_length=100),
+    system: str = Query("icd10", pattern="^(icd10|cpt)$"),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Autocomplete codes by code prefix or description words from the local index."""
+    index = get_icd10_index() if system == "icd10" else get_cpt_index()
+    if index is None:
+        raise HTTPException(404, f"No {system.upper()} code index is configured")
+    return index.search(q, limit)
+
+
 @router.get("/encounters")
 async def list_encounters(
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """List encounters, filtered by hospital_id for hospital admins."""
     hospital_id = get_hospital_id(current_user)
 
-    query = db.query(Encounter)
+    query = select(Encounter)
     if hospital_id:
-        query = query.join(Patient, Encounter.patient_id == Patient.id).filter(
+        query = query.join(Patient, Encounter.patient_id == Patient.id).where(
             Patient.hospital_id == hospital_id
         )
-    encounters = query.order_by(Encounter.date.desc()).limit(50).all()
+    encounters = (await db.scalars(query.order_by(Encounter.date.desc()).limit(50))).all()
 
     return [
         {
@@ -140,27 +440,93 @@ async def list_encounters(
     ]
 
 
+NOTE_SUMMARY_COLUMNS = (
+    ClinicalNote.id,
+    ClinicalNote.version,
+    ClinicalNote.status,
+    ClinicalNote.ai_generated,
+    ClinicalNote.provider_edited,
+    ClinicalNote.created_at,
+    ClinicalNote.updated_at,
+)
+
+
+def _note_summary(note: ClinicalNote) -> dict:
+    return {
+        "id": note.id,
+        "version": note.version,
+        "status": note.status,
+        "ai_generated": note.ai_generated,
+        "provider_edited": note.provider_edited,
+        "created_at": note.created_at.isoformat(),
+        "updated_at": note.updated_at.isoformat() if note.updated_at else None,
+    }
+
+
+def _note_detail(note: ClinicalNote) -> dict:
+    return {
+        **_note_summary(note),
+        "subjective": note.subjective,
+        "objective": note.objective,
+        "assessment": note.assessment,
+        "plan": note.plan,
+        "raw_text": note.raw_text,
+        "icd10_codes": note.icd10_codes,
+        "cpt_codes": note.cpt_codes,
+    }
+
+
+async def _get_accessible_note(
+    db: AsyncSession, note_id: str, current_user: dict, columns=None
+) -> ClinicalNote:
+    query = select(ClinicalNote).where(ClinicalNote.id == note_id)
+    if columns:
+        query = query.options(load_only(*columns))
+    note = await db.scalar(query)
+    if not note:
+        raise HTTPException(404, "Note not found")
+
+    # Verify hospital access
+    hospital_id = get_hospital_id(current_user)
+    if hospital_id:
+        encounter = await db.get(Encounter, note.encounter_id)
+        if encounter:
+            patient = await db.get(Patient, encounter.patient_id)
+            if not patient or patient.hospital_id != hospital_id:
+                raise HTTPException(403, "Access denied to this note")
+    return note
+
+
 @router.get("/encounters/{encounter_id}")
 async def get_encounter(
     encounter_id: str,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    """Get encounter details with notes. Verifies hospital access."""
-    encounter = db.query(Encounter).filter(Encounter.id == encounter_id).first()
+    """Get encounter details with notes. Verifies hospital access.
+
+    Only the most recently generated note is returned with its text;
+    earlier ones (e.g. replaced by a backfill) are listed without it.
+    ``version`` counts edits within a note, so it does not order notes.
+    """
+    encounter = await db.get(Encounter, encounter_id)
     if not encounter:
         raise HTTPException(404, "Encounter not found")
 
     # Verify hospital access
     hospital_id = get_hospital_id(current_user)
     if hospital_id:
-        patient = db.query(Patient).filter(Patient.id == encounter.patient_id).first()
+        patient = await db.get(Patient, encounter.patient_id)
         if not patient or patient.hospital_id != hospital_id:
             raise HTTPException(403, "Access denied to this encounter")
 
-    notes = db.query(ClinicalNote).filter(
-        ClinicalNote.encounter_id == encounter_id
-    ).order_by(ClinicalNote.version.desc()).all()
+    notes = (await db.scalars(
+        select(ClinicalNote)
+        .options(load_only(*NOTE_SUMMARY_COLUMNS))
+        .where(ClinicalNote.encounter_id == encounter_id)
+        .order_by(ClinicalNote.created_at.desc())
+    )).all()
+    latest = await db.get(ClinicalNote, notes[0].id, populate_existing=True) if notes else None
 
     return {
         "id": encounter.id,
@@ -169,23 +535,7 @@ async def get_encounter(
         "date": encounter.date.isoformat(),
         "transcript": encounter.transcript,
         "status": encounter.status,
-        "notes": [
-            {
-                "id": n.id,
-                "version": n.version,
-                "subjective": n.subjective,
-                "objective": n.objective,
-                "assessment": n.assessment,
-                "plan": n.plan,
-                "icd10_codes": n.icd10_codes,
-                "cpt_codes": n.cpt_codes,
-                "status": n.status,
-                "ai_generated": n.ai_generated,
-                "provider_edited": n.provider_edited,
-                "created_at": n.created_at.isoformat(),
-            }
-            for n in notes
-        ],
+        "notes": ([_note_detail(latest)] if latest else []) + [_note_summary(n) for n in notes[1:]],
     }
 
 
@@ -194,25 +544,112 @@ async def update_note(
     note_id: str,
     request: NoteUpdateRequest,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    """Update a clinical note (provider review/edit)."""
-    note = db.query(ClinicalNote).filter(ClinicalNote.id == note_id).first()
-    if not note:
-        raise HTTPException(404, "Note not found")
+    """Update a clinical note (provider review/edit).
 
-    # Verify hospital access
-    hospital_id = get_hospital_id(current_user)
-    if hospital_id:
-        encounter = db.query(Encounter).filter(Encounter.id == note.encounter_id).first()
-        if encounter:
-            patient = db.query(Patient).filter(Patient.id == encounter.patient_id).first()
-            if not patient or patient.hospital_id != hospital_id:
-                raise HTTPException(403, "Access denied to this note")
+    A changed text becomes a new version: the previous one is kept as a
+    reverse diff in ``note_revisions`` and the note row holds the new text.
+    A status-only change updates the current version in place.
+
+    The row is only updated if it is still at the version that was read
+    (or the ``version`` the client edited), so a concurrent edit gets a
+    409 instead of silently overwriting the other one.
+    """
+    note = await _get_accessible_note(db, note_id, current_user)
+    if request.version is not None and request.version != note.version:
+        raise HTTPException(409, "Note has been changed since it was loaded; reload and retry")
+
+    values = {"status": request.status.value, "updated_at": datetime.utcnow()}
+    previous_text = note.raw_text or ""
+    if request.note_text != previous_text:
+        db.add(NoteRevision(
+            note_id=note.id,
+            version=note.version,
+            diff=reverse_diff(request.note_text, previous_text),
+            status=note.status,
+            provider_edited=note.provider_edited,
+            edited_by=current_user.get("sub"),
+            created_at=note.updated_at or note.created_at,
+        ))
+        sections = parse_soap_note(request.note_text)
+        if any(getattr(sections, name) for name in SECTIONS):
+            values.update({name: getattr(sections, name) for name in SECTIONS})
+        values.update(raw_text=request.note_text, version=(note.version or 1) + 1, provider_edited=True)
+
+    result = await db.execute(
+        update(ClinicalNote)
+        .where(ClinicalNote.id == note.id, ClinicalNote.version == note.version)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        await db.rollback()
+        raise HTTPException(409, "Note has been changed since it was loaded; reload and retry")
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Another edit already stored a revision for this version
+        await db.rollback()
+        raise HTTPException(409, "Note has been changed since it was loaded; reload and retry")
 
-    note.raw_text = request.note_text
-    note.status = request.status.value
-    note.provider_edited = True
-    db.commit()
+    version = values.get("version", note.version)
+    return {"message": "Note updated", "note_id": note_id, "version": version, "status": values["status"]}
 
-    return {"message": "Note updated", "note_id": note_id, "status": note.status}
+
+@router.get("/notes/{note_id}/versions")
+async def list_note_versions(
+    note_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """List a note's versions, newest first, without their text."""
+    note = await _get_accessible_note(
+        db, note_id, current_user, columns=NOTE_SUMMARY_COLUMNS + (ClinicalNote.encounter_id,)
+    )
+    revisions = (await db.scalars(
+        select(NoteRevision)
+        .options(defer(NoteRevision.diff))
+        .where(NoteRevision.note_id == note_id)
+        .order_by(NoteRevision.version.desc())
+    )).all()
+    current = {**_note_summary(note), "current": True}
+    return [current] + [
+        {
+            "version": r.version,
+            "status": r.status,
+            "provider_edited": r.provider_edited,
+            "edited_by": r.edited_by,
+            "created_at": r.created_at.isoformat() if r.created_at else None,
+            "superseded_at": r.superseded_at.isoformat() if r.superseded_at else None,
+            "current": False,
+        }
+        for r in revisions
+    ]
+
+
+@router.get("/notes/{note_id}/versions/{version}")
+async def get_note_version(
+    note_id: str,
+    version: int,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Reconstruct the text of an earlier note version."""
+    note = await _get_accessible_note(db, note_id, current_user)
+    if version == note.version:
+        return {"note_id": note_id, "version": version, "raw_text": note.raw_text, "status": note.status}
+
+    revisions = (await db.scalars(
+        select(NoteRevision)
+        .where(NoteRevision.note_id == note_id, NoteRevision.version >= version)
+        .order_by(NoteRevision.version.desc())
+    )).all()
+    if not revisions or revisions[-1].version != version:
+        raise HTTPException(404, "Note version not found")
+    return {
+        "note_id": note_id,
+        "version": version,
+        "raw_text": reconstruct(note.raw_text or "", revisions, version),
+        "status": revisions[-1].status,
+    }
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+"""Incremental transcription of live PCM audio on a sliding window."""
+
+import functools
+import logging
+import threading
+from typing import Callable
+
+from config import settings
+from modules.ambient_doc.transcriber import get_whisper_model, get_profile
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+BYTES_PER_SECOND = SAMPLE_RATE * 2  # PCM16 mono
+
+# (pcm16 bytes, language, prompt) -> [{"start", "end", "text"}] relative to the buffer
+SegmentFn = Callable[[bytes, str, str], list[dict]]
+
+
+def whisper_segments(pcm: bytes, language: str, prompt: str = "", profile: str | None = None) -> list[dict]:
+    """Run faster-whisper over a PCM16 buffer with the profile's model.
+
+    Decoding is greedy because every window is decoded again on each step;
+    the VAD filter is what splits the window into segments we can finalize.
+    """
+    import numpy as np
+
+    model = get_whisper_model(get_profile(profile)["model_size"])
+    if model is None:
+        raise RuntimeError("Whisper model not available — faster-whisper is not installed on this server")
+    audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    segments, _ = model.transcribe(
+        audio,
+        language=language,
+        beam_size=1,
+        initial_prompt=prompt or None,
+        condition_on_previous_text=False,
+        vad_filter=True,
+        vad_parameters=dict(min_silence_duration_ms=int(settings.STREAM_SILENCE_SECONDS * 1000)),
+    )
+    return [
+        {"start": s.start, "end": s.end, "text": s.text.strip()}
+        for s in segments
+        if s.text.strip()
+    ]
+
+
+class StreamingTranscriber:
+    """Sliding-window transcriber for one live recording.
+
+    Audio accumulates in a buffer that starts at the end of the last final
+    segment. Each ``process`` call decodes the whole buffer: segments that
+    are followed by at least ``STREAM_SILENCE_SECONDS`` of silence are
+    final and are cut from the buffer; the rest is reported as a partial
+    that may still change. ``feed`` may be called from the event loop while
+    ``process`` runs in a worker thread.
+    """
+
+    def __init__(
+        self,
+        language: str = "en",
+        profile: str | None = None,
+        segment_fn: SegmentFn | None = None,
+    ):
+        self.language = language
+        self._segment_fn = segment_fn or functools.partial(whisper_segments, profile=profile)
+        self._buffer = bytearray()
+        self._offset = 0.0  # stream time of the first buffered sample
+        self._pending = 0  # bytes fed since the last decode
+        self._lock = threading.Lock()
+        self.received_bytes = 0
+        self.segments: list[dict] = []
+
+    def feed(self, pcm: bytes) -> None:
+        """Append a chunk of 16 kHz mono PCM16 (little-endian) audio."""
+        with self._lock:
+            self._buffer.extend(pcm)
+            self._pending += len(pcm)
+            self.received_bytes += len(pcm)
+
+    def ready(self) -> bool:
+        """True once enough new audio has arrived to be worth decoding."""
+        with self._lock:
+            return self._pending >= settings.STREAM_STEP_SECONDS * BYTES_PER_SECOND
+
+    def process(self, flush: bool = False) -> list[dict]:
+        """Decode the buffer and return ``final``/``partial`` events.
+
+        With ``flush`` every segment is finalized (end of recording).
+        """
+        with self._lock:
+            pcm = bytes(self._buffer[: len(self._buffer) - len(self._buffer) % 2])
+            self._pending = 0
+        if not pcm:
+            return []
+
+        duration = len(pcm) / BYTES_PER_SECOND
+        prompt = " ".join(s["text"] for s in self.segments[-3:])
+        segments = self._segment_fn(pcm, self.language, prompt)
+
+        if flush:
+            final, partial = segments, []
+        else:
+            closed_before = duration - settings.STREAM_SILENCE_SECONDS
+            count = 0
+            while count < len(segments) and segments[count]["end"] <= closed_before:
+                count += 1
+            if duration >= settings.STREAM_WINDOW_SECONDS and count == 0 and segments:
+                # No pause in a full window: commit all but the newest segment
+                count = max(len(segments) - 1, 1)
+            final, partial = segments[:count], segments[count:]
+
+        if final:
+            cut = final[-1]["end"]
+        elif not segments and not flush:
+            cut = max(duration - settings.STREAM_SILENCE_SECONDS, 0.0)  # drop leading silence
+        else:
+            cut = duration if flush else 0.0
+
+        events = []
+        for segment in final:
+            committed = self._absolute(segment)
+            self.segments.append(committed)
+            events.append({"type": "final", **committed})
+        if partial:
+            events.append({
+                "type": "partial",
+                "start": round(self._offset + partial[0]["start"], 2),
+                "end": round(self._offset + partial[-1]["end"], 2),
+                "text": " ".join(s["text"] for s in partial),
+            })
+
+        cut_bytes = min(int(cut * BYTES_PER_SECOND) // 2 * 2, len(pcm))
+        with self._lock:
+            del self._buffer[:cut_bytes]
+        self._offset += cut_bytes / BYTES_PER_SECOND
+        return events
+
+    def _absolute(self, segment: dict) -> dict:
+        return {
+            "start": round(self._offset + segment["start"], 2),
+            "end": round(self._offset + segment["end"], 2),
+            "text": segment["text"],
+        }
+
+    def result(self) -> dict:
+        """Full transcript so far, shaped like ``transcribe_audio`` output."""
+        return {
+            "transcript": " ".join(s["text"] for s in self.segments),
+            "language": self.language,
+            "duration_seconds": round(self.received_bytes / BYTES_PER_SECOND, 2),
+            "segments": list(self.segments),
+        }
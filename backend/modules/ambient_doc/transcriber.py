@@ -3,91 +3,308 @@ from __future__ import annotations
 """Whisper-based local speech-to-text transcription."""
 
 import logging
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from config import settings
+from modules.ambient_doc.preprocess import SAMPLE_RATE, prepare_audio
 
 logger = logging.getLogger(__name__)
 
-_model = None
+# Decoding settings per quality/speed profile; "balanced" matches the
+# original single-model behaviour.
+PROFILES: dict[str, dict] = {
+    "fast": {
+        "model_size": settings.WHISPER_FAST_MODEL,
+        "beam_size": 1,
+        "vad_filter": True,
+        "min_silence_duration_ms": 300,
+    },
+    "balanced": {
+        "model_size": settings.WHISPER_MODEL_SIZE,
+        "beam_size": 5,
+        "vad_filter": True,
+        "min_silence_duration_ms": 500,
+    },
+    "accurate": {
+        "model_size": settings.WHISPER_ACCURATE_MODEL,
+        "beam_size": 5,
+        "vad_filter": True,
+        "min_silence_duration_ms": 1000,
+    },
+}
 
+# Approximate resident size (MB) of each model at int8, used for the memory budget
+MODEL_MEMORY_MB = {
+    "tiny": 75,
+    "base": 150,
+    "small": 500,
+    "medium": 1500,
+    "large-v1": 3000,
+    "large-v2": 3000,
+    "large-v3": 3000,
+    "large-v3-turbo": 1600,
+    "turbo": 1600,
+    "distil-large-v3": 1500,
+}
 
-def get_whisper_model():
-    """Lazy-load the Whisper model."""
+
+def get_profile(name: str | None) -> dict:
+    """Look up a transcription profile; ``None`` means the configured default."""
+    name = name or settings.TRANSCRIPTION_DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown transcription profile '{name}'. Choose from: {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+def resolve_profile(requested: str | None, hospital_id: str | None) -> str:
+    """Pick the profile for a request: explicit choice, then hospital, then default."""
+    name = (
+        requested
+        or settings.TRANSCRIPTION_HOSPITAL_PROFILES.get(hospital_id or "")
+        or settings.TRANSCRIPTION_DEFAULT_PROFILE
+    )
+    get_profile(name)
+    return name
+
+
+class ModelCache:
+    """Keeps Whisper models resident under a memory budget, evicting LRU.
+
+    A model evicted while a transcription is still using it stays alive
+    until that call returns; it is only dropped from the cache. The budget
+    never evicts the model just requested, so one oversized model still
+    loads.
+    """
+
+    def __init__(self, budget_mb: int, loader=None):
+        self.budget_mb = budget_mb
+        self._loader = loader or _load_model
+        self._models: OrderedDict[str, object] = OrderedDict()
+        self._loading: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_size: str):
+        with self._lock:
+            model = self._models.get(model_size)
+            if model is not None:
+                self._models.move_to_end(model_size)
+                return model
+            loading = self._loading.setdefault(model_size, threading.Lock())
+        # Load under a per-size lock so concurrent requests for the same model
+        # wait for one load while lookups of resident models carry on.
+        with loading:
+            with self._lock:
+                model = self._models.get(model_size)
+            if model is None:
+                model = self._loader(model_size)
+            with self._lock:
+                self._models[model_size] = model
+                self._models.move_to_end(model_size)
+                if self._loading.get(model_size) is loading:
+                    del self._loading[model_size]
+                while len(self._models) > 1 and self.resident_mb() > self.budget_mb:
+                    evicted, _ = self._models.popitem(last=False)
+                    logger.info("Evicted Whisper model %s to stay within %d MB", evicted, self.budget_mb)
+            return model
+
+    def resident_mb(self) -> int:
+        return sum(MODEL_MEMORY_MB.get(size, 1000) for size in self._models)
+
+    def __contains__(self, model_size: str) -> bool:
+        return model_size in self._models
+
+
+def _load_model(model_size: str):
+    from faster_whisper import WhisperModel
+
+    logger.info(
+        "Loading Whisper model: %s (device=%s, compute=%s)",
+        model_size,
+        settings.WHISPER_DEVICE,
+        settings.WHISPER_COMPUTE_TYPE,
+    )
+    model = WhisperModel(
+        model_size,
+        device=settings.WHISPER_DEVICE,
+        compute_type=settings.WHISPER_COMPUTE_TYPE,
+        cpu_threads=settings.WHISPER_CPU_THREADS,
+        num_workers=settings.TRANSCRIBE_WORKERS,
+    )
+    logger.info("Whisper model loaded successfully")
+    return model
+
+
+_models = ModelCache(settings.WHISPER_MODEL_MEMORY_MB)
+
+
+def get_whisper_model(model_size: str | None = None):
+    """Return a resident Whisper model, loading it on first use."""
     try:
-        from faster_whisper import WhisperModel
+        import faster_whisper  # noqa: F401
     except ImportError:
         logger.warning("faster-whisper not installed — transcription unavailable")
         return None
-    global _model
-    if _model is None:
-        logger.info(
-            "Loading Whisper model: %s (device=%s, compute=%s)",
-            settings.WHISPER_MODEL_SIZE,
-            settings.WHISPER_DEVICE,
-            settings.WHISPER_COMPUTE_TYPE,
-        )
-        _model = WhisperModel(
-            settings.WHISPER_MODEL_SIZE,
-            device=settings.WHISPER_DEVICE,
-            compute_type=settings.WHISPER_COMPUTE_TYPE,
-        )
-        logger.info("Whisper model loaded successfully")
-    return _model
+    return _models.get(model_size or settings.WHISPER_MODEL_SIZE)
+
+
+def _require_model(profile: dict):
+    model = get_whisper_model(profile["model_size"])
+    if model is None:
+        raise RuntimeError("Whisper model not available — faster-whisper is not installed on this server")
+    return model
+
+
+def _decode_options(profile: dict) -> dict:
+    return dict(
+        beam_size=profile["beam_size"],
+        vad_filter=profile["vad_filter"],  # Filter out non-speech
+        vad_parameters=dict(min_silence_duration_ms=profile["min_silence_duration_ms"]),
+    )
 
 
 def transcribe_audio(
     audio_path: str | Path,
     language: str = "en",
+    profile: str | None = None,
 ) -> dict:
     """Transcribe an audio file to text.
 
     Args:
         audio_path: Path to the audio file.
         language: Language code for transcription.
+        profile: Quality/speed profile name (default from settings).
 
     Returns:
         Dict with transcript, language, duration, and segments.
     """
-    model = get_whisper_model()
-    if model is None:
-        raise RuntimeError("Whisper model not available — faster-whisper is not installed on this server")
     audio_path = Path(audio_path)
-
     if not audio_path.exists():
         raise FileNotFoundError(f"Audio file not found: {audio_path}")
 
-    logger.info("Transcribing: %s", audio_path.name)
+    options = get_profile(profile)
+    model = _require_model(options)
 
+    logger.info("Transcribing: %s (model=%s)", audio_path.name, options["model_size"])
+
+    prepared = prepare_audio(audio_path)
     segments, info = model.transcribe(
-        str(audio_path),
+        prepared.audio,
         language=language,
-        beam_size=5,
-        vad_filter=True,  # Filter out non-speech
-        vad_parameters=dict(min_silence_duration_ms=500),
+        **_decode_options(options),
     )
 
-    # Collect all segments
-    transcript_parts = []
-    segment_list = []
-    for segment in segments:
-        transcript_parts.append(segment.text.strip())
-        segment_list.append({
-            "start": round(segment.start, 2),
-            "end": round(segment.end, 2),
-            "text": segment.text.strip(),
-        })
-
-    full_transcript = " ".join(transcript_parts)
+    segment_list = prepared.restore(_collect_segments(segments))
+    full_transcript = " ".join(s["text"] for s in segment_list)
 
     logger.info(
-        "Transcription complete: %.1fs audio, %d segments",
-        info.duration,
+        "Transcription complete: %.1fs audio (%.1fs decoded), %d segments",
+        prepared.duration,
+        prepared.processed_duration,
         len(segment_list),
     )
 
     return {
         "transcript": full_transcript,
         "language": info.language,
-        "duration_seconds": round(info.duration, 2),
+        "duration_seconds": round(prepared.duration, 2),
         "segments": segment_list,
     }
+
+
+def _collect_segments(segments, offset: float = 0.0) -> list[dict]:
+    """Materialize faster-whisper segments, shifting timestamps by ``offset``."""
+    return [
+        {
+            "start": round(offset + segment.start, 2),
+            "end": round(offset + segment.end, 2),
+            "text": segment.text.strip(),
+        }
+        for segment in segments
+    ]
+
+
+# --- Chunked transcription of long recordings ---
+
+
+def plan_chunks(speech: list[dict], total_samples: int, target_samples: int) -> list[tuple[int, int]]:
+    """Group VAD speech spans into chunks of roughly ``target_samples``.
+
+    Cuts are placed in the middle of a silence gap, never inside speech, so
+    no word is split between chunks. A single span longer than the target
+    becomes its own chunk. Returns ``(start, end)`` sample ranges covering
+    the recording; empty when there is no speech at all.
+    """
+    if not speech:
+        return []
+    chunks = []
+    chunk_start = 0
+    for current, following in zip(speech, speech[1:]):
+        if following["start"] - chunk_start >= target_samples:
+            cut = (current["end"] + following["start"]) // 2
+            chunks.append((chunk_start, cut))
+            chunk_start = cut
+    chunks.append((chunk_start, total_samples))
+    return chunks
+
+
+def stitch_chunks(chunk_segments: list[list[dict]], duration: float, language: str) -> dict:
+    """Join per-chunk segments (already offset) into ``transcribe_audio``'s shape."""
+    segment_list = [s for segments in chunk_segments for s in segments]
+    return {
+        "transcript": " ".join(s["text"] for s in segment_list),
+        "language": language,
+        "duration_seconds": round(duration, 2),
+        "segments": segment_list,
+    }
+
+
+def load_chunks(audio_path: str | Path, chunk_seconds: float, profile: str | None = None):
+    """Prepare a recording and plan its chunks.
+
+    Returns ``(prepared, chunks)``; chunk ranges index ``prepared.audio``.
+    """
+    audio_path = Path(audio_path)
+    if not audio_path.exists():
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+    _require_model(get_profile(profile))
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    prepared = prepare_audio(audio_path)
+    speech = get_speech_timestamps(prepared.audio, VadOptions(min_silence_duration_ms=500))
+    chunks = plan_chunks(speech, len(prepared.audio), int(chunk_seconds * SAMPLE_RATE))
+    logger.info(
+        "Split %s (%.1fs) into %d chunks",
+        audio_path.name,
+        prepared.processed_duration,
+        len(chunks),
+    )
+    return prepared, chunks
+
+
+def transcribe_samples(
+    audio,
+    language: str = "en",
+    offset: float = 0.0,
+    profile: str | None = None,
+) -> list[dict]:
+    """Transcribe one chunk of decoded audio; timestamps are shifted by ``offset``."""
+    options = get_profile(profile)
+    segments, _ = _require_model(options).transcribe(audio, language=language, **_decode_options(options))
+    return [s for s in _collect_segments(segments, offset) if s["text"]]
+
+
+def warm_up_model(profile: str | None = None) -> bool:
+    """Load a profile's model and run one short decode so the first request is not slow.
+
+    Returns False when faster-whisper is not installed.
+    """
+    model = get_whisper_model(get_profile(profile)["model_size"])
+    if model is None:
+        return False
+    import numpy as np
+
+    segments, _ = model.transcribe(np.zeros(16000, dtype=np.float32), beam_size=1)
+    list(segments)  # decoding is lazy
+    logger.info("Whisper model warmed up")
+    return True
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+"""Reverse line diffs for compact clinical note history."""
+
+import difflib
+
+
+def reverse_diff(new_text: str, old_text: str) -> list[list]:
+    """Edits that turn ``new_text`` back into ``old_text``.
+
+    Each entry is ``[start, end, lines]``: replace lines ``start:end`` of
+    the new text with ``lines``. Unchanged lines are not stored, so a small
+    edit to a long note costs a few lines.
+    """
+    new_lines = new_text.splitlines(keepends=True)
+    old_lines = old_text.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, new_lines, old_lines, autojunk=False)
+    return [
+        [i1, i2, old_lines[j1:j2]]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def apply_diff(text: str, diff: list[list]) -> str:
+    """Apply a ``reverse_diff`` result to the text it was computed from."""
+    lines = text.splitlines(keepends=True)
+    for start, end, replacement in reversed(diff):
+        lines[start:end] = replacement
+    return "".join(lines)
+
+
+def reconstruct(latest_text: str, revisions: list, version: int) -> str:
+    """Text of ``version`` from the latest text and revisions newest-first.
+
+    Only the diffs between the latest version and the requested one are
+    applied.
+    """
+    text = latest_text
+    for revision in revisions:
+        if revision.version < version:
+            break
+        text = apply_diff(text, revision.diff)
+    return text
@@ -3,7 +3,9 @@
 import logging
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
 from database.db import get_db
 from database.schemas import AdminUser
@@ -19,9 +21,13 @@ class LoginRequest(BaseModel):
 
 
 @router.post("/login")
-async def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
     """Authenticate and return a JWT."""
-    user = db.query(AdminUser).filter(AdminUser.username == request.username).first()
+    user = await db.scalar(
+        select(AdminUser)
+        .options(joinedload(AdminUser.hospital))
+        .where(AdminUser.username == request.username)
+    )
 
     if not user or not verify_password(request.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid username or password")
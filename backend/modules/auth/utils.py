@@ -8,6 +8,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from config import settings
+from modules.shared.llm_scheduler import llm_tenant
 
 security = HTTPBearer()
 
@@ -55,3 +56,12 @@ def get_hospital_id(user: dict) -> Optional[str]:
     if user.get("role") == "super_admin":
         return None
     return user.get("hospital_id")
+
+
+async def bind_llm_tenant(current_user: dict = Depends(get_current_user)) -> dict:
+    """FastAPI dependency — attributes this request's LLM calls to the user's hospital.
+
+    Async so the context variable is set in the task that runs the endpoint.
+    """
+    llm_tenant.set(get_hospital_id(current_user))
+    return current_user
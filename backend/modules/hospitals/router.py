@@ -5,8 +5,8 @@ import logging
 from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.db import get_db
 from database.schemas import Hospital, AdminUser, Patient, gen_id
@@ -43,6 +43,34 @@ class HospitalAdminCreate(BaseModel):
     password: str = Field(..., min_length=6)
 
 
+def _counts_by_hospital(model):
+    """``(hospital_id, n)`` rows for ``model``, as a subquery to join on."""
+    return select(model.hospital_id, func.count().label("n")).group_by(model.hospital_id).subquery()
+
+
+def _hospitals_with_counts():
+    """All hospitals with their admin and patient counts in one statement."""
+    admin_counts = _counts_by_hospital(AdminUser)
+    patient_counts = _counts_by_hospital(Patient)
+    return (
+        select(
+            Hospital,
+            func.coalesce(admin_counts.c.n, 0).label("admin_count"),
+            func.coalesce(patient_counts.c.n, 0).label("patient_count"),
+        )
+        .outerjoin(admin_counts, admin_counts.c.hospital_id == Hospital.id)
+        .outerjoin(patient_counts, patient_counts.c.hospital_id == Hospital.id)
+    )
+
+
+def _hospital_with_counts(hospital_id: str):
+    """One hospital with its counts; correlated so only its rows are counted."""
+    def count(model):
+        return select(func.count()).where(model.hospital_id == Hospital.id).scalar_subquery()
+
+    return select(Hospital, count(AdminUser), count(Patient)).where(Hospital.id == hospital_id)
+
+
 def _slugify(name: str) -> str:
     """Convert a hospital name to a URL-friendly slug."""
     slug = name.lower().strip()
@@ -53,14 +81,12 @@ def _slugify(name: str) -> str:
 # --- Endpoints ---
 
 @router.get("")
-async def list_hospitals(db: Session = Depends(get_db)):
+async def list_hospitals(db: AsyncSession = Depends(get_db)):
     """List all hospitals with admin and patient counts."""
-    hospitals = db.query(Hospital).order_by(Hospital.created_at.desc()).all()
+    rows = await db.execute(_hospitals_with_counts().order_by(Hospital.created_at.desc()))
 
     result = []
-    for h in hospitals:
-        admin_count = db.query(func.count(AdminUser.id)).filter(AdminUser.hospital_id == h.id).scalar()
-        patient_count = db.query(func.count(Patient.id)).filter(Patient.hospital_id == h.id).scalar()
+    for h, admin_count, patient_count in rows:
         result.append({
             "id": h.id,
             "name": h.name,
@@ -77,11 +103,11 @@ async def list_hospitals(db: Session = Depends(get_db)):
 
 
 @router.post("", status_code=201)
-async def create_hospital(request: HospitalCreate, db: Session = Depends(get_db)):
+async def create_hospital(request: HospitalCreate, db: AsyncSession = Depends(get_db)):
     """Create a new hospital."""
     slug = request.slug or _slugify(request.name)
 
-    if db.query(Hospital).filter(Hospital.slug == slug).first():
+    if await db.scalar(select(Hospital.id).where(Hospital.slug == slug)):
         raise HTTPException(400, f"Hospital with slug '{slug}' already exists")
 
     hospital = Hospital(
@@ -93,8 +119,8 @@ async def create_hospital(request: HospitalCreate, db: Session = Depends(get_db)
         email=request.email,
     )
     db.add(hospital)
-    db.commit()
-    db.refresh(hospital)
+    await db.commit()
+    await db.refresh(hospital)
 
     return {
         "id": hospital.id,
@@ -109,14 +135,12 @@ async def create_hospital(request: HospitalCreate, db: Session = Depends(get_db)
 
 
 @router.get("/{hospital_id}")
-async def get_hospital(hospital_id: str, db: Session = Depends(get_db)):
+async def get_hospital(hospital_id: str, db: AsyncSession = Depends(get_db)):
     """Get hospital detail."""
-    hospital = db.query(Hospital).filter(Hospital.id == hospital_id).first()
-    if not hospital:
+    row = (await db.execute(_hospital_with_counts(hospital_id))).first()
+    if not row:
         raise HTTPException(404, "Hospital not found")
-
-    admin_count = db.query(func.count(AdminUser.id)).filter(AdminUser.hospital_id == hospital_id).scalar()
-    patient_count = db.query(func.count(Patient.id)).filter(Patient.hospital_id == hospital_id).scalar()
+    hospital, admin_count, patient_count = row
 
     return {
         "id": hospital.id,
@@ -134,17 +158,17 @@ async def get_hospital(hospital_id: str, db: Session = Depends(get_db)):
 
 
 @router.put("/{hospital_id}")
-async def update_hospital(hospital_id: str, request: HospitalUpdate, db: Session = Depends(get_db)):
+async def update_hospital(hospital_id: str, request: HospitalUpdate, db: AsyncSession = Depends(get_db)):
     """Update a hospital."""
-    hospital = db.query(Hospital).filter(Hospital.id == hospital_id).first()
+    hospital = await db.get(Hospital, hospital_id)
     if not hospital:
         raise HTTPException(404, "Hospital not found")
 
     for field, value in request.model_dump(exclude_unset=True).items():
         setattr(hospital, field, value)
 
-    db.commit()
-    db.refresh(hospital)
+    await db.commit()
+    await db.refresh(hospital)
 
     return {
         "id": hospital.id,
@@ -158,14 +182,14 @@ async def update_hospital(hospital_id: str, request: HospitalUpdate, db: Session
 
 
 @router.delete("/{hospital_id}")
-async def delete_hospital(hospital_id: str, db: Session = Depends(get_db)):
+async def delete_hospital(hospital_id: str, db: AsyncSession = Depends(get_db)):
     """Soft-delete a hospital (set is_active=False)."""
-    hospital = db.query(Hospital).filter(Hospital.id == hospital_id).first()
+    hospital = await db.get(Hospital, hospital_id)
     if not hospital:
         raise HTTPException(404, "Hospital not found")
 
     hospital.is_active = False
-    db.commit()
+    await db.commit()
     return {"message": "Hospital deactivated", "id": hospital_id}
 
 
@@ -173,14 +197,14 @@ async def delete_hospital(hospital_id: str, db: Session = Depends(get_db)):
 async def create_hospital_admin(
     hospital_id: str,
     request: HospitalAdminCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Create an admin user for a hospital."""
-    hospital = db.query(Hospital).filter(Hospital.id == hospital_id).first()
+    hospital = await db.get(Hospital, hospital_id)
     if not hospital:
         raise HTTPException(404, "Hospital not found")
 
-    if db.query(AdminUser).filter(AdminUser.username == request.username).first():
+    if await db.scalar(select(AdminUser.id).where(AdminUser.username == request.username)):
         raise HTTPException(400, f"Username '{request.username}' already exists")
 
     admin = AdminUser(
@@ -191,7 +215,7 @@ async def create_hospital_admin(
         hospital_id=hospital_id,
     )
     db.add(admin)
-    db.commit()
+    await db.commit()
 
     return {
         "id": admin.id,
@@ -203,13 +227,13 @@ async def create_hospital_admin(
 
 
 @router.get("/{hospital_id}/admins")
-async def list_hospital_admins(hospital_id: str, db: Session = Depends(get_db)):
+async def list_hospital_admins(hospital_id: str, db: AsyncSession = Depends(get_db)):
     """List admin users for a hospital."""
-    hospital = db.query(Hospital).filter(Hospital.id == hospital_id).first()
+    hospital = await db.get(Hospital, hospital_id)
     if not hospital:
         raise HTTPException(404, "Hospital not found")
 
-    admins = db.query(AdminUser).filter(AdminUser.hospital_id == hospital_id).all()
+    admins = (await db.scalars(select(AdminUser).where(AdminUser.hospital_id == hospital_id))).all()
     return [
         {
             "id": a.id,
@@ -2,27 +2,99 @@ from __future__ import annotations
 
 """Claude API wrapper with medical system prompts."""
 
-import json
+import logging
+from typing import AsyncIterator
 import anthropic
 from config import settings
-from modules.shared.medical_prompts import (
-    AMBIENT_DOCUMENTATION_SYSTEM,
-    VIRTUAL_NURSE_SYSTEM,
-    TRIAGE_SYSTEM,
-    CODE_SUGGESTION_SYSTEM,
-    INTAKE_SYSTEM,
-    FOLLOWUP_SYSTEM,
-    SOAP_NOTE_EXAMPLE,
-)
-
-
-class ClaudeClient:
+from modules.shared.llm_base import BaseLLMClient
+from modules.shared.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+class ClaudeClient(BaseLLMClient):
     """Wrapper around the Anthropic Claude API for medical use cases."""
 
+    provider = "claude"
+    retryable_errors = (anthropic.APIConnectionError,)
+
     def __init__(self):
         self.client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+        # Retries of async calls are left to the scheduler so they respect shared budgets
+        self.async_client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY, max_retries=0)
         self.model = settings.CLAUDE_MODEL
         self.max_tokens = settings.CLAUDE_MAX_TOKENS
+        self.prompt_caching = settings.CLAUDE_PROMPT_CACHING
+
+    def _request(
+        self,
+        system: str,
+        messages: list[dict],
+        max_tokens: int | None,
+        temperature: float,
+        system_context: str,
+    ) -> dict:
+        """Build ``messages.create`` kwargs, marking stable prefixes as cacheable.
+
+        The static system prompt gets one cache breakpoint and the last prior
+        conversation turn gets another, so each chat turn reads the prompt and
+        earlier history from cache. Prefixes shorter than the model's minimum
+        cacheable length are simply not cached by the API.
+        """
+        if not self.prompt_caching:
+            if system_context:
+                system = f"{system}\n\n{system_context}"
+            return dict(
+                model=self.model,
+                max_tokens=max_tokens or self.max_tokens,
+                temperature=temperature,
+                system=system,
+                messages=messages,
+            )
+
+        system_blocks = [{"type": "text", "text": system, "cache_control": CACHE_CONTROL}]
+        if system_context:
+            system_blocks.append({"type": "text", "text": system_context})
+
+        if len(messages) > 1 and isinstance(messages[-2]["content"], str):
+            messages = messages[:-2] + [
+                {
+                    "role": messages[-2]["role"],
+                    "content": [
+                        {"type": "text", "text": messages[-2]["content"], "cache_control": CACHE_CONTROL}
+                    ],
+                },
+                messages[-1],
+            ]
+
+        return dict(
+            model=self.model,
+            max_tokens=max_tokens or self.max_tokens,
+            temperature=temperature,
+            system=system_blocks,
+            messages=messages,
+        )
+
+    @staticmethod
+    def _record_usage(usage) -> None:
+        """Log token usage and feed the cache hit/miss counters."""
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        metrics.incr("llm.claude.requests")
+        metrics.incr("llm.claude.input_tokens", usage.input_tokens)
+        metrics.incr("llm.claude.output_tokens", usage.output_tokens)
+        metrics.incr("llm.claude.cache_read_input_tokens", cache_read)
+        metrics.incr("llm.claude.cache_creation_input_tokens", cache_write)
+        metrics.incr("llm.claude.cache_hits" if cache_read else "llm.claude.cache_misses")
+        logger.info(
+            "Claude usage: input=%d cache_read=%d cache_write=%d output=%d",
+            usage.input_tokens,
+            cache_read,
+            cache_write,
+            usage.output_tokens,
+        )
 
     def _call(
         self,
@@ -30,108 +102,67 @@ class ClaudeClient:
         messages: list[dict],
         max_tokens: int | None = None,
         temperature: float = 0.3,
+        system_context: str = "",
     ) -> str:
         """Make a Claude API call."""
         response = self.client.messages.create(
-            model=self.model,
-            max_tokens=max_tokens or self.max_tokens,
-            temperature=temperature,
-            system=system,
-            messages=messages,
+            **self._request(system, messages, max_tokens, temperature, system_context)
         )
+        self._record_usage(response.usage)
         return response.content[0].text
 
-    def generate_soap_note(self, transcript: str) -> str:
-        """Generate a SOAP note from a clinical encounter transcript."""
-        system = AMBIENT_DOCUMENTATION_SYSTEM + "\n\n" + SOAP_NOTE_EXAMPLE
-        messages = [
-            {
-                "role": "user",
-                "content": f"Generate a SOAP note from this encounter transcript:\n\n{transcript}",
-            }
-        ]
-        return self._call(system, messages)
-
-    def suggest_codes(self, note_text: str, encounter_type: str = "office_visit") -> str:
-        """Suggest ICD-10/CPT codes from a clinical note."""
-        messages = [
-            {
-                "role": "user",
-                "content": (
-                    f"Analyze this clinical note and suggest ICD-10 and CPT codes.\n"
-                    f"Encounter type: {encounter_type}\n\n"
-                    f"Clinical Note:\n{note_text}"
-                ),
-            }
-        ]
-        return self._call(CODE_SUGGESTION_SYSTEM, messages)
-
-    def chat(
+    async def _acall(
         self,
-        message: str,
-        history: list[dict],
-        system_prompt: str | None = None,
+        system: str,
+        messages: list[dict],
+        max_tokens: int | None = None,
+        temperature: float = 0.3,
+        system_context: str = "",
     ) -> str:
-        """Send a chat message with conversation history."""
-        system = system_prompt or VIRTUAL_NURSE_SYSTEM
-        messages = history + [{"role": "user", "content": message}]
-        return self._call(system, messages, temperature=0.5)
-
-    def intake_chat(self, message: str, history: list[dict]) -> str:
-        """Chat for patient intake flow."""
-        return self.chat(message, history, system_prompt=INTAKE_SYSTEM)
+        """Make a Claude API call without blocking the event loop."""
+        response = await self.async_client.messages.create(
+            **self._request(system, messages, max_tokens, temperature, system_context)
+        )
+        self._record_usage(response.usage)
+        return response.content[0].text
 
-    def followup_chat(
+    async def _acall_structured(
         self,
-        message: str,
-        history: list[dict],
-        context: str = "",
-    ) -> str:
-        """Chat for post-discharge follow-up."""
-        system = FOLLOWUP_SYSTEM
-        if context:
-            system += f"\n\nPatient context:\n{context}"
-        return self.chat(message, history, system_prompt=system)
-
-    def triage(self, symptoms: str, patient_info: str = "") -> str:
-        """Perform symptom triage."""
-        prompt = f"Assess the following patient:\n\n"
-        if patient_info:
-            prompt += f"Patient info: {patient_info}\n\n"
-        prompt += f"Symptoms: {symptoms}\n\nProvide triage assessment as JSON."
-        messages = [{"role": "user", "content": prompt}]
-        return self._call(TRIAGE_SYSTEM, messages, temperature=0.2)
-
-    def extract_json(self, text: str) -> dict:
-        """Extract JSON from Claude's response, handling markdown code blocks."""
-        # Try direct parse first
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            pass
-        # Try extracting from code block
-        if "```" in text:
-            start = text.find("```")
-            end = text.rfind("```")
-            block = text[start:end]
-            # Remove the opening ``` and optional language tag
-            first_newline = block.find("\n")
-            if first_newline != -1:
-                block = block[first_newline + 1:]
-            try:
-                return json.loads(block)
-            except json.JSONDecodeError:
-                pass
-        # Try finding JSON object in text
-        brace_start = text.find("{")
-        brace_end = text.rfind("}") + 1
-        if brace_start != -1 and brace_end > brace_start:
-            try:
-                return json.loads(text[brace_start:brace_end])
-            except json.JSONDecodeError:
-                pass
+        system: str,
+        messages: list[dict],
+        tool: dict,
+        max_tokens: int | None = None,
+        temperature: float = 0.3,
+    ) -> dict:
+        """Force a single tool call and return its input as the structured result."""
+        response = await self.async_client.messages.create(
+            **self._request(system, messages, max_tokens, temperature, ""),
+            tools=[tool],
+            tool_choice={"type": "tool", "name": tool["name"]},
+        )
+        self._record_usage(response.usage)
+        for block in response.content:
+            if block.type == "tool_use":
+                return block.input
         return {}
 
+    async def _astream(
+        self,
+        system: str,
+        messages: list[dict],
+        max_tokens: int | None = None,
+        temperature: float = 0.3,
+        system_context: str = "",
+    ) -> AsyncIterator[str]:
+        """Stream a Claude completion, yielding text deltas as they arrive."""
+        async with self.async_client.messages.stream(
+            **self._request(system, messages, max_tokens, temperature, system_context)
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+            final = await stream.get_final_message()
+        self._record_usage(final.usage)
+
 
 def get_llm_client():
     """Factory: return GroqClient or ClaudeClient based on LLM_PROVIDER setting."""
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+"""Token-budgeted conversation windows for long chat sessions."""
+
+import re
+
+# Rough English average for Claude/Llama tokenizers; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for budgeting (no tokenizer round trip)."""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def window_history(history: list[dict], budget_tokens: int) -> tuple[list[dict], list[dict]]:
+    """Split history into (older, recent) so ``recent`` fits the token budget.
+
+    The window always starts on a user turn so the provider sees a well-formed
+    conversation, and the most recent exchange is kept even if it alone
+    exceeds the budget.
+    """
+    used = 0
+    start = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        used += estimate_tokens(history[i]["content"])
+        if used > budget_tokens and start < len(history):
+            break
+        start = i
+
+    if start == 0:
+        return [], history
+
+    # Advance to the next user turn so the window doesn't open mid-exchange
+    while start < len(history) and history[start]["role"] != "user":
+        start += 1
+    if start == len(history):
+        # The last exchange has no user turn to anchor on; keep it whole
+        start = max(0, len(history) - 2)
+    return history[:start], history[start:]
+
+
+def summarize_turns(turns: list[dict], budget_tokens: int) -> str:
+    """Extractive summary of older turns: the first sentence of each message.
+
+    When the summary has to be cut to fit the budget, patient statements are
+    kept ahead of assistant questions and the most recent lines ahead of the
+    oldest.
+    """
+    lines = []
+    for m in turns:
+        text = " ".join(m["content"].split())
+        if not text:
+            continue
+        first = _SENTENCE_END.split(text, maxsplit=1)[0][:200]
+        speaker = "Patient" if m["role"] == "user" else "Assistant"
+        lines.append((m["role"] == "user", f"- {speaker}: {first}"))
+
+    kept: set[int] = set()
+    used = 0
+    for patient_pass in (True, False):
+        for i in range(len(lines) - 1, -1, -1):
+            is_patient, line = lines[i]
+            if is_patient != patient_pass:
+                continue
+            cost = estimate_tokens(line) + 1  # newline separator
+            if used + cost > budget_tokens:
+                break
+            kept.add(i)
+            used += cost
+    return "\n".join(line for i, (_, line) in enumerate(lines) if i in kept)
+
+
+def format_collected_data(collected: dict) -> str:
+    """Render structured intake data as a compact summary."""
+    lines = []
+    for field, value in collected.items():
+        if isinstance(value, list):
+            value = ", ".join(str(v) for v in value)
+        if value:
+            lines.append(f"- {field.replace('_', ' ')}: {value}")
+    return "\n".join(lines)
+
+
+def build_context(
+    history: list[dict],
+    budget_tokens: int,
+    summary_budget_tokens: int,
+    collected_data: dict | None = None,
+) -> tuple[list[dict], str]:
+    """Return the history window to send and a summary of everything older.
+
+    When structured ``collected_data`` is available (intake) it stands in for
+    the extractive summary, since it is already a distilled view of the
+    earlier turns.
+    """
+    older, recent = window_history(history, budget_tokens)
+    if not older:
+        return recent, ""
+    if collected_data:
+        return recent, format_collected_data(collected_data)
+    return recent, summarize_turns(older, summary_budget_tokens)
@@ -4,132 +4,128 @@ from __future__ import annotations
 
 import json
 import logging
-from groq import Groq
+from typing import AsyncIterator
+from groq import Groq, AsyncGroq, APIConnectionError
 from config import settings
-from modules.shared.medical_prompts import (
-    AMBIENT_DOCUMENTATION_SYSTEM,
-    VIRTUAL_NURSE_SYSTEM,
-    TRIAGE_SYSTEM,
-    CODE_SUGGESTION_SYSTEM,
-    INTAKE_SYSTEM,
-    FOLLOWUP_SYSTEM,
-    SOAP_NOTE_EXAMPLE,
-)
+from modules.shared.llm_base import BaseLLMClient
+from modules.shared.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
 
-class GroqClient:
+class GroqClient(BaseLLMClient):
     """Wrapper around the Groq API for medical use cases (Llama 3.3 70B)."""
 
+    provider = "groq"
+    retryable_errors = (APIConnectionError,)
+
     def __init__(self):
         self.client = Groq(api_key=settings.GROQ_API_KEY)
+        # Retries of async calls are left to the scheduler so they respect shared budgets
+        self.async_client = AsyncGroq(api_key=settings.GROQ_API_KEY, max_retries=0)
         self.model = settings.GROQ_MODEL
         self.max_tokens = settings.CLAUDE_MAX_TOKENS  # reuse same token limit
 
+    @staticmethod
+    def _messages(system: str, messages: list[dict], system_context: str) -> list[dict]:
+        """Prepend the system prompt; the static part stays first so Groq can reuse its prefix."""
+        if system_context:
+            system = f"{system}\n\n{system_context}"
+        return [{"role": "system", "content": system}] + messages
+
+    @staticmethod
+    def _record_usage(usage) -> None:
+        """Log token usage, including any prefix-cache hits Groq reports."""
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        metrics.incr("llm.groq.requests")
+        metrics.incr("llm.groq.input_tokens", usage.prompt_tokens)
+        metrics.incr("llm.groq.output_tokens", usage.completion_tokens)
+        metrics.incr("llm.groq.cache_read_input_tokens", cached)
+        logger.info(
+            "Groq usage: input=%d cached=%d output=%d",
+            usage.prompt_tokens,
+            cached,
+            usage.completion_tokens,
+        )
+
     def _call(
         self,
         system: str,
         messages: list[dict],
         max_tokens: int | None = None,
         temperature: float = 0.3,
+        system_context: str = "",
     ) -> str:
         """Make a Groq chat completion call."""
-        groq_messages = [{"role": "system", "content": system}] + messages
         response = self.client.chat.completions.create(
             model=self.model,
-            messages=groq_messages,
+            messages=self._messages(system, messages, system_context),
             max_tokens=max_tokens or self.max_tokens,
             temperature=temperature,
         )
+        self._record_usage(response.usage)
         return response.choices[0].message.content
 
-    def generate_soap_note(self, transcript: str) -> str:
-        """Generate a SOAP note from a clinical encounter transcript."""
-        system = AMBIENT_DOCUMENTATION_SYSTEM + "\n\n" + SOAP_NOTE_EXAMPLE
-        messages = [
-            {
-                "role": "user",
-                "content": f"Generate a SOAP note from this encounter transcript:\n\n{transcript}",
-            }
-        ]
-        return self._call(system, messages)
-
-    def suggest_codes(self, note_text: str, encounter_type: str = "office_visit") -> str:
-        """Suggest ICD-10/CPT codes from a clinical note."""
-        messages = [
-            {
-                "role": "user",
-                "content": (
-                    f"Analyze this clinical note and suggest ICD-10 and CPT codes.\n"
-                    f"Encounter type: {encounter_type}\n\n"
-                    f"Clinical Note:\n{note_text}"
-                ),
-            }
-        ]
-        return self._call(CODE_SUGGESTION_SYSTEM, messages)
-
-    def chat(
+    async def _acall(
         self,
-        message: str,
-        history: list[dict],
-        system_prompt: str | None = None,
+        system: str,
+        messages: list[dict],
+        max_tokens: int | None = None,
+        temperature: float = 0.3,
+        system_context: str = "",
     ) -> str:
-        """Send a chat message with conversation history."""
-        system = system_prompt or VIRTUAL_NURSE_SYSTEM
-        messages = history + [{"role": "user", "content": message}]
-        return self._call(system, messages, temperature=0.5)
-
-    def intake_chat(self, message: str, history: list[dict]) -> str:
-        """Chat for patient intake flow."""
-        return self.chat(message, history, system_prompt=INTAKE_SYSTEM)
+        """Make a Groq chat completion call without blocking the event loop."""
+        response = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(system, messages, system_context),
+            max_tokens=max_tokens or self.max_tokens,
+            temperature=temperature,
+        )
+        self._record_usage(response.usage)
+        return response.choices[0].message.content
 
-    def followup_chat(
+    async def _acall_structured(
         self,
-        message: str,
-        history: list[dict],
-        context: str = "",
-    ) -> str:
-        """Chat for post-discharge follow-up."""
-        system = FOLLOWUP_SYSTEM
-        if context:
-            system += f"\n\nPatient context:\n{context}"
-        return self.chat(message, history, system_prompt=system)
-
-    def triage(self, symptoms: str, patient_info: str = "") -> str:
-        """Perform symptom triage."""
-        prompt = "Assess the following patient:\n\n"
-        if patient_info:
-            prompt += f"Patient info: {patient_info}\n\n"
-        prompt += f"Symptoms: {symptoms}\n\nProvide triage assessment as JSON."
-        messages = [{"role": "user", "content": prompt}]
-        return self._call(TRIAGE_SYSTEM, messages, temperature=0.2)
+        system: str,
+        messages: list[dict],
+        tool: dict,
+        max_tokens: int | None = None,
+        temperature: float = 0.3,
+    ) -> dict:
+        """JSON-mode completion; the schema is given in the prompt since Groq does not enforce it."""
+        schema = f"Respond only with a JSON object matching this schema:\n{json.dumps(tool['input_schema'])}"
+        response = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(system, messages, schema),
+            max_tokens=max_tokens or self.max_tokens,
+            temperature=temperature,
+            response_format={"type": "json_object"},
+        )
+        self._record_usage(response.usage)
+        return self.extract_json(response.choices[0].message.content or "")
 
-    def extract_json(self, text: str) -> dict:
-        """Extract JSON from LLM response, handling markdown code blocks."""
-        # Try direct parse first
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            pass
-        # Try extracting from code block
-        if "```" in text:
-            start = text.find("```")
-            end = text.rfind("```")
-            block = text[start:end]
-            first_newline = block.find("\n")
-            if first_newline != -1:
-                block = block[first_newline + 1:]
-            try:
-                return json.loads(block)
-            except json.JSONDecodeError:
-                pass
-        # Try finding JSON object in text
-        brace_start = text.find("{")
-        brace_end = text.rfind("}") + 1
-        if brace_start != -1 and brace_end > brace_start:
-            try:
-                return json.loads(text[brace_start:brace_end])
-            except json.JSONDecodeError:
-                pass
-        return {}
+    async def _astream(
+        self,
+        system: str,
+        messages: list[dict],
+        max_tokens: int | None = None,
+        temperature: float = 0.3,
+        system_context: str = "",
+    ) -> AsyncIterator[str]:
+        """Stream a Groq completion, yielding text deltas as they arrive."""
+        stream = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(system, messages, system_context),
+            max_tokens=max_tokens or self.max_tokens,
+            temperature=temperature,
+            stream=True,
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            x_groq = getattr(chunk, "x_groq", None)
+            if x_groq is not None and getattr(x_groq, "usage", None):
+                self._record_usage(x_groq.usage)
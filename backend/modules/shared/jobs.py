@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+"""Background job subsystem backed by the ``jobs`` table."""
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable
+
+from config import settings
+from database.db import SessionLocal
+from database.schemas import Job, gen_id
+from modules.shared.llm_scheduler import llm_context
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+def job_to_dict(job: Job) -> dict:
+    """Serialize a job row for the API."""
+    return {
+        "job_id": job.id,
+        "job_type": job.job_type,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": job.progress,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def get_job(job_id: str) -> dict | None:
+    """Load a job's current state."""
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        return {**job_to_dict(job), "hospital_id": job.hospital_id} if job else None
+    finally:
+        db.close()
+
+
+def _read_state(job_id: str) -> dict | None:
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        return job_to_dict(job) if job else None
+    finally:
+        db.close()
+
+
+class JobContext:
+    """Handle passed to job handlers for reading input and reporting progress."""
+
+    def __init__(self, queue: "JobQueue", job_id: str, payload: dict, hospital_id: str | None):
+        self._queue = queue
+        self.id = job_id
+        self.payload = payload
+        self.hospital_id = hospital_id
+
+    async def progress(self, stage: str, progress: float, **result) -> None:
+        """Record the stage the job has reached (0.0-1.0) and any partial result."""
+        await self._queue._aupdate(self.id, stage=stage, progress=progress, result=result or None)
+
+
+JobHandler = Callable[[JobContext], Awaitable[dict]]
+
+
+class JobQueue(ABC):
+    """Interface for job backends.
+
+    Jobs are always recorded in the ``jobs`` table, so status polling works the
+    same whichever backend executes them. The in-process backend is the only
+    one shipped; a broker-backed queue only needs to implement ``_dispatch``
+    and run ``_execute`` on its consumers.
+    """
+
+    def __init__(self):
+        self._handlers: dict[str, JobHandler] = {}
+        self._subscribers: dict[str, list[asyncio.Queue]] = {}
+
+    def register(self, job_type: str, handler: JobHandler) -> None:
+        self._handlers[job_type] = handler
+
+    async def start(self) -> None:
+        return None
+
+    async def stop(self) -> None:
+        return None
+
+    async def enqueue(self, job_type: str, payload: dict, hospital_id: str | None = None) -> str:
+        """Record a new job and hand it to the backend. Returns the job id."""
+        if job_type not in self._handlers:
+            raise ValueError(f"No handler registered for job type '{job_type}'")
+        job_id = gen_id()
+        await asyncio.to_thread(self._record, Job(id=job_id, job_type=job_type, hospital_id=hospital_id, payload=payload))
+        self._dispatch(job_id)
+        return job_id
+
+    @staticmethod
+    def _record(job: Job) -> None:
+        db = SessionLocal()
+        try:
+            db.add(job)
+            db.commit()
+        finally:
+            db.close()
+
+    @abstractmethod
+    def _dispatch(self, job_id: str) -> None:
+        """Hand a recorded job to whatever will run ``_execute`` for it."""
+
+    # --- Subscriptions ---
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Receive every state change of a job (as ``job_to_dict`` payloads)."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(job_id, [])
+        if queue in queues:
+            queues.remove(queue)
+        if not queues:
+            self._subscribers.pop(job_id, None)
+
+    def _publish(self, state: dict) -> None:
+        for queue in self._subscribers.get(state["job_id"], []):
+            queue.put_nowait(state)
+
+    async def watch(self, job_id: str, poll_seconds: float) -> AsyncIterator[dict | None]:
+        """Yield a job's states until it completes or fails.
+
+        Changes published by this process arrive at once. The row is also
+        re-read every ``poll_seconds``, so progress made by workers in other
+        processes is seen too; ``None`` is yielded when a poll finds nothing
+        new, for the caller to send a keep-alive.
+        """
+        updates = self.subscribe(job_id)
+        try:
+            state = await asyncio.to_thread(_read_state, job_id)
+            last = None
+            while state is not None:
+                if state != last:
+                    yield state
+                    if state["status"] in TERMINAL_STATUSES:
+                        return
+                    last = state
+                else:
+                    yield None
+                try:
+                    state = await asyncio.wait_for(updates.get(), poll_seconds)
+                except asyncio.TimeoutError:
+                    state = await asyncio.to_thread(_read_state, job_id)
+        finally:
+            self.unsubscribe(job_id, updates)
+
+    # --- Execution ---
+
+    def _claim(self, job_id: str) -> Job | None:
+        """Atomically move a queued job to running; None if another worker has it."""
+        db = SessionLocal()
+        try:
+            claimed = (
+                db.query(Job)
+                .filter(Job.id == job_id, Job.status == "queued")
+                .update({"status": "running", "started_at": datetime.utcnow()})
+            )
+            db.commit()
+            if not claimed:
+                return None
+            job = db.get(Job, job_id)
+            db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    def _update(self, job_id: str, **fields) -> dict | None:
+        """Apply ``fields`` to a job row; returns the new state, None if the job is gone."""
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            if job is None:
+                return None
+            for field, value in fields.items():
+                if field == "result" and value is None:
+                    continue
+                setattr(job, field, value)
+            db.commit()
+            return job_to_dict(job)
+        finally:
+            db.close()
+
+    async def _aupdate(self, job_id: str, **fields) -> None:
+        """``_update`` on a worker thread, then publish the new state."""
+        state = await asyncio.to_thread(self._update, job_id, **fields)
+        if state is not None:
+            self._publish(state)
+
+    async def _execute(self, job_id: str) -> None:
+        job = await asyncio.to_thread(self._claim, job_id)
+        if job is None:
+            return
+        self._publish(job_to_dict(job))
+        handler = self._handlers.get(job.job_type)
+        ctx = JobContext(self, job.id, job.payload or {}, job.hospital_id)
+        logger.info("Job %s (%s) started", job.id, job.job_type)
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for job type '{job.job_type}'")
+            with llm_context(hospital_id=job.hospital_id):
+                result = await handler(ctx)
+        except Exception as e:
+            logger.error("Job %s failed: %s", job.id, e)
+            await self._aupdate(job.id, status="failed", error=str(e), finished_at=datetime.utcnow())
+            return
+        await self._aupdate(
+            job.id,
+            status="completed",
+            stage="done",
+            progress=1.0,
+            result=result,
+            finished_at=datetime.utcnow(),
+        )
+        logger.info("Job %s completed", job.id)
+
+
+class InProcessJobQueue(JobQueue):
+    """Runs jobs on a fixed pool of asyncio workers in this process."""
+
+    def __init__(self, workers: int):
+        super().__init__()
+        self.workers = workers
+        self._queue: asyncio.Queue[str] | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        for job_id in await asyncio.to_thread(self._recover):
+            self._queue.put_nowait(job_id)
+        logger.info("Job queue started with %d workers", self.workers)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Job queue stopped")
+
+    def _dispatch(self, job_id: str) -> None:
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        self._queue.put_nowait(job_id)
+
+    def _recover(self) -> list[str]:
+        """Requeue jobs left behind by a restart.
+
+        Queued jobs are picked up directly; running jobs that have not
+        reported progress for ``JOB_STALE_SECONDS`` are assumed orphaned.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.JOB_STALE_SECONDS)
+        db = SessionLocal()
+        try:
+            (
+                db.query(Job)
+                .filter(Job.status == "running", Job.updated_at < cutoff)
+                .update({"status": "queued", "stage": None, "progress": 0.0})
+            )
+            db.commit()
+            job_ids = [j.id for j in db.query(Job.id).filter(Job.status == "queued").order_by(Job.created_at)]
+        finally:
+            db.close()
+        if job_ids:
+            logger.info("Recovered %d pending jobs", len(job_ids))
+        return job_ids
+
+    async def _worker(self, index: int) -> None:
+        assert self._queue is not None
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._execute(job_id)
+            except Exception as e:
+                logger.error("Job worker %d crashed on %s: %s", index, job_id, e)
+            finally:
+                self._queue.task_done()
+
+
+def create_job_queue() -> JobQueue:
+    """Build the job queue selected by ``JOB_QUEUE_BACKEND``."""
+    if settings.JOB_QUEUE_BACKEND != "inprocess":
+        raise ValueError(f"Unsupported JOB_QUEUE_BACKEND '{settings.JOB_QUEUE_BACKEND}'")
+    return InProcessJobQueue(workers=settings.JOB_WORKERS)
+
+
+job_queue = create_job_queue()
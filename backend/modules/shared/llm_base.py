@@ -0,0 +1,502 @@
+from __future__ import annotations
+
+"""Provider-agnostic LLM client base with the medical prompt builders."""
+
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from typing import AsyncIterator
+from config import settings
+from modules.shared.medical_prompts import (
+    AMBIENT_DOCUMENTATION_SYSTEM,
+    VIRTUAL_NURSE_SYSTEM,
+    TRIAGE_SYSTEM,
+    CODE_SUGGESTION_SYSTEM,
+    INTAKE_SYSTEM,
+    FOLLOWUP_SYSTEM,
+    SOAP_NOTE_EXAMPLE,
+    SOAP_NOTE_TOOL,
+    DOCUMENTATION_WITH_CODES_SYSTEM,
+    DOCUMENTATION_TOOL,
+)
+from modules.shared.metrics import metrics
+from modules.shared.response_cache import response_cache
+from modules.shared.context_window import estimate_tokens
+from modules.shared.llm_scheduler import (
+    Priority,
+    llm_scheduler,
+    llm_priority,
+    llm_tenant,
+    estimate_request_tokens,
+)
+
+# Cache keys with a provider call in progress (keys include provider and model)
+_inflight: dict[str, asyncio.Future] = {}
+
+
+class _OwnerCancelled(Exception):
+    """Set on a shared in-flight call whose caller was cancelled; waiters retry."""
+
+
+class BaseLLMClient(ABC):
+    """Shared prompt construction for the medical use cases.
+
+    Providers implement the abstract ``_call`` (blocking), ``_acall``
+    (async), ``_astream`` (async text deltas) and ``_acall_structured``.
+    The async variants (``achat``, ``atriage``, ...) are what the API
+    routers use so a slow completion never blocks the event loop; the sync
+    methods remain for scripts and the seed tooling.
+
+    ``system`` is always one of the static prompts from ``medical_prompts`` so
+    providers can cache it; per-session text (patient context, history
+    summaries) travels separately as ``system_context``.
+
+    Deterministic, low-temperature calls (SOAP, codes, triage) opt in to the
+    response cache through ``_cached_call``/``_cached_acall``; chat never does.
+
+    Async provider calls go through ``llm_scheduler``, which orders them by
+    priority (triage, chat, documentation, batch) and per-hospital fair share
+    and retries rate-limit responses; ``retryable_errors`` adds the
+    provider's transient connection errors to what it retries.
+    """
+
+    provider: str = ""
+    model: str = ""
+    retryable_errors: tuple[type, ...] = ()
+
+    @abstractmethod
+    def _call(
+        self,
+        system: str,
+        messages: list[dict],
+        max_tokens: int | None = None,
+        temperature: float = 0.3,
+        system_context: str = "",
+    ) -> str:
+        ...
+
+    @abstractmethod
+    async def _acall(
+        self,
+        system: str,
+        messages: list[dict],
+        max_tokens: int | None = None,
+        temperature: float = 0.3,
+        system_context: str = "",
+    ) -> str:
+        ...
+
+    @abstractmethod
+    def _astream(
+        self,
+        system: str,
+        messages: list[dict],
+        max_tokens: int | None = None,
+        temperature: float = 0.3,
+        system_context: str = "",
+    ) -> AsyncIterator[str]:
+        ...
+
+    @abstractmethod
+    async def _acall_structured(
+        self,
+        system: str,
+        messages: list[dict],
+        tool: dict,
+        max_tokens: int | None = None,
+        temperature: float = 0.3,
+    ) -> dict:
+        """Completion constrained to ``tool["input_schema"]``; returns the parsed object."""
+
+    # --- Response cache ---
+
+    def _cache_key(
+        self,
+        system: str,
+        messages: list[dict],
+        max_tokens: int | None,
+        temperature: float,
+        tool: dict | None = None,
+    ) -> str:
+        return response_cache.make_key(
+            provider=self.provider,
+            model=self.model,
+            system=system,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            tool=tool,
+        )
+
+    def _cached_call(
+        self,
+        system: str,
+        messages: list[dict],
+        max_tokens: int | None = None,
+        temperature: float = 0.3,
+    ) -> str:
+        """``_call`` through the response cache."""
+        if not settings.LLM_CACHE_ENABLED:
+            return self._call(system, messages, max_tokens, temperature)
+        key = self._cache_key(system, messages, max_tokens, temperature)
+        cached = response_cache.get(key)
+        if cached is not None:
+            metrics.incr("llm.response_cache.hits")
+            return cached
+        metrics.incr("llm.response_cache.misses")
+        text = self._call(system, messages, max_tokens, temperature)
+        if text:
+            response_cache.set(key, text)
+        return text
+
+    # --- Scheduling ---
+
+    @staticmethod
+    def _priority(default: Priority) -> Priority:
+        """The caller's priority override (e.g. batch jobs), else ``default``."""
+        override = llm_priority.get()
+        return default if override is None else override
+
+    async def _scheduled_acall(
+        self,
+        system: str,
+        messages: list[dict],
+        max_tokens: int | None = None,
+        temperature: float = 0.3,
+        system_context: str = "",
+        priority: Priority = Priority.DOCUMENTATION,
+    ) -> str:
+        """``_acall`` admitted by the scheduler."""
+        return await llm_scheduler.run(
+            lambda: self._acall(system, messages, max_tokens, temperature, system_context),
+            priority=self._priority(priority),
+            tenant=llm_tenant.get(),
+            tokens=estimate_request_tokens(system, messages, system_context),
+            retryable=self.retryable_errors,
+            output_tokens=lambda text: estimate_tokens(text or ""),
+        )
+
+    def _scheduled_astream(
+        self,
+        system: str,
+        messages: list[dict],
+        max_tokens: int | None = None,
+        temperature: float = 0.3,
+        system_context: str = "",
+        priority: Priority = Priority.CHAT,
+    ) -> AsyncIterator[str]:
+        """``_astream`` admitted by the scheduler."""
+        return llm_scheduler.stream(
+            lambda: self._astream(system, messages, max_tokens, temperature, system_context),
+            priority=self._priority(priority),
+            tenant=llm_tenant.get(),
+            tokens=estimate_request_tokens(system, messages, system_context),
+            retryable=self.retryable_errors,
+        )
+
+    async def _provider_acall(
+        self,
+        system: str,
+        messages: list[dict],
+        max_tokens: int | None,
+        temperature: float,
+        tool: dict | None,
+        priority: Priority = Priority.DOCUMENTATION,
+    ) -> str:
+        """``_acall``, or ``_acall_structured`` serialized to JSON text when a tool is given."""
+        if tool is None:
+            return await self._scheduled_acall(system, messages, max_tokens, temperature, priority=priority)
+        data = await llm_scheduler.run(
+            lambda: self._acall_structured(system, messages, tool, max_tokens, temperature),
+            priority=self._priority(priority),
+            tenant=llm_tenant.get(),
+            tokens=estimate_request_tokens(system, messages),
+            retryable=self.retryable_errors,
+            output_tokens=lambda data: estimate_tokens(json.dumps(data or {})),
+        )
+        return json.dumps(data) if data else ""
+
+    async def _cached_acall(
+        self,
+        system: str,
+        messages: list[dict],
+        max_tokens: int | None = None,
+        temperature: float = 0.3,
+        tool: dict | None = None,
+        priority: Priority = Priority.DOCUMENTATION,
+    ) -> str:
+        """``_acall`` (or a structured call) through the response cache.
+
+        Identical requests already in flight share one provider call, so a
+        burst of UI retries costs a single completion. If the caller making
+        the shared call is cancelled, the waiters start their own. Cache hits
+        never wait for the scheduler.
+        """
+        if not settings.LLM_CACHE_ENABLED:
+            return await self._provider_acall(system, messages, max_tokens, temperature, tool, priority)
+        key = self._cache_key(system, messages, max_tokens, temperature, tool)
+        cached = await response_cache.aget(key)
+        if cached is not None:
+            metrics.incr("llm.response_cache.hits")
+            return cached
+
+        while key in _inflight:
+            try:
+                text = await asyncio.shield(_inflight[key])
+            except _OwnerCancelled:
+                continue
+            metrics.incr("llm.response_cache.hits")
+            return text
+
+        metrics.incr("llm.response_cache.misses")
+        future = asyncio.get_running_loop().create_future()
+        _inflight[key] = future
+        try:
+            text = await self._provider_acall(system, messages, max_tokens, temperature, tool, priority)
+        except asyncio.CancelledError:
+            future.set_exception(_OwnerCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            _inflight.pop(key, None)
+        future.set_result(text)
+        if text:
+            await response_cache.aset(key, text)
+        return text
+
+    # --- Prompt builders ---
+
+    @staticmethod
+    def _soap_request(transcript: str) -> tuple[str, list[dict]]:
+        system = AMBIENT_DOCUMENTATION_SYSTEM + "\n\n" + SOAP_NOTE_EXAMPLE
+        messages = [
+            {
+                "role": "user",
+                "content": f"Generate a SOAP note from this encounter transcript:\n\n{transcript}",
+            }
+        ]
+        return system, messages
+
+    @staticmethod
+    def _codes_request(note_text: str, encounter_type: str) -> tuple[str, list[dict]]:
+        messages = [
+            {
+                "role": "user",
+                "content": (
+                    f"Analyze this clinical note and suggest ICD-10 and CPT codes.\n"
+                    f"Encounter type: {encounter_type}\n\n"
+                    f"Clinical Note:\n{note_text}"
+                ),
+            }
+        ]
+        return CODE_SUGGESTION_SYSTEM, messages
+
+    @staticmethod
+    def _chat_request(
+        message: str,
+        history: list[dict],
+        system_prompt: str | None,
+        context: str = "",
+        summary: str = "",
+    ) -> tuple[str, list[dict], str]:
+        system = system_prompt or VIRTUAL_NURSE_SYSTEM
+        parts = []
+        if context:
+            parts.append(f"Patient context:\n{context}")
+        if summary:
+            parts.append(f"Summary of the earlier conversation:\n{summary}")
+        messages = history + [{"role": "user", "content": message}]
+        return system, messages, "\n\n".join(parts)
+
+    @staticmethod
+    def _triage_request(symptoms: str, patient_info: str) -> tuple[str, list[dict]]:
+        prompt = "Assess the following patient:\n\n"
+        if patient_info:
+            prompt += f"Patient info: {patient_info}\n\n"
+        prompt += f"Symptoms: {symptoms}\n\nProvide triage assessment as JSON."
+        return TRIAGE_SYSTEM, [{"role": "user", "content": prompt}]
+
+    # --- Blocking API ---
+
+    def generate_soap_note(self, transcript: str) -> str:
+        """Generate a SOAP note from a clinical encounter transcript."""
+        system, messages = self._soap_request(transcript)
+        return self._cached_call(system, messages)
+
+    def suggest_codes(self, note_text: str, encounter_type: str = "office_visit") -> str:
+        """Suggest ICD-10/CPT codes from a clinical note."""
+        system, messages = self._codes_request(note_text, encounter_type)
+        return self._cached_call(system, messages)
+
+    def chat(
+        self,
+        message: str,
+        history: list[dict],
+        system_prompt: str | None = None,
+        context: str = "",
+    ) -> str:
+        """Send a chat message with conversation history."""
+        system, messages, system_context = self._chat_request(message, history, system_prompt, context)
+        return self._call(system, messages, temperature=0.5, system_context=system_context)
+
+    def intake_chat(self, message: str, history: list[dict]) -> str:
+        """Chat for patient intake flow."""
+        return self.chat(message, history, system_prompt=INTAKE_SYSTEM)
+
+    def followup_chat(
+        self,
+        message: str,
+        history: list[dict],
+        context: str = "",
+    ) -> str:
+        """Chat for post-discharge follow-up."""
+        return self.chat(message, history, system_prompt=FOLLOWUP_SYSTEM, context=context)
+
+    def triage(self, symptoms: str, patient_info: str = "") -> str:
+        """Perform symptom triage."""
+        system, messages = self._triage_request(symptoms, patient_info)
+        return self._cached_call(system, messages, temperature=0.2)
+
+    # --- Async API ---
+
+    async def agenerate_soap_note(self, transcript: str) -> str:
+        """Async variant of ``generate_soap_note``."""
+        system, messages = self._soap_request(transcript)
+        return await self._cached_acall(system, messages)
+
+    async def agenerate_soap_note_structured(self, transcript: str) -> dict:
+        """SOAP note as a dict matching ``SOAP_NOTE_TOOL`` (tool use / JSON mode)."""
+        system, messages = self._soap_request(transcript)
+        text = await self._cached_acall(system, messages, tool=SOAP_NOTE_TOOL)
+        return json.loads(text) if text else {}
+
+    async def agenerate_documentation(self, transcript: str, encounter_type: str = "office_visit") -> dict:
+        """SOAP note and its codes in one structured completion (``DOCUMENTATION_TOOL``)."""
+        messages = [
+            {
+                "role": "user",
+                "content": (
+                    f"Generate a SOAP note from this encounter transcript and code it.\n"
+                    f"Encounter type: {encounter_type}\n\n{transcript}"
+                ),
+            }
+        ]
+        text = await self._cached_acall(DOCUMENTATION_WITH_CODES_SYSTEM, messages, tool=DOCUMENTATION_TOOL)
+        return json.loads(text) if text else {}
+
+    async def asuggest_codes(self, note_text: str, encounter_type: str = "office_visit") -> str:
+        """Async variant of ``suggest_codes``."""
+        system, messages = self._codes_request(note_text, encounter_type)
+        return await self._cached_acall(system, messages)
+
+    async def achat(
+        self,
+        message: str,
+        history: list[dict],
+        system_prompt: str | None = None,
+        context: str = "",
+        summary: str = "",
+    ) -> str:
+        """Async variant of ``chat``.
+
+        ``summary`` condenses turns that were dropped from ``history`` to fit
+        the token budget.
+        """
+        system, messages, system_context = self._chat_request(
+            message, history, system_prompt, context, summary
+        )
+        return await self._scheduled_acall(
+            system, messages, temperature=0.5, system_context=system_context, priority=Priority.CHAT
+        )
+
+    async def aintake_chat(self, message: str, history: list[dict], summary: str = "") -> str:
+        """Async variant of ``intake_chat``."""
+        return await self.achat(message, history, system_prompt=INTAKE_SYSTEM, summary=summary)
+
+    async def afollowup_chat(
+        self,
+        message: str,
+        history: list[dict],
+        context: str = "",
+        summary: str = "",
+    ) -> str:
+        """Async variant of ``followup_chat``."""
+        return await self.achat(
+            message, history, system_prompt=FOLLOWUP_SYSTEM, context=context, summary=summary
+        )
+
+    async def atriage(self, symptoms: str, patient_info: str = "") -> str:
+        """Async variant of ``triage``."""
+        system, messages = self._triage_request(symptoms, patient_info)
+        return await self._cached_acall(system, messages, temperature=0.2, priority=Priority.TRIAGE)
+
+    # --- Streaming API ---
+
+    def astream_chat(
+        self,
+        message: str,
+        history: list[dict],
+        system_prompt: str | None = None,
+        context: str = "",
+        summary: str = "",
+    ) -> AsyncIterator[str]:
+        """Stream a chat completion as text deltas."""
+        system, messages, system_context = self._chat_request(
+            message, history, system_prompt, context, summary
+        )
+        return self._scheduled_astream(system, messages, temperature=0.5, system_context=system_context)
+
+    def astream_intake_chat(
+        self,
+        message: str,
+        history: list[dict],
+        summary: str = "",
+    ) -> AsyncIterator[str]:
+        """Streaming variant of ``intake_chat``."""
+        return self.astream_chat(message, history, system_prompt=INTAKE_SYSTEM, summary=summary)
+
+    def astream_followup_chat(
+        self,
+        message: str,
+        history: list[dict],
+        context: str = "",
+        summary: str = "",
+    ) -> AsyncIterator[str]:
+        """Streaming variant of ``followup_chat``."""
+        return self.astream_chat(
+            message, history, system_prompt=FOLLOWUP_SYSTEM, context=context, summary=summary
+        )
+
+    def extract_json(self, text: str) -> dict:
+        """Extract JSON from an LLM response, handling markdown code blocks."""
+        # Try direct parse first
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            pass
+        # Try extracting from code block
+        if "```" in text:
+            start = text.find("```")
+            end = text.rfind("```")
+            block = text[start:end]
+            # Remove the opening ``` and optional language tag
+            first_newline = block.find("\n")
+            if first_newline != -1:
+                block = block[first_newline + 1:]
+            try:
+                return json.loads(block)
+            except json.JSONDecodeError:
+                pass
+        # Try finding JSON object in text
+        brace_start = text.find("{")
+        brace_end = text.rfind("}") + 1
+        if brace_start != -1 and brace_end > brace_start:
+            try:
+                return json.loads(text[brace_start:brace_end])
+            except json.JSONDecodeError:
+                pass
+        return {}
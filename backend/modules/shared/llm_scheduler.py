@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+"""Priority, per-hospital fair-share and rate-limit scheduling for LLM calls."""
+
+import asyncio
+import contextlib
+import itertools
+import logging
+import random
+import time
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from config import settings
+from modules.shared.context_window import estimate_tokens
+from modules.shared.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRY_STATUSES = (429, 503, 529)  # rate limited, unavailable, overloaded
+SHARED_TENANT = "_shared"
+
+
+class Priority(IntEnum):
+    """Lower runs first."""
+
+    TRIAGE = 0
+    CHAT = 1
+    DOCUMENTATION = 2
+    BATCH = 3
+
+
+# Set per request (router dependency) or per job; read when a call is queued
+llm_tenant: ContextVar[str | None] = ContextVar("llm_tenant", default=None)
+llm_priority: ContextVar[Priority | None] = ContextVar("llm_priority", default=None)
+
+
+@contextlib.contextmanager
+def llm_context(hospital_id: str | None = None, priority: Priority | None = None):
+    """Attribute LLM calls made inside the block to a hospital and/or priority."""
+    tenant_token = llm_tenant.set(hospital_id) if hospital_id is not None else None
+    priority_token = llm_priority.set(priority) if priority is not None else None
+    try:
+        yield
+    finally:
+        if priority_token is not None:
+            llm_priority.reset(priority_token)
+        if tenant_token is not None:
+            llm_tenant.reset(tenant_token)
+
+
+def estimate_request_tokens(system: str, messages: list[dict], system_context: str = "") -> int:
+    return estimate_tokens(system + system_context + "".join(str(m.get("content", "")) for m in messages))
+
+
+class TokenBucket:
+    """Continuously refilled budget of ``per_minute`` units; 0 means unlimited.
+
+    ``take`` may overdraw (actual output is only known after the call); the
+    debt delays later grants.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` (capped at capacity) is available."""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(missing, 0.0) * 60 / self.capacity
+
+    def take(self, amount: float) -> None:
+        if not self.unlimited:
+            self._refill()
+            self.tokens -= amount
+
+
+class _Waiter:
+    __slots__ = ("priority", "tenant", "tokens", "seq", "future")
+
+    def __init__(self, priority: int, tenant: str, tokens: int, seq: int, future: asyncio.Future):
+        self.priority = priority
+        self.tenant = tenant
+        self.tokens = tokens
+        self.seq = seq
+        self.future = future
+
+
+class LLMScheduler:
+    """Admits provider calls in priority order within the provider's budgets.
+
+    At most ``max_concurrency`` calls run at once, and requests/tokens per
+    minute are metered by token buckets. Waiting calls are served strictly
+    by priority; within a priority the hospital with the fewest calls in
+    flight (then the one served least recently) goes first, so one busy
+    tenant cannot crowd out the rest. A 429/529 pauses all admissions for
+    the provider's ``retry-after`` and the call is retried with jittered
+    exponential backoff.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_retries: int = 4,
+        retry_base_seconds: float = 1.0,
+        retry_max_seconds: float = 60.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._waiters: list[_Waiter] = []
+        self._active: dict[str, int] = {}
+        self._last_served: dict[str, int] = {}
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._timer: asyncio.TimerHandle | None = None
+        self._seq = itertools.count()
+        self._grants = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    # --- Admission ---
+
+    async def acquire(self, priority: int, tenant: str | None, tokens: int) -> None:
+        """Wait for a slot; pair every successful call with ``release``."""
+        tenant = tenant or SHARED_TENANT
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(int(priority), tenant, tokens, next(self._seq), future)
+        self._waiters.append(waiter)
+        started = time.monotonic()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif future.done() and not future.cancelled():
+                self.release(tenant)
+            raise
+        metrics.incr("llm.scheduler.wait_seconds", time.monotonic() - started)
+
+    def release(self, tenant: str | None, output_tokens: int = 0) -> None:
+        tenant = tenant or SHARED_TENANT
+        self._in_flight -= 1
+        self._active[tenant] -= 1
+        if not self._active[tenant]:
+            del self._active[tenant]
+        self._tokens.take(output_tokens)
+        self._dispatch()
+
+    def pause(self, seconds: float) -> None:
+        """Stop admitting calls for ``seconds`` (provider asked us to back off)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._schedule(seconds)
+
+    def _next_waiter(self) -> _Waiter:
+        top = min(w.priority for w in self._waiters)
+        return min(
+            (w for w in self._waiters if w.priority == top),
+            key=lambda w: (self._active.get(w.tenant, 0), self._last_served.get(w.tenant, -1), w.seq),
+        )
+
+    def _dispatch(self) -> None:
+        while self._waiters and self._in_flight < self.max_concurrency:
+            delay = self._paused_until - time.monotonic()
+            waiter = self._next_waiter()
+            delay = max(delay, self._requests.wait_time(1), self._tokens.wait_time(waiter.tokens))
+            if delay > 0:
+                self._schedule(delay)
+                return
+            self._waiters.remove(waiter)
+            if waiter.future.done():  # cancelled while queued
+                continue
+            self._in_flight += 1
+            self._active[waiter.tenant] = self._active.get(waiter.tenant, 0) + 1
+            self._last_served[waiter.tenant] = next(self._grants)
+            self._requests.take(1)
+            self._tokens.take(waiter.tokens)
+            waiter.future.set_result(None)
+
+    def _schedule(self, delay: float) -> None:
+        if self._timer is not None and not self._timer.cancelled():
+            if self._timer.when() <= asyncio.get_running_loop().time() + delay:
+                return
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._wake)
+
+    def _wake(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    # --- Retries ---
+
+    def retry_delay(self, error: Exception, attempt: int, retryable: tuple[type, ...] = ()) -> float | None:
+        """Backoff before retrying ``error``; None if it should not be retried.
+
+        A ``retry-after`` header is honoured as a floor; otherwise the delay
+        doubles per attempt. Jitter spreads out callers that failed together.
+        """
+        if attempt >= self.max_retries:
+            return None
+        if getattr(error, "status_code", None) not in RETRY_STATUSES and not isinstance(error, retryable):
+            return None
+        backoff = min(self.retry_base_seconds * 2 ** attempt, self.retry_max_seconds)
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, self.retry_max_seconds) + random.uniform(0, backoff / 2)
+        return random.uniform(backoff / 2, backoff)
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        priority: int,
+        tenant: str | None,
+        tokens: int,
+        retryable: tuple[type, ...] = (),
+        output_tokens: Callable[[T], int] | None = None,
+    ) -> T:
+        """Run ``call()`` once admitted, retrying rate-limit errors."""
+        attempt = 0
+        while True:
+            await self.acquire(priority, tenant, tokens)
+            used = 0
+            try:
+                result = await call()
+                used = output_tokens(result) if output_tokens else 0
+                return result
+            except Exception as e:
+                delay = self.retry_delay(e, attempt, retryable)
+                if delay is None:
+                    raise
+                self._on_retry(e, delay, attempt)
+            finally:
+                self.release(tenant, used)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def stream(
+        self,
+        open_stream: Callable[[], AsyncIterator[str]],
+        priority: int,
+        tenant: str | None,
+        tokens: int,
+        retryable: tuple[type, ...] = (),
+    ) -> AsyncIterator[str]:
+        """Yield from a text stream once admitted; retried only before the first delta."""
+        attempt = 0
+        while True:
+            await self.acquire(priority, tenant, tokens)
+            chars = 0
+            try:
+                async for text in open_stream():
+                    chars += len(text)
+                    yield text
+                return
+            except Exception as e:
+                delay = None if chars else self.retry_delay(e, attempt, retryable)
+                if delay is None:
+                    raise
+                self._on_retry(e, delay, attempt)
+            finally:
+                self.release(tenant, chars // 4)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _on_retry(self, error: Exception, delay: float, attempt: int) -> None:
+        metrics.incr("llm.scheduler.retries")
+        logger.warning("LLM call failed (%s), retry %d in %.1fs", error, attempt + 1, delay)
+        if getattr(error, "status_code", None) in RETRY_STATUSES:
+            self.pause(delay)  # the limit is provider-wide, hold every caller
+
+
+def _retry_after_seconds(error: Exception) -> float | None:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                continue
+    return None
+
+
+llm_scheduler = LLMScheduler(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+    max_retries=settings.LLM_MAX_RETRIES,
+    retry_base_seconds=settings.LLM_RETRY_BASE_SECONDS,
+    retry_max_seconds=settings.LLM_RETRY_MAX_SECONDS,
+)
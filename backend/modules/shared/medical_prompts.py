@@ -14,7 +14,8 @@ Rules:
 - Flag any unclear or ambiguous statements with [VERIFY]
 - Use standard medical terminology
 - Include ICD-10 codes for mentioned conditions
-- Never fabricate information not present in the transcript"""
+- Never fabricate information not present in the transcript
+- Lines may be labeled "Clinician:" or "Patient:"; attribute statements to that speaker"""
 
 VIRTUAL_NURSE_SYSTEM = """You are a virtual nursing assistant at a healthcare facility. You help \
 patients with pre-visit intake, symptom assessment, and post-discharge follow-up.
@@ -148,3 +149,78 @@ Migraine headache, right-sided, without aura (ICD-10: G43.909)
 2. Rest in dark, quiet environment
 3. Return if no improvement within 48 hours
 4. Follow-up as needed"""
+
+
+# Tool/JSON schema for structured SOAP output (mirrors models.SOAPNote)
+SOAP_NOTE_TOOL = {
+    "name": "record_soap_note",
+    "description": "Record the SOAP note for this encounter.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "subjective": {"type": "string", "description": "Reported symptoms, history, concerns"},
+            "objective": {"type": "string", "description": "Exam findings, vitals, observations"},
+            "assessment": {"type": "string", "description": "Clinical assessment and differentials"},
+            "plan": {"type": "string", "description": "Treatment, medications, follow-ups, referrals"},
+            "icd10_codes": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "code": {"type": "string"},
+                        "description": {"type": "string"},
+                    },
+                    "required": ["code"],
+                },
+            },
+        },
+        "required": ["subjective", "objective", "assessment", "plan"],
+    },
+}
+
+
+DOCUMENTATION_WITH_CODES_SYSTEM = (
+    AMBIENT_DOCUMENTATION_SYSTEM
+    + """
+
+Also code the note you write, following these coding rules:
+- Suggest ICD-10 and CPT codes with description, confidence (high/medium/low) and supporting evidence
+- Only suggest codes supported by the documentation
+- Prefer specific codes over unspecified codes
+- Include both primary and secondary diagnoses
+- Suggest the E/M level based on the complexity documented
+- List documentation gaps that would block or weaken a code"""
+    + "\n\n"
+    + SOAP_NOTE_EXAMPLE
+)
+
+_CODE_ITEM = {
+    "type": "object",
+    "properties": {
+        "code": {"type": "string"},
+        "description": {"type": "string"},
+        "confidence": {"type": "string", "enum": ["high", "medium", "low"]},
+        "evidence": {"type": "string"},
+    },
+    "required": ["code", "description", "confidence"],
+}
+
+# SOAP note plus coding in one structured completion
+DOCUMENTATION_TOOL = {
+    "name": "record_documentation",
+    "description": "Record the SOAP note for this encounter and the codes it supports.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            **{
+                name: SOAP_NOTE_TOOL["input_schema"]["properties"][name]
+                for name in ("subjective", "objective", "assessment", "plan")
+            },
+            "icd10_codes": {"type": "array", "items": _CODE_ITEM},
+            "cpt_codes": {"type": "array", "items": _CODE_ITEM},
+            "em_level": {"type": "string"},
+            "documentation_gaps": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["subjective", "objective", "assessment", "plan", "icd10_codes", "cpt_codes"],
+    },
+}
@@ -0,0 +1,23 @@
+"""In-process counters exposed via ``GET /api/metrics``."""
+
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    """Thread-safe named counters (per worker process)."""
+
+    def __init__(self):
+        self._counters: dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+
+metrics = Metrics()
@@ -42,6 +42,12 @@ class FollowUpType(str, Enum):
     DAY_30 = "30day"
 
 
+class TranscriptionProfile(str, Enum):
+    FAST = "fast"
+    BALANCED = "balanced"
+    ACCURATE = "accurate"
+
+
 # --- Request Models ---
 
 class TranscriptionRequest(BaseModel):
@@ -56,6 +62,23 @@ class NoteGenerationRequest(BaseModel):
     encounter_type: str = "office_visit"
 
 
+class DocumentationRequest(BaseModel):
+    """Request to generate a clinical note and its codes from a transcript."""
+    transcript: str
+    patient_id: Optional[str] = None
+    encounter_type: str = "office_visit"
+
+
+class BackfillRequest(BaseModel):
+    """Select stored encounters whose notes should be regenerated."""
+    encounter_ids: Optional[List[str]] = None
+    encounter_type: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    limit: Optional[int] = Field(None, ge=1)
+    concurrency: Optional[int] = Field(None, ge=1, le=32)
+
+
 class CodeSuggestionRequest(BaseModel):
     """Request for ICD-10/CPT code suggestions."""
     note_text: str
@@ -105,6 +128,7 @@ class NoteUpdateRequest(BaseModel):
     """Request to update a clinical note."""
     note_text: str
     status: NoteStatus = NoteStatus.REVIEWED
+    version: Optional[int] = None  # version the edit was made on; 409 if the note has moved on
 
 
 # --- Response Models ---
@@ -115,6 +139,8 @@ class TranscriptionResponse(BaseModel):
     language: str
     duration_seconds: float
     segments: List[Dict] = []
+    profile: Optional[str] = None
+    speaker_transcript: Optional[str] = None  # "Clinician: ..." lines when diarized
 
 
 class SOAPNote(BaseModel):
@@ -140,6 +166,7 @@ class CodeSuggestion(BaseModel):
     description: str
     confidence: str
     evidence: str
+    verified: Optional[bool] = None  # found in the local code index; None if no index
 
 
 class CodeSuggestionResponse(BaseModel):
@@ -150,6 +177,15 @@ class CodeSuggestionResponse(BaseModel):
     documentation_gaps: List[str] = []
 
 
+class DocumentationResponse(BaseModel):
+    """Response from combined note generation and coding."""
+    note: SOAPNote
+    codes: CodeSuggestionResponse
+    encounter_id: Optional[str] = None
+    note_id: Optional[str] = None
+    generated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class TriageResult(BaseModel):
     """Triage assessment result."""
     esi_level: ESILevel
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+"""Content-addressed cache for deterministic LLM completions."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Expired disk rows are deleted at most this often, not on every write
+PRUNE_INTERVAL_SECONDS = 300
+
+
+class ResponseCache:
+    """Size-bounded LRU with absolute TTL and an optional SQLite tier.
+
+    The disk tier survives restarts and is shared by every worker on the
+    host. It stores completion text, which contains PHI, so it is off unless
+    ``LLM_CACHE_DISK_PATH`` is set. Async callers use ``aget``/``aset``,
+    which touch SQLite from a worker thread.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 2000,
+        ttl_seconds: float = 86400,
+        disk_path: str = "",
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._last_prune = clock()
+        self._disk: sqlite3.Connection | None = None
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS llm_response_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._disk.execute(
+                "CREATE INDEX IF NOT EXISTS llm_response_cache_expires_at ON llm_response_cache (expires_at)"
+            )
+            self._disk.commit()
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        """Hash the request parts that determine the completion."""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        value = self._get_memory(key)
+        if value is not None or self._disk is None:
+            return value
+        return self._get_disk(key)
+
+    async def aget(self, key: str) -> str | None:
+        value = self._get_memory(key)
+        if value is not None or self._disk is None:
+            return value
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def set(self, key: str, value: str) -> None:
+        expires_at = self._set_memory(key, value)
+        if self._disk is not None:
+            self._write_disk(key, value, expires_at)
+
+    async def aset(self, key: str, value: str) -> None:
+        expires_at = self._set_memory(key, value)
+        if self._disk is not None:
+            await asyncio.to_thread(self._write_disk, key, value, expires_at)
+
+    def _get_memory(self, key: str) -> str | None:
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                return value
+            del self._entries[key]
+            return None
+
+    def _set_memory(self, key: str, value: str) -> float:
+        expires_at = self._clock() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires_at)
+        return expires_at
+
+    def _get_disk(self, key: str) -> str | None:
+        with self._disk_lock:
+            row = self._disk.execute(
+                "SELECT value, expires_at FROM llm_response_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= self._clock():
+            return None
+        with self._lock:
+            self._remember(key, row[0], row[1])
+        return row[0]
+
+    def _write_disk(self, key: str, value: str, expires_at: float) -> None:
+        now = self._clock()
+        with self._disk_lock:
+            self._disk.execute(
+                "INSERT OR REPLACE INTO llm_response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            if now - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+                self._disk.execute("DELETE FROM llm_response_cache WHERE expires_at <= ?", (now,))
+                self._last_prune = now
+            self._disk.commit()
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute("DELETE FROM llm_response_cache")
+                self._disk.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+response_cache = ResponseCache(
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    disk_path=settings.LLM_CACHE_DISK_PATH,
+)
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+"""Pluggable conversation session stores for the virtual nurse flows."""
+
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rebuilds a flow's session state from its ChatSession row and messages
+SessionLoader = Callable[[Any, list], Any]
+
+
+class SessionStore(ABC):
+    """Interface for session state keyed by session id.
+
+    Async code goes through ``aget``/``adelete``; stores that do I/O
+    override them so the event loop never waits on it.
+    """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Any | None: ...
+
+    @abstractmethod
+    def put(self, session_id: str, state: Any) -> None: ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool: ...
+
+    async def aget(self, session_id: str) -> Any | None:
+        return self.get(session_id)
+
+    async def adelete(self, session_id: str) -> bool:
+        return self.delete(session_id)
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+
+class MemorySessionStore(SessionStore):
+    """Per-process LRU store with a sliding TTL.
+
+    State objects are returned by reference, so callers may mutate them in
+    place. Least recently used sessions are evicted once ``max_entries`` is
+    reached, and sessions idle for longer than ``ttl_seconds`` expire.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_seconds: float = 7200,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            touched_at, state = entry
+            now = self._clock()
+            if now - touched_at > self.ttl_seconds:
+                del self._entries[session_id]
+                return None
+            self._entries[session_id] = (now, state)
+            self._entries.move_to_end(session_id)
+            return state
+
+    def put(self, session_id: str, state: Any) -> None:
+        with self._lock:
+            self._entries[session_id] = (self._clock(), state)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                logger.debug("Evicted session %s (store full)", evicted)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._entries.pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DatabaseSessionStore(SessionStore):
+    """Store that rehydrates sessions from ``ChatSession``/``ChatMessageRecord``.
+
+    The database is the source of truth, so any worker can serve any session.
+    The routers already persist every turn; ``put`` is therefore a no-op and
+    ``delete`` closes the session row rather than removing its audit trail.
+    The async methods run the queries on a worker thread.
+    """
+
+    def __init__(self, loader: SessionLoader):
+        self._loader = loader
+
+    def get(self, session_id: str) -> Any | None:
+        from database.db import SessionLocal
+        from database.schemas import ChatSession, ChatMessageRecord
+
+        db = SessionLocal()
+        try:
+            record = db.get(ChatSession, session_id)
+            if not record or record.status == "closed":
+                return None
+            messages = (
+                db.query(ChatMessageRecord)
+                .filter(ChatMessageRecord.session_id == session_id)
+                .order_by(ChatMessageRecord.timestamp)
+                .all()
+            )
+            return self._loader(record, messages)
+        finally:
+            db.close()
+
+    def put(self, session_id: str, state: Any) -> None:
+        return None
+
+    async def aget(self, session_id: str) -> Any | None:
+        return await asyncio.to_thread(self.get, session_id)
+
+    async def adelete(self, session_id: str) -> bool:
+        return await asyncio.to_thread(self.delete, session_id)
+
+    def delete(self, session_id: str) -> bool:
+        from database.db import SessionLocal
+        from database.schemas import ChatSession
+
+        db = SessionLocal()
+        try:
+            record = db.get(ChatSession, session_id)
+            if not record or record.status == "closed":
+                return False
+            record.status = "closed"
+            db.commit()
+            return True
+        finally:
+            db.close()
+
+
+def create_session_store(loader: SessionLoader) -> SessionStore:
+    """Build the session store selected by ``SESSION_STORE_BACKEND``."""
+    if settings.SESSION_STORE_BACKEND == "database":
+        return DatabaseSessionStore(loader)
+    return MemorySessionStore(
+        max_entries=settings.SESSION_MAX_ENTRIES,
+        ttl_seconds=settings.SESSION_TTL_SECONDS,
+    )
+
+
+def history_from_records(messages: list, roles: tuple[str, ...] = ("user", "assistant")) -> list[dict]:
+    """Convert stored ``ChatMessageRecord`` rows into LLM message history."""
+    return [{"role": m.role, "content": m.content} for m in messages if m.role in roles]
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+"""Chunked upload-to-disk helper with an incremental size limit."""
+
+import uuid
+from pathlib import Path
+
+import aiofiles
+from fastapi import HTTPException, UploadFile
+
+CHUNK_SIZE = 1024 * 1024
+
+
+async def save_upload(
+    file: UploadFile,
+    dest_dir: Path,
+    max_bytes: int,
+    default_name: str = "upload.bin",
+) -> Path:
+    """Copy an upload to ``dest_dir`` under a random name, one chunk at a time.
+
+    At most one chunk is held in memory. The copy stops at the first chunk
+    that goes over ``max_bytes``; the partial file is removed and a 413 is
+    raised. The caller owns the returned file and must delete it.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(413, f"File too large. Max size: {max_bytes // (1024 * 1024)}MB")
+
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    file_ext = Path(file.filename or default_name).suffix or Path(default_name).suffix
+    path = dest_dir / f"{uuid.uuid4()}{file_ext}"
+
+    written = 0
+    try:
+        async with aiofiles.open(path, "wb") as out:
+            while chunk := await file.read(CHUNK_SIZE):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise HTTPException(413, f"File too large. Max size: {max_bytes // (1024 * 1024)}MB")
+                await out.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return path
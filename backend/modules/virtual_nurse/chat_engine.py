@@ -4,35 +4,46 @@ from __future__ import annotations
 
 import uuid
 import logging
+from typing import AsyncIterator
+from config import settings
 from modules.shared.claude_client import llm_client
+from modules.shared.context_window import build_context
 from modules.shared.safety import check_emergency, sanitize_response, should_escalate, EMERGENCY_RESPONSE, AI_DISCLOSURE
+from modules.shared.session_store import create_session_store, history_from_records
 
 logger = logging.getLogger(__name__)
 
-# In-memory session store (maps session_id -> message history)
-_sessions: dict[str, list[dict]] = {}
 
+def _load_chat_session(record, messages) -> list[dict] | None:
+    """Rehydrate a general chat history from the database."""
+    if record.session_type != "general":
+        return None
+    return history_from_records(messages)
 
-def get_or_create_session(session_id: str | None = None) -> tuple[str, list[dict]]:
-    """Get existing session or create a new one."""
-    if session_id and session_id in _sessions:
-        return session_id, _sessions[session_id]
-    new_id = session_id or str(uuid.uuid4())
-    _sessions[new_id] = []
-    return new_id, _sessions[new_id]
 
+# Session store (maps session_id -> message history)
+_sessions = create_session_store(_load_chat_session)
 
-def chat(
-    message: str,
-    session_id: str | None = None,
-    system_prompt: str | None = None,
-) -> dict:
-    """Process a patient chat message with safety guardrails.
+CHAT_FALLBACK = (
+    "I'm sorry, I'm having trouble processing your message right now. "
+    "If this is an emergency, please call 911. Otherwise, please try again."
+)
 
-    Returns dict with response, session_id, escalation info.
-    """
-    sid, history = get_or_create_session(session_id)
 
+async def get_or_create_session(session_id: str | None = None) -> tuple[str, list[dict]]:
+    """Get existing session or create a new one."""
+    if session_id:
+        history = await _sessions.aget(session_id)
+        if history is not None:
+            return session_id, history
+    new_id = session_id or str(uuid.uuid4())
+    history = []
+    _sessions.put(new_id, history)
+    return new_id, history
+
+
+def _check_guardrails(message: str, sid: str, history: list[dict]) -> dict | None:
+    """Return a canned escalation result if the message must not reach the LLM."""
     # Check for emergency before processing
     is_emergency, keyword = check_emergency(message)
     if is_emergency:
@@ -57,47 +68,120 @@ def chat(
             "escalation": True,
             "escalation_reason": escalation["reason"],
         }
+    return None
+
+
+def _history_window(history: list[dict]) -> tuple[list[dict], str]:
+    """Token-budgeted history window plus a summary of older turns."""
+    return build_context(
+        history,
+        settings.CHAT_HISTORY_TOKEN_BUDGET,
+        settings.HISTORY_SUMMARY_TOKEN_BUDGET,
+    )
+
+
+def _complete_turn(message: str, response: str, sid: str, history: list[dict]) -> dict:
+    """Record a completed LLM turn in the session and build the result."""
+    history.append({"role": "user", "content": message})
+    history.append({"role": "assistant", "content": response})
+    return {
+        "message": response,
+        "session_id": sid,
+        "escalation": False,
+        "escalation_reason": None,
+    }
+
+
+async def chat(
+    message: str,
+    session_id: str | None = None,
+    system_prompt: str | None = None,
+) -> dict:
+    """Process a patient chat message with safety guardrails.
+
+    Returns dict with response, session_id, escalation info.
+    """
+    sid, history = await get_or_create_session(session_id)
+
+    guarded = _check_guardrails(message, sid, history)
+    if guarded:
+        return guarded
 
     # Call Claude with conversation history
     try:
-        response = llm_client.chat(message, history, system_prompt=system_prompt)
+        window, summary = _history_window(history)
+        response = await llm_client.achat(message, window, system_prompt=system_prompt, summary=summary)
         response = sanitize_response(response)
 
         # Prepend AI disclosure on first message
         if not history:
             response = f"{AI_DISCLOSURE}\n\n{response}"
 
-        history.append({"role": "user", "content": message})
-        history.append({"role": "assistant", "content": response})
-
+        return _complete_turn(message, response, sid, history)
+    except Exception as e:
+        logger.error("Chat engine error: %s", e)
         return {
-            "message": response,
+            "message": CHAT_FALLBACK,
             "session_id": sid,
             "escalation": False,
             "escalation_reason": None,
         }
+
+
+async def chat_stream(
+    message: str,
+    session_id: str | None = None,
+    system_prompt: str | None = None,
+) -> AsyncIterator[dict]:
+    """Streaming variant of ``chat``.
+
+    Yields ``{"type": "token", "text": ...}`` events as the completion arrives,
+    then a single ``{"type": "done", ...}`` event carrying the same payload
+    ``chat`` returns. The ``done`` message is authoritative: it includes the
+    safety disclaimer and replaces any partial text if the stream fails.
+    """
+    sid, history = await get_or_create_session(session_id)
+
+    guarded = _check_guardrails(message, sid, history)
+    if guarded:
+        yield {"type": "token", "text": guarded["message"]}
+        yield {"type": "done", **guarded}
+        return
+
+    prefix = f"{AI_DISCLOSURE}\n\n" if not history else ""
+    if prefix:
+        yield {"type": "token", "text": prefix}
+
+    window, summary = _history_window(history)
+    parts: list[str] = []
+    try:
+        async for text in llm_client.astream_chat(message, window, system_prompt=system_prompt, summary=summary):
+            parts.append(text)
+            yield {"type": "token", "text": text}
     except Exception as e:
-        logger.error("Chat engine error: %s", e)
-        fallback = (
-            "I'm sorry, I'm having trouble processing your message right now. "
-            "If this is an emergency, please call 911. Otherwise, please try again."
-        )
-        return {
-            "message": fallback,
+        logger.error("Chat stream error: %s", e)
+        yield {
+            "type": "done",
+            "message": CHAT_FALLBACK,
             "session_id": sid,
             "escalation": False,
             "escalation_reason": None,
         }
+        return
+
+    raw = "".join(parts)
+    response = sanitize_response(raw)
+    if len(response) > len(raw):
+        yield {"type": "token", "text": response[len(raw):]}
+
+    yield {"type": "done", **_complete_turn(message, prefix + response, sid, history)}
 
 
-def get_session_history(session_id: str) -> list[dict]:
+async def get_session_history(session_id: str) -> list[dict]:
     """Get the message history for a session."""
-    return _sessions.get(session_id, [])
+    return await _sessions.aget(session_id) or []
 
 
-def clear_session(session_id: str) -> bool:
+async def clear_session(session_id: str) -> bool:
     """Clear a session's history."""
-    if session_id in _sessions:
-        del _sessions[session_id]
-        return True
-    return False
+    return await _sessions.adelete(session_id)
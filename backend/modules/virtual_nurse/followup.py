@@ -4,13 +4,37 @@ from __future__ import annotations
 
 import uuid
 import logging
+from typing import AsyncIterator
+from config import settings
 from modules.shared.claude_client import llm_client
+from modules.shared.context_window import build_context
 from modules.shared.safety import check_emergency, EMERGENCY_RESPONSE
+from modules.shared.session_store import create_session_store, history_from_records
 
 logger = logging.getLogger(__name__)
 
-# In-memory follow-up sessions
-_followup_sessions: dict[str, dict] = {}
+
+def _load_followup_session(record, messages) -> dict | None:
+    """Rehydrate a follow-up session; its context is stored as the system message."""
+    if record.session_type != "followup":
+        return None
+    context = next((m.content for m in messages if m.role == "system"), "")
+    return {
+        "patient_id": record.patient_id,
+        "followup_type": record.followup_type,
+        "context": context,
+        "history": history_from_records(messages),
+        "concerns": [],
+        "complete": record.status == "completed",
+    }
+
+
+# Follow-up session store
+_followup_sessions = create_session_store(_load_followup_session)
+
+FOLLOWUP_FALLBACK = (
+    "I'm having trouble right now. If you have urgent concerns, please call your provider's office."
+)
 
 FOLLOWUP_TEMPLATES = {
     "24hr": (
@@ -50,67 +74,132 @@ def start_followup(
 
     greeting = FOLLOWUP_TEMPLATES.get(followup_type, FOLLOWUP_TEMPLATES["24hr"])
 
-    _followup_sessions[session_id] = {
+    _followup_sessions.put(session_id, {
         "patient_id": patient_id,
         "followup_type": followup_type,
         "context": context,
         "history": [{"role": "assistant", "content": greeting}],
         "concerns": [],
         "complete": False,
-    }
+    })
 
     return {
         "session_id": session_id,
         "message": greeting,
+        "context": context,
         "complete": False,
     }
 
 
-def process_followup_message(session_id: str, message: str) -> dict:
+def _check_followup_emergency(session_id: str, session: dict, message: str) -> dict | None:
+    """Return an escalation result if the follow-up message reports an emergency."""
+    is_emergency, keyword = check_emergency(message)
+    if not is_emergency:
+        return None
+    session["history"].append({"role": "user", "content": message})
+    session["history"].append({"role": "assistant", "content": EMERGENCY_RESPONSE})
+    return {
+        "session_id": session_id,
+        "message": EMERGENCY_RESPONSE,
+        "escalation": True,
+        "escalation_reason": f"Emergency keyword: {keyword}",
+        "complete": False,
+    }
+
+
+def _history_window(session: dict) -> tuple[list[dict], str]:
+    """Token-budgeted history window plus a summary of older turns."""
+    return build_context(
+        session["history"],
+        settings.FOLLOWUP_HISTORY_TOKEN_BUDGET,
+        settings.HISTORY_SUMMARY_TOKEN_BUDGET,
+    )
+
+
+def _complete_followup_turn(session_id: str, session: dict, message: str, response: str) -> dict:
+    """Record a completed follow-up turn and flag completion."""
+    session["history"].append({"role": "user", "content": message})
+    session["history"].append({"role": "assistant", "content": response})
+
+    # Check if follow-up is complete
+    complete = _check_followup_complete(response)
+    if complete:
+        session["complete"] = True
+
+    return {
+        "session_id": session_id,
+        "message": response,
+        "complete": complete,
+    }
+
+
+async def process_followup_message(session_id: str, message: str) -> dict:
     """Process a patient message during follow-up."""
-    session = _followup_sessions.get(session_id)
+    session = await _followup_sessions.aget(session_id)
     if not session:
         return {"error": "Session not found", "session_id": session_id}
 
-    # Emergency check
-    is_emergency, keyword = check_emergency(message)
-    if is_emergency:
-        session["history"].append({"role": "user", "content": message})
-        session["history"].append({"role": "assistant", "content": EMERGENCY_RESPONSE})
-        return {
-            "session_id": session_id,
-            "message": EMERGENCY_RESPONSE,
-            "escalation": True,
-            "complete": False,
-        }
+    guarded = _check_followup_emergency(session_id, session, message)
+    if guarded:
+        return guarded
+
+    window, summary = _history_window(session)
 
     try:
-        response = llm_client.followup_chat(
+        response = await llm_client.afollowup_chat(
             message,
-            session["history"],
+            window,
             context=session["context"],
+            summary=summary,
         )
-
-        session["history"].append({"role": "user", "content": message})
-        session["history"].append({"role": "assistant", "content": response})
-
-        # Check if follow-up is complete
-        complete = _check_followup_complete(response)
-        if complete:
-            session["complete"] = True
-
+        return _complete_followup_turn(session_id, session, message, response)
+    except Exception as e:
+        logger.error("Follow-up processing error: %s", e)
         return {
             "session_id": session_id,
-            "message": response,
-            "complete": complete,
+            "message": FOLLOWUP_FALLBACK,
+            "complete": False,
         }
+
+
+async def process_followup_message_stream(session_id: str, message: str) -> AsyncIterator[dict]:
+    """Streaming variant of ``process_followup_message``.
+
+    Yields ``token`` events followed by one ``done`` event with the same
+    payload ``process_followup_message`` returns; a session that has gone
+    missing ends the stream with a ``done`` event carrying ``error``.
+    """
+    session = await _followup_sessions.aget(session_id)
+    if not session:
+        yield {"type": "done", "error": "Session not found", "session_id": session_id}
+        return
+
+    guarded = _check_followup_emergency(session_id, session, message)
+    if guarded:
+        yield {"type": "token", "text": guarded["message"]}
+        yield {"type": "done", **guarded}
+        return
+
+    window, summary = _history_window(session)
+    parts: list[str] = []
+    try:
+        async for text in llm_client.astream_followup_chat(
+            message,
+            window,
+            context=session["context"],
+            summary=summary,
+        ):
+            parts.append(text)
+            yield {"type": "token", "text": text}
+        result = _complete_followup_turn(session_id, session, message, "".join(parts))
     except Exception as e:
-        logger.error("Follow-up processing error: %s", e)
-        return {
+        logger.error("Follow-up stream error: %s", e)
+        result = {
             "session_id": session_id,
-            "message": "I'm having trouble right now. If you have urgent concerns, please call your provider's office.",
+            "message": FOLLOWUP_FALLBACK,
             "complete": False,
         }
+    yield {"type": "done", **result}
 
 
 def _check_followup_complete(response: str) -> bool:
@@ -126,6 +215,6 @@ def _check_followup_complete(response: str) -> bool:
     return any(phrase in response.lower() for phrase in completion_phrases)
 
 
-def get_followup_session(session_id: str) -> dict | None:
+async def get_followup_session(session_id: str) -> dict | None:
     """Get follow-up session data."""
-    return _followup_sessions.get(session_id)
+    return await _followup_sessions.aget(session_id)
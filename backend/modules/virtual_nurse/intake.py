@@ -4,13 +4,32 @@ from __future__ import annotations
 
 import uuid
 import logging
+from typing import AsyncIterator
+from config import settings
 from modules.shared.claude_client import llm_client
+from modules.shared.context_window import build_context
 from modules.shared.safety import check_emergency, EMERGENCY_RESPONSE
+from modules.shared.session_store import create_session_store, history_from_records
 
 logger = logging.getLogger(__name__)
 
-# In-memory intake sessions
-_intake_sessions: dict[str, dict] = {}
+
+def _load_intake_session(record, messages) -> dict | None:
+    """Rehydrate an intake session from the database."""
+    if record.session_type != "intake":
+        return None
+    return {
+        "patient_id": record.patient_id,
+        "appointment_reason": None,
+        "collected_data": record.intake_data or collect_answers(history_from_records(messages)),
+        "history": history_from_records(messages),
+        "current_field_index": 0,
+        "complete": record.status == "completed",
+    }
+
+
+# Intake session store
+_intake_sessions = create_session_store(_load_intake_session)
 
 INTAKE_GREETING = (
     "Hello! I'm your virtual nursing assistant. I'll be helping collect some "
@@ -20,6 +39,8 @@ INTAKE_GREETING = (
     "Let's start: What is the main reason for your visit today?"
 )
 
+INTAKE_FALLBACK = "I'm sorry, I had trouble processing that. Could you please repeat?"
+
 INTAKE_FIELDS = [
     "chief_complaint",
     "history_of_present_illness",
@@ -31,6 +52,45 @@ INTAKE_FIELDS = [
     "review_of_systems",
 ]
 
+# Question wording -> the intake field the patient's answer fills (first match wins)
+FIELD_CUES = [
+    ("allergies", ("allerg",)),
+    ("current_medications", ("medication", "medicine", "prescription", "supplement")),
+    ("family_history", ("family", "parents", "sibling", "relatives")),
+    ("social_history", ("smok", "tobacco", "alcohol", "drink", "exercise", "recreational")),
+    ("past_medical_history", ("medical history", "medical condition", "chronic", "surger", "hospitali")),
+    ("review_of_systems", ("other symptoms", "fever", "chills", "nausea", "shortness of breath", "weight")),
+    ("chief_complaint", ("reason for your visit", "what brings you", "main reason", "what's been going on")),
+    ("history_of_present_illness", ("when did", "how long", "how severe", "scale", "describe", "where", "worse", "better")),
+]
+MAX_ANSWER_CHARS = 200
+
+
+def _field_for_question(question: str) -> str:
+    text = question.lower()
+    for field, cues in FIELD_CUES:
+        if any(cue in text for cue in cues):
+            return field
+    return "other"
+
+
+def collect_answers(history: list[dict]) -> dict:
+    """Intake data gathered so far: each patient answer filed under the field its question asked about.
+
+    A cheap stand-in for the structured summary generated at completion,
+    used to condense older turns while the intake is still running.
+    """
+    collected: dict[str, list[str]] = {}
+    question = ""
+    for message in history:
+        if message["role"] == "assistant":
+            question = message["content"]
+            continue
+        answer = " ".join(message["content"].split())[:MAX_ANSWER_CHARS]
+        if answer:
+            collected.setdefault(_field_for_question(question), []).append(answer)
+    return collected
+
 
 def start_intake(
     patient_id: str | None = None,
@@ -38,7 +98,7 @@ def start_intake(
 ) -> dict:
     """Start a new intake session."""
     session_id = str(uuid.uuid4())
-    _intake_sessions[session_id] = {
+    session = {
         "patient_id": patient_id,
         "appointment_reason": appointment_reason,
         "collected_data": {},
@@ -56,9 +116,8 @@ def start_intake(
             "Can you tell me more about what's been going on?"
         )
 
-    _intake_sessions[session_id]["history"].append(
-        {"role": "assistant", "content": greeting}
-    )
+    session["history"].append({"role": "assistant", "content": greeting})
+    _intake_sessions.put(session_id, session)
 
     return {
         "session_id": session_id,
@@ -67,62 +126,114 @@ def start_intake(
     }
 
 
-def process_intake_message(session_id: str, message: str) -> dict:
-    """Process a patient message during intake."""
-    session = _intake_sessions.get(session_id)
-    if not session:
-        return {"error": "Session not found", "session_id": session_id}
-
-    # Emergency check
+def _check_intake_emergency(session_id: str, session: dict, message: str) -> dict | None:
+    """Return an escalation result if the intake message reports an emergency."""
     is_emergency, keyword = check_emergency(message)
-    if is_emergency:
-        session["history"].append({"role": "user", "content": message})
-        session["history"].append({"role": "assistant", "content": EMERGENCY_RESPONSE})
+    if not is_emergency:
+        return None
+    session["history"].append({"role": "user", "content": message})
+    session["history"].append({"role": "assistant", "content": EMERGENCY_RESPONSE})
+    return {
+        "session_id": session_id,
+        "message": EMERGENCY_RESPONSE,
+        "escalation": True,
+        "escalation_reason": f"Emergency keyword: {keyword}",
+        "complete": False,
+    }
+
+
+def _history_window(session: dict) -> tuple[list[dict], str]:
+    """Token-budgeted history window; older turns are summarized from the data collected so far."""
+    return build_context(
+        session["history"],
+        settings.INTAKE_HISTORY_TOKEN_BUDGET,
+        settings.HISTORY_SUMMARY_TOKEN_BUDGET,
+        collected_data=session["collected_data"],
+    )
+
+
+async def _complete_intake_turn(session_id: str, session: dict, message: str, response: str) -> dict:
+    """Record a completed intake turn and summarize if the intake is done."""
+    session["history"].append({"role": "user", "content": message})
+    session["history"].append({"role": "assistant", "content": response})
+
+    # Check if intake appears complete (Claude mentions summary or all fields collected)
+    if _check_intake_complete(response, session):
+        session["complete"] = True
+        summary = await _generate_intake_summary(session)
+        session["collected_data"] = summary
         return {
             "session_id": session_id,
-            "message": EMERGENCY_RESPONSE,
-            "escalation": True,
-            "escalation_reason": f"Emergency keyword: {keyword}",
-            "complete": False,
+            "message": response,
+            "complete": True,
+            "intake_summary": summary,
         }
 
-    # Build context for Claude
-    context = "Information collected so far:\n"
-    for field, value in session["collected_data"].items():
-        context += f"- {field}: {value}\n"
+    session["collected_data"] = collect_answers(session["history"])
+    return {
+        "session_id": session_id,
+        "message": response,
+        "complete": False,
+    }
+
 
-    history = session["history"]
+async def process_intake_message(session_id: str, message: str) -> dict:
+    """Process a patient message during intake."""
+    session = await _intake_sessions.aget(session_id)
+    if not session:
+        return {"error": "Session not found", "session_id": session_id}
 
-    try:
-        response = llm_client.intake_chat(message, history)
-
-        session["history"].append({"role": "user", "content": message})
-        session["history"].append({"role": "assistant", "content": response})
-
-        # Check if intake appears complete (Claude mentions summary or all fields collected)
-        if _check_intake_complete(response, session):
-            session["complete"] = True
-            summary = _generate_intake_summary(session)
-            session["collected_data"] = summary
-            return {
-                "session_id": session_id,
-                "message": response,
-                "complete": True,
-                "intake_summary": summary,
-            }
+    guarded = _check_intake_emergency(session_id, session, message)
+    if guarded:
+        return guarded
+
+    window, summary = _history_window(session)
 
+    try:
+        response = await llm_client.aintake_chat(message, window, summary=summary)
+        return await _complete_intake_turn(session_id, session, message, response)
+    except Exception as e:
+        logger.error("Intake processing error: %s", e)
         return {
             "session_id": session_id,
-            "message": response,
+            "message": INTAKE_FALLBACK,
             "complete": False,
         }
+
+
+async def process_intake_message_stream(session_id: str, message: str) -> AsyncIterator[dict]:
+    """Streaming variant of ``process_intake_message``.
+
+    Yields ``token`` events followed by one ``done`` event with the same
+    payload ``process_intake_message`` returns; a session that has gone
+    missing ends the stream with a ``done`` event carrying ``error``.
+    """
+    session = await _intake_sessions.aget(session_id)
+    if not session:
+        yield {"type": "done", "error": "Session not found", "session_id": session_id}
+        return
+
+    guarded = _check_intake_emergency(session_id, session, message)
+    if guarded:
+        yield {"type": "token", "text": guarded["message"]}
+        yield {"type": "done", **guarded}
+        return
+
+    window, summary = _history_window(session)
+    parts: list[str] = []
+    try:
+        async for text in llm_client.astream_intake_chat(message, window, summary=summary):
+            parts.append(text)
+            yield {"type": "token", "text": text}
+        result = await _complete_intake_turn(session_id, session, message, "".join(parts))
     except Exception as e:
-        logger.error("Intake processing error: %s", e)
-        return {
+        logger.error("Intake stream error: %s", e)
+        result = {
             "session_id": session_id,
-            "message": "I'm sorry, I had trouble processing that. Could you please repeat?",
+            "message": INTAKE_FALLBACK,
             "complete": False,
         }
+    yield {"type": "done", **result}
 
 
 def _check_intake_complete(response: str, session: dict) -> bool:
@@ -139,7 +250,7 @@ def _check_intake_complete(response: str, session: dict) -> bool:
     return any(phrase in response.lower() for phrase in completion_phrases)
 
 
-def _generate_intake_summary(session: dict) -> dict:
+async def _generate_intake_summary(session: dict) -> dict:
     """Extract structured intake data from the conversation."""
     conversation = "\n".join(
         f"{m['role'].upper()}: {m['content']}" for m in session["history"]
@@ -154,12 +265,12 @@ def _generate_intake_summary(session: dict) -> dict:
     )
 
     try:
-        response = llm_client.chat(prompt, [], system_prompt="Extract structured data from the conversation. Return valid JSON only.")
+        response = await llm_client.achat(prompt, [], system_prompt="Extract structured data from the conversation. Return valid JSON only.")
         return llm_client.extract_json(response)
     except Exception:
         return {"raw_conversation": conversation}
 
 
-def get_intake_session(session_id: str) -> dict | None:
+async def get_intake_session(session_id: str) -> dict | None:
     """Get intake session data."""
-    return _intake_sessions.get(session_id)
+    return await _intake_sessions.aget(session_id)
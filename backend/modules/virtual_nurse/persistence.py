@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+"""Persistence of virtual nurse conversation turns and triage records."""
+
+import asyncio
+import logging
+import uuid
+from contextlib import suppress
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database.db import AsyncSessionLocal, database_unreachable
+from database.schemas import ChatSession, ChatMessageRecord, TriageRecord
+from modules.shared.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _dialect_insert(dialect_name: str):
+    return postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+
+
+def _session_row(session_id: str, hospital_id: str | None, updates: dict) -> dict:
+    return {"id": session_id, "session_type": "general", "status": "active", "hospital_id": hospital_id, **updates}
+
+
+def upsert_session(dialect_name: str, session_id: str, hospital_id: str | None, updates: dict):
+    """``INSERT`` a general, active session row unless it exists; apply ``updates`` either way."""
+    stmt = _dialect_insert(dialect_name)(ChatSession).values(_session_row(session_id, hospital_id, updates))
+    if not updates:
+        return stmt.on_conflict_do_nothing(index_elements=[ChatSession.id])
+    return stmt.on_conflict_do_update(
+        index_elements=[ChatSession.id],
+        set_={**updates, "updated_at": datetime.utcnow()},
+    )
+
+
+def _message_rows(session_id: str, messages: list[tuple[str, str]]) -> list[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            # Distinct timestamps keep the turn's order under ORDER BY timestamp
+            "timestamp": now + timedelta(microseconds=i),
+        }
+        for i, (role, content) in enumerate(messages)
+    ]
+
+
+async def save_turn(
+    db: AsyncSession,
+    session_id: str,
+    messages: list[tuple[str, str]],
+    hospital_id: str | None = None,
+    session_updates: dict | None = None,
+) -> None:
+    """Write a turn's ``(role, content)`` messages and session changes in one transaction.
+
+    The session row is upserted (created as a general chat if the turn
+    arrives first) and the messages go in as one multi-row insert, so a
+    turn costs two statements and a single commit.
+    """
+    await db.execute(upsert_session(db.bind.dialect.name, session_id, hospital_id, session_updates or {}))
+    if messages:
+        await db.execute(insert(ChatMessageRecord).values(_message_rows(session_id, messages)))
+    await db.commit()
+
+
+class _Entry:
+    """One ``add_turn`` or ``add_triage`` call; a failing flush is split down to these."""
+
+    __slots__ = ("session_id", "hospital_id", "updates", "messages", "triage", "attempts")
+
+    def __init__(
+        self,
+        session_id: str | None = None,
+        hospital_id: str | None = None,
+        updates: dict | None = None,
+        messages: list[dict] | None = None,
+        triage: dict | None = None,
+    ):
+        self.session_id = session_id
+        self.hospital_id = hospital_id
+        self.updates = updates or {}
+        self.messages = messages or []
+        self.triage = triage
+        self.attempts = 0
+
+    @property
+    def rows(self) -> int:
+        return len(self.messages) + (self.triage is not None)
+
+
+class WriteBehindLog:
+    """Buffers chat turns and triage records and writes them in group commits.
+
+    ``add_turn`` and ``add_triage`` return at once; a background task
+    flushes every ``flush_ms``, or as soon as ``max_rows`` rows are waiting,
+    writing everything pending in one transaction: session upserts first,
+    then a bulk insert per table. Rows written in the last interval before
+    a crash are lost, and reads may lag writes by up to one interval.
+
+    When the database is unreachable the rows are kept for the next flush
+    and ``stop`` drains them before shutdown. Any other failure is narrowed
+    down by splitting the batch in halves, so one bad row cannot hold up
+    the rest; a turn or triage record that still fails alone after
+    ``MAX_ATTEMPTS`` flushes is logged and dropped. Once ``max_pending``
+    rows are buffered ``accepting`` turns false and callers write directly.
+    """
+
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, session_factory, flush_ms: int, max_rows: int, max_pending: int = 10_000):
+        self._session_factory = session_factory
+        self.flush_interval = flush_ms / 1000
+        self.max_rows = max_rows
+        self.max_pending = max_pending
+        self._entries: list[_Entry] = []
+        self._pending = 0
+        self._lock = asyncio.Lock()
+        self._wakeup: asyncio.Event | None = None
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def accepting(self) -> bool:
+        """Running and below ``max_pending``; otherwise write through ``save_turn``."""
+        return self.running and self._pending < self.max_pending
+
+    @property
+    def pending(self) -> int:
+        """Rows queued or being written."""
+        return self._pending
+
+    def add_turn(
+        self,
+        session_id: str,
+        messages: list[tuple[str, str]],
+        hospital_id: str | None = None,
+        session_updates: dict | None = None,
+    ) -> None:
+        """Queue a turn; same arguments as ``save_turn`` without the session."""
+        self._add(_Entry(session_id, hospital_id, session_updates, _message_rows(session_id, messages)))
+
+    def add_triage(self, **fields) -> None:
+        """Queue a ``TriageRecord`` row (columns as keyword arguments)."""
+        self._add(_Entry(triage={"id": str(uuid.uuid4()), "created_at": datetime.utcnow(), **fields}))
+
+    def _add(self, entry: _Entry) -> None:
+        self._entries.append(entry)
+        self._pending += entry.rows
+        if self._pending >= self.max_rows and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info("Chat write-behind log started (every %dms or %d rows)", self.flush_interval * 1000, self.max_rows)
+
+    async def stop(self) -> None:
+        """Flush everything still buffered; called from the app's shutdown."""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        with suppress(Exception):
+            await self.flush()
+        if self.pending:
+            logger.error("Chat write-behind log could not write %d rows at shutdown", self.pending)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Chat write-behind flush failed, retrying: %s", e)
+
+    async def flush(self) -> int:
+        """Write the buffered rows; returns the rows written.
+
+        Raises (keeping the unwritten rows) if the database is unreachable.
+        """
+        async with self._lock:
+            if not self._entries:
+                return 0
+            chunks, self._entries = [self._entries], []
+            retry: list[_Entry] = []
+            written = 0
+            try:
+                while chunks:
+                    chunk = chunks[0]
+                    try:
+                        async with self._session_factory() as db:
+                            await self._write(db, chunk)
+                    except Exception as e:
+                        if database_unreachable(e):
+                            raise
+                        chunks.pop(0)
+                        if len(chunk) > 1:
+                            middle = len(chunk) // 2
+                            chunks[:0] = [chunk[:middle], chunk[middle:]]
+                        else:
+                            retry.extend(self._failed(chunk[0], e))
+                        continue
+                    chunks.pop(0)
+                    written += sum(entry.rows for entry in chunk)
+            finally:
+                # Put unwritten rows back ahead of anything queued meanwhile
+                self._entries = retry + [entry for chunk in chunks for entry in chunk] + self._entries
+                self._pending = sum(entry.rows for entry in self._entries)
+                if chunks or retry:
+                    metrics.incr("chat_log.flush_errors")
+        metrics.incr("chat_log.flushes")
+        metrics.incr("chat_log.rows", written)
+        return written
+
+    def _failed(self, entry: _Entry, error: Exception) -> list[_Entry]:
+        """Count a failed attempt at writing ``entry`` alone; drop it after ``MAX_ATTEMPTS``."""
+        entry.attempts += 1
+        if entry.attempts < self.MAX_ATTEMPTS:
+            return [entry]
+        logger.error(
+            "Dropping %s for session %s after %d failed writes: %s",
+            "triage record" if entry.triage is not None else f"{len(entry.messages)} chat messages",
+            entry.session_id,
+            entry.attempts,
+            error,
+        )
+        metrics.incr("chat_log.dropped", entry.rows)
+        return []
+
+    @staticmethod
+    async def _write(db: AsyncSession, entries: list[_Entry]) -> None:
+        sessions: dict[str, tuple[str | None, dict]] = {}
+        for entry in entries:
+            if entry.session_id is not None:
+                known_hospital, known_updates = sessions.get(entry.session_id, (None, {}))
+                sessions[entry.session_id] = (known_hospital or entry.hospital_id, {**known_updates, **entry.updates})
+        messages = [row for entry in entries for row in entry.messages]
+        triage = [entry.triage for entry in entries if entry.triage is not None]
+
+        dialect_name = db.bind.dialect.name
+        new_sessions = [
+            _session_row(session_id, hospital_id, {})
+            for session_id, (hospital_id, updates) in sessions.items()
+            if not updates
+        ]
+        if new_sessions:
+            stmt = _dialect_insert(dialect_name)(ChatSession).on_conflict_do_nothing(index_elements=[ChatSession.id])
+            await db.execute(stmt, new_sessions)
+        for session_id, (hospital_id, updates) in sessions.items():
+            if updates:
+                await db.execute(upsert_session(dialect_name, session_id, hospital_id, updates))
+        if messages:
+            await db.execute(insert(ChatMessageRecord), messages)
+        if triage:
+            await db.execute(insert(TriageRecord), triage)
+        await db.commit()
+
+
+chat_log = WriteBehindLog(
+    AsyncSessionLocal,
+    flush_ms=settings.CHAT_WRITE_BEHIND_FLUSH_MS,
+    max_rows=settings.CHAT_WRITE_BEHIND_MAX_ROWS,
+    max_pending=settings.CHAT_WRITE_BEHIND_MAX_PENDING,
+)
@@ -1,13 +1,16 @@
 """API endpoints for virtual nursing assistant."""
 
+import json
 import uuid
 import logging
-from typing import Optional
+from typing import AsyncIterator, Optional
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.db import get_db
-from database.schemas import ChatSession, ChatMessageRecord, TriageRecord
+from database.db import get_db, AsyncSessionLocal
+from database.schemas import ChatSession, ChatMessageRecord, TriageRecord, Patient
 from modules.shared.models import (
     ChatRequest,
     ChatResponse,
@@ -16,17 +19,28 @@ from modules.shared.models import (
     TriageResult,
     FollowUpStartRequest,
 )
-from modules.virtual_nurse.chat_engine import chat, get_session_history, clear_session
-from modules.virtual_nurse.intake import start_intake, process_intake_message, get_intake_session
+from modules.virtual_nurse.chat_engine import chat, chat_stream, get_session_history, clear_session
+from modules.virtual_nurse.intake import (
+    start_intake,
+    process_intake_message,
+    process_intake_message_stream,
+    get_intake_session,
+)
 from modules.virtual_nurse.triage import assess_triage
-from modules.virtual_nurse.followup import start_followup, process_followup_message
-from modules.auth.utils import get_current_user, get_hospital_id
+from modules.virtual_nurse.persistence import save_turn, chat_log
+from modules.virtual_nurse.followup import (
+    start_followup,
+    process_followup_message,
+    process_followup_message_stream,
+    get_followup_session,
+)
+from modules.auth.utils import get_current_user, get_hospital_id, bind_llm_tenant
 
 logger = logging.getLogger(__name__)
 router = APIRouter(
     prefix="/api/nurse",
     tags=["Virtual Nurse"],
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(bind_llm_tenant)],
 )
 
 
@@ -36,21 +50,16 @@ router = APIRouter(
 async def chat_endpoint(
     request: ChatRequest,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Send a chat message to the virtual nurse."""
     if not request.message.strip():
         raise HTTPException(400, "Message cannot be empty")
 
-    result = chat(request.message, session_id=request.session_id)
+    result = await chat(request.message, session_id=request.session_id)
 
     # Persist to database
-    hospital_id = get_hospital_id(current_user)
-    _save_chat_message(db, result["session_id"], "user", request.message, hospital_id=hospital_id)
-    _save_chat_message(db, result["session_id"], "assistant", result["message"], hospital_id=hospital_id)
-
-    if result.get("escalation"):
-        _mark_session_escalated(db, result["session_id"], result.get("escalation_reason"))
+    await _record_chat_result(db, request.message, result, get_hospital_id(current_user))
 
     return ChatResponse(
         message=result["message"],
@@ -60,17 +69,39 @@ async def chat_endpoint(
     )
 
 
+@router.post("/chat/stream")
+async def chat_stream_endpoint(
+    request: ChatRequest,
+    current_user: dict = Depends(get_current_user),
+):
+    """Stream the virtual nurse reply as Server-Sent Events.
+
+    Emits ``token`` events with text deltas, then a ``done`` event with the
+    same fields as ``POST /chat``. The turn is persisted before ``done``.
+    """
+    if not request.message.strip():
+        raise HTTPException(400, "Message cannot be empty")
+
+    hospital_id = get_hospital_id(current_user)
+
+    async def persist(result: dict):
+        async with AsyncSessionLocal() as db:
+            await _record_chat_result(db, request.message, result, hospital_id)
+
+    return _sse_response(chat_stream(request.message, session_id=request.session_id), persist)
+
+
 @router.get("/chat/{session_id}/history")
 async def get_chat_history(session_id: str):
     """Get chat history for a session."""
-    history = get_session_history(session_id)
+    history = await get_session_history(session_id)
     return {"session_id": session_id, "messages": history}
 
 
 @router.delete("/chat/{session_id}")
 async def end_chat_session(session_id: str):
     """End a chat session."""
-    cleared = clear_session(session_id)
+    cleared = await clear_session(session_id)
     if not cleared:
         raise HTTPException(404, "Session not found")
     return {"message": "Session ended", "session_id": session_id}
@@ -82,7 +113,7 @@ async def end_chat_session(session_id: str):
 async def start_intake_endpoint(
     request: IntakeStartRequest,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Start a new patient intake session."""
     result = start_intake(
@@ -108,7 +139,7 @@ async def start_intake_endpoint(
         content=result["message"],
     )
     db.add(greeting)
-    db.commit()
+    await db.commit()
 
     return result
 
@@ -118,40 +149,45 @@ async def intake_message_endpoint(
     session_id: str,
     request: ChatRequest,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Send a message in an intake session."""
     if not request.message.strip():
         raise HTTPException(400, "Message cannot be empty")
 
-    result = process_intake_message(session_id, request.message)
+    result = await process_intake_message(session_id, request.message)
     if "error" in result:
         raise HTTPException(404, result["error"])
 
-    # Save user and assistant messages
-    hospital_id = get_hospital_id(current_user)
-    _save_chat_message(db, session_id, "user", request.message, hospital_id=hospital_id)
-    _save_chat_message(db, session_id, "assistant", result["message"], hospital_id=hospital_id)
+    await _record_intake_result(db, request.message, result, get_hospital_id(current_user))
+    return result
 
-    # If intake is complete, persist the summary
-    if result.get("complete"):
-        session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
-        if session:
-            session.intake_data = result.get("intake_summary", {})
-            session.status = "completed"
-            db.commit()
 
-    # Handle escalation
-    if result.get("escalation"):
-        _mark_session_escalated(db, session_id, result.get("escalation_reason"))
+@router.post("/intake/{session_id}/message/stream")
+async def intake_message_stream_endpoint(
+    session_id: str,
+    request: ChatRequest,
+    current_user: dict = Depends(get_current_user),
+):
+    """Stream an intake reply as Server-Sent Events (``token`` then ``done``)."""
+    if not request.message.strip():
+        raise HTTPException(400, "Message cannot be empty")
+    if not await get_intake_session(session_id):
+        raise HTTPException(404, "Session not found")
 
-    return result
+    hospital_id = get_hospital_id(current_user)
+
+    async def persist(result: dict):
+        async with AsyncSessionLocal() as db:
+            await _record_intake_result(db, request.message, result, hospital_id)
+
+    return _sse_response(process_intake_message_stream(session_id, request.message), persist)
 
 
 @router.get("/intake/{session_id}")
 async def get_intake_status(session_id: str):
     """Get intake session status and collected data."""
-    session = get_intake_session(session_id)
+    session = await get_intake_session(session_id)
     if not session:
         raise HTTPException(404, "Intake session not found")
     return {
@@ -169,13 +205,13 @@ async def get_intake_status(session_id: str):
 async def triage_endpoint(
     request: TriageRequest,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Assess symptoms and assign triage level."""
     if not request.symptoms.strip():
         raise HTTPException(400, "Symptoms cannot be empty")
 
-    result = assess_triage(
+    result = await assess_triage(
         symptoms=request.symptoms,
         patient_age=request.patient_age,
         patient_sex=request.patient_sex,
@@ -183,13 +219,10 @@ async def triage_endpoint(
         current_medications=request.current_medications,
     )
 
-    hospital_id = get_hospital_id(current_user)
-
     # Persist triage record
-    record = TriageRecord(
-        id=str(uuid.uuid4()),
+    fields = dict(
         patient_id=request.symptoms[:50],  # temp identifier
-        hospital_id=hospital_id,
+        hospital_id=get_hospital_id(current_user),
         esi_level=result.esi_level.value,
         reasoning=result.reasoning,
         key_symptoms=result.key_symptoms,
@@ -197,8 +230,12 @@ async def triage_endpoint(
         escalate_to_nurse=result.escalate_to_nurse,
         red_flags=result.red_flags,
     )
-    db.add(record)
-    db.commit()
+    # Escalations are committed before responding so the nurse queue shows them at once
+    if chat_log.accepting and not result.escalate_to_nurse:
+        chat_log.add_triage(**fields)
+    else:
+        db.add(TriageRecord(id=str(uuid.uuid4()), **fields))
+        await db.commit()
 
     return result
 
@@ -206,7 +243,11 @@ async def triage_endpoint(
 # --- Follow-up ---
 
 @router.post("/followup/start")
-async def start_followup_endpoint(request: FollowUpStartRequest):
+async def start_followup_endpoint(
+    request: FollowUpStartRequest,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
     """Start a post-discharge follow-up session."""
     result = start_followup(
         patient_id=request.patient_id,
@@ -215,36 +256,85 @@ async def start_followup_endpoint(request: FollowUpStartRequest):
         discharge_instructions=request.discharge_instructions,
         medications=request.medications,
     )
+    context = result.pop("context")
+
+    # Persist the session, its patient context (as the system message) and the greeting
+    patient = await db.get(Patient, request.patient_id)
+    db.add(ChatSession(
+        id=result["session_id"],
+        session_type="followup",
+        status="active",
+        followup_type=request.followup_type.value,
+        hospital_id=get_hospital_id(current_user),
+        patient_id=patient.id if patient else None,
+    ))
+    for role, content in (("system", context), ("assistant", result["message"])):
+        db.add(ChatMessageRecord(
+            id=str(uuid.uuid4()),
+            session_id=result["session_id"],
+            role=role,
+            content=content,
+        ))
+    await db.commit()
+
     return result
 
 
 @router.post("/followup/{session_id}/message")
-async def followup_message_endpoint(session_id: str, request: ChatRequest):
+async def followup_message_endpoint(
+    session_id: str,
+    request: ChatRequest,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
     """Send a message in a follow-up session."""
     if not request.message.strip():
         raise HTTPException(400, "Message cannot be empty")
 
-    result = process_followup_message(session_id, request.message)
+    result = await process_followup_message(session_id, request.message)
     if "error" in result:
         raise HTTPException(404, result["error"])
+
+    await _record_followup_result(db, request.message, result, get_hospital_id(current_user))
     return result
 
 
+@router.post("/followup/{session_id}/message/stream")
+async def followup_message_stream_endpoint(
+    session_id: str,
+    request: ChatRequest,
+    current_user: dict = Depends(get_current_user),
+):
+    """Stream a follow-up reply as Server-Sent Events (``token`` then ``done``)."""
+    if not request.message.strip():
+        raise HTTPException(400, "Message cannot be empty")
+    if not await get_followup_session(session_id):
+        raise HTTPException(404, "Session not found")
+
+    hospital_id = get_hospital_id(current_user)
+
+    async def persist(result: dict):
+        async with AsyncSessionLocal() as db:
+            await _record_followup_result(db, request.message, result, hospital_id)
+
+    return _sse_response(process_followup_message_stream(session_id, request.message), persist)
+
+
 # --- Nurse Dashboard ---
 
 @router.get("/dashboard/escalations")
 async def get_escalations(
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Get escalated chat sessions, filtered by hospital_id."""
     hospital_id = get_hospital_id(current_user)
 
-    query = db.query(ChatSession).filter(ChatSession.escalated == True)
+    query = select(ChatSession).where(ChatSession.escalated == True)
     if hospital_id:
-        query = query.filter(ChatSession.hospital_id == hospital_id)
+        query = query.where(ChatSession.hospital_id == hospital_id)
 
-    sessions = query.order_by(ChatSession.updated_at.desc()).limit(50).all()
+    sessions = (await db.scalars(query.order_by(ChatSession.updated_at.desc()).limit(50))).all()
     return [
         {
             "session_id": s.id,
@@ -261,16 +351,16 @@ async def get_escalations(
 @router.get("/dashboard/active-sessions")
 async def get_active_sessions(
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Get active chat sessions, filtered by hospital_id."""
     hospital_id = get_hospital_id(current_user)
 
-    query = db.query(ChatSession).filter(ChatSession.status == "active")
+    query = select(ChatSession).where(ChatSession.status == "active")
     if hospital_id:
-        query = query.filter(ChatSession.hospital_id == hospital_id)
+        query = query.where(ChatSession.hospital_id == hospital_id)
 
-    sessions = query.order_by(ChatSession.created_at.desc()).limit(50).all()
+    sessions = (await db.scalars(query.order_by(ChatSession.created_at.desc()).limit(50))).all()
     return [
         {
             "session_id": s.id,
@@ -289,19 +379,19 @@ async def get_active_sessions(
 @router.get("/dashboard/completed-intakes")
 async def get_completed_intakes(
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Get completed intake sessions with summary data."""
     hospital_id = get_hospital_id(current_user)
 
-    query = db.query(ChatSession).filter(
+    query = select(ChatSession).where(
         ChatSession.session_type == "intake",
         ChatSession.status == "completed",
     )
     if hospital_id:
-        query = query.filter(ChatSession.hospital_id == hospital_id)
+        query = query.where(ChatSession.hospital_id == hospital_id)
 
-    sessions = query.order_by(ChatSession.created_at.desc()).limit(50).all()
+    sessions = (await db.scalars(query.order_by(ChatSession.created_at.desc()).limit(50))).all()
     return [
         {
             "session_id": s.id,
@@ -317,19 +407,18 @@ async def get_completed_intakes(
 async def get_intake_detail(
     session_id: str,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Get full intake detail including all messages."""
-    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+    session = await db.get(ChatSession, session_id)
     if not session:
         raise HTTPException(404, "Intake session not found")
 
-    messages = (
-        db.query(ChatMessageRecord)
-        .filter(ChatMessageRecord.session_id == session_id)
+    messages = (await db.scalars(
+        select(ChatMessageRecord)
+        .where(ChatMessageRecord.session_id == session_id)
         .order_by(ChatMessageRecord.timestamp)
-        .all()
-    )
+    )).all()
 
     return {
         "session_id": session.id,
@@ -350,35 +439,57 @@ async def get_intake_detail(
 
 # --- Helpers ---
 
-def _save_chat_message(
-    db: Session, session_id: str, role: str, content: str, hospital_id: Optional[str] = None
-):
-    """Save a chat message to the database."""
-    # Ensure session exists
-    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
-    if not session:
-        session = ChatSession(
-            id=session_id,
-            session_type="general",
-            status="active",
-            hospital_id=hospital_id,
-        )
-        db.add(session)
-
-    msg = ChatMessageRecord(
-        id=str(uuid.uuid4()),
-        session_id=session_id,
-        role=role,
-        content=content,
+def _sse_response(events: AsyncIterator[dict], on_done=None) -> StreamingResponse:
+    """Wrap engine events as a ``text/event-stream`` response.
+
+    ``on_done`` is awaited with the final result before the ``done`` event is
+    sent, unless that result carries an ``error``.
+    """
+    async def body():
+        async for event in events:
+            event_type = event.pop("type")
+            if event_type == "done" and on_done and "error" not in event:
+                await on_done(event)
+            yield f"event: {event_type}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    db.add(msg)
-    db.commit()
 
 
-def _mark_session_escalated(db: Session, session_id: str, reason: Optional[str]):
-    """Mark a session as escalated."""
-    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
-    if session:
-        session.escalated = True
-        session.escalation_reason = reason
-        db.commit()
+async def _record_chat_result(db: AsyncSession, user_message: str, result: dict, hospital_id: Optional[str]):
+    """Persist a general chat turn and any escalation."""
+    await _record_turn(db, user_message, result, hospital_id, {})
+
+
+async def _record_intake_result(db: AsyncSession, user_message: str, result: dict, hospital_id: Optional[str]):
+    """Persist an intake turn, the summary on completion, and any escalation."""
+    updates = {}
+    if result.get("complete"):
+        updates = {"intake_data": result.get("intake_summary", {}), "status": "completed"}
+    await _record_turn(db, user_message, result, hospital_id, updates)
+
+
+async def _record_followup_result(db: AsyncSession, user_message: str, result: dict, hospital_id: Optional[str]):
+    """Persist a follow-up turn, completion, and any escalation."""
+    updates = {"status": "completed"} if result.get("complete") else {}
+    await _record_turn(db, user_message, result, hospital_id, updates)
+
+
+async def _record_turn(
+    db: AsyncSession, user_message: str, result: dict, hospital_id: Optional[str], updates: dict
+):
+    """Save the user and assistant messages with the session changes in one transaction.
+
+    With the write-behind log running (and not backed up) the turn is queued
+    for its next group commit instead, unless it escalates the session.
+    """
+    if result.get("escalation"):
+        updates = {**updates, "escalated": True, "escalation_reason": result.get("escalation_reason")}
+    messages = [("user", user_message), ("assistant", result["message"])]
+    if chat_log.accepting and not updates.get("escalated"):
+        chat_log.add_turn(result["session_id"], messages, hospital_id=hospital_id, session_updates=updates)
+    else:
+        await save_turn(db, result["session_id"], messages, hospital_id=hospital_id, session_updates=updates)
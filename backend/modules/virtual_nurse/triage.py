@@ -10,7 +10,7 @@ from modules.shared.safety import check_emergency, EMERGENCY_RESPONSE
 logger = logging.getLogger(__name__)
 
 
-def assess_triage(
+async def assess_triage(
     symptoms: str,
     patient_age: int | None = None,
     patient_sex: str | None = None,
@@ -56,7 +56,7 @@ def assess_triage(
     logger.info("Running triage assessment for symptoms: %s...", symptoms[:100])
 
     try:
-        raw_response = llm_client.triage(symptoms, patient_info)
+        raw_response = await llm_client.atriage(symptoms, patient_info)
         data = llm_client.extract_json(raw_response)
 
         if not data:
@@ -0,0 +1,120 @@
+"""Tests for the note backfill job."""
+
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.db import Base
+from database.schemas import Patient, Encounter, ClinicalNote
+from modules.ambient_doc import backfill
+from modules.ambient_doc.router import get_encounter
+from modules.ambient_doc.note_generator import parse_soap_note
+from modules.shared.models import CodeSuggestion, CodeSuggestionResponse
+from modules.shared.llm_scheduler import Priority, llm_priority
+
+
+class FakeJob:
+    id = "job-1"
+
+    def __init__(self, payload, hospital_id=None):
+        self.payload = payload
+        self.hospital_id = hospital_id
+        self.updates = []
+
+    async def progress(self, stage, progress, **result):
+        self.updates.append((stage, progress, result))
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'backfill.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(backfill, "SessionLocal", factory)
+    monkeypatch.setattr(backfill.settings, "BACKFILL_PAGE_SIZE", 2)
+
+    db = factory()
+    for pid, hospital in (("p1", "h1"), ("p2", "h2")):
+        db.add(Patient(id=pid, hospital_id=hospital, first_name="A", last_name="B", date_of_birth="1980-01-01", sex="F"))
+    for i in range(5):
+        db.add(Encounter(id=f"e{i}", patient_id="p1" if i < 4 else "p2", transcript=f"visit {i}"))
+    db.add(Encounter(id="e9", patient_id="p1", transcript=""))
+    db.add(ClinicalNote(id="n0", encounter_id="e0", version=3, raw_text="old"))
+    db.commit()
+    db.close()
+    return factory
+
+
+@pytest.mark.asyncio
+async def test_backfill_writes_new_versions(session_factory, monkeypatch, tmp_path):
+    """Test that each selected encounter gets a new version-1 note and progress is reported."""
+    priorities = []
+
+    async def fake_documentation(transcript, encounter_type="office_visit"):
+        priorities.append(llm_priority.get())
+        if transcript == "visit 2":
+            raise ValueError("bad transcript")
+        codes = CodeSuggestionResponse(icd10_codes=[
+            CodeSuggestion(code="J06.9", description="Acute URI", confidence="high", evidence="cough", verified=True)
+        ])
+        return parse_soap_note(f"S: {transcript}\nO: o\nA: a\nP: p"), codes
+
+    monkeypatch.setattr(backfill, "generate_documentation", fake_documentation)
+    job = FakeJob({"concurrency": 2}, hospital_id="h1")
+    result = await backfill.run_note_backfill(job)
+
+    assert result["total"] == 4
+    assert result["created"] == 3
+    assert [f["encounter_id"] for f in result["failures"]] == ["e2"]
+    assert set(priorities) == {Priority.BATCH}
+    assert job.updates[-1][2]["processed"] == 4
+
+    db = session_factory()
+    notes = db.query(ClinicalNote).filter(ClinicalNote.id != "n0").all()
+    db.close()
+    assert {n.encounter_id: n.version for n in notes} == {"e0": 1, "e1": 1, "e3": 1}
+    assert all(n.icd10_codes[0]["code"] == "J06.9" and n.icd10_codes[0]["verified"] for n in notes)
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'backfill.db'}")
+    async with AsyncSession(engine) as db:
+        encounter = await get_encounter("e0", {"role": "super_admin"}, db)
+    await engine.dispose()
+    # The regenerated note is current even though the edited old one has a higher version
+    assert [(n["version"], n.get("raw_text")) for n in encounter["notes"]] == [(1, "S: visit 0\nO: o\nA: a\nP: p"), (3, None)]
+
+
+@pytest.mark.asyncio
+async def test_encounter_pages_respect_limit(session_factory):
+    """Test that keyset pages stop at the requested limit."""
+    pages = [page async for page in backfill.iter_encounter_pages({"limit": 3}, None, page_size=2)]
+    assert [[row[0] for row in page] for page in pages] == [["e0", "e1"], ["e2"]]
+
+
+@pytest.mark.asyncio
+async def test_encounter_pages_are_fetched_off_the_event_loop(session_factory, monkeypatch):
+    """Test that the event loop keeps running while a page query is in progress."""
+    release = threading.Event()
+    fetch_page = backfill._fetch_page
+
+    def slow_fetch(*args):
+        assert release.wait(timeout=5), "page fetch blocked the event loop"
+        return fetch_page(*args)
+
+    async def unblock():
+        await asyncio.sleep(0.01)
+        release.set()
+
+    monkeypatch.setattr(backfill, "_fetch_page", slow_fetch)
+    pages, _ = await asyncio.gather(
+        asyncio.wait_for(_collect(backfill.iter_encounter_pages({"limit": 1}, None, page_size=2)), timeout=10),
+        unblock(),
+    )
+    assert [[row[0] for row in page] for page in pages] == [["e0"]]
+
+
+async def _collect(pages):
+    return [page async for page in pages]
@@ -1,38 +1,99 @@
 """Tests for the chat engine."""
 
-from modules.virtual_nurse.chat_engine import get_or_create_session, clear_session
+import pytest
 
+from modules.shared.safety import AI_DISCLOSURE, EMERGENCY_RESPONSE
+from modules.virtual_nurse import chat_engine
+from modules.virtual_nurse.chat_engine import get_or_create_session, get_session_history, clear_session
 
-def test_create_new_session():
+
+@pytest.mark.asyncio
+async def test_create_new_session():
     """Test creating a new chat session."""
-    sid, history = get_or_create_session()
+    sid, history = await get_or_create_session()
     assert sid is not None
     assert isinstance(history, list)
     assert len(history) == 0
     # Cleanup
-    clear_session(sid)
+    await clear_session(sid)
 
 
-def test_get_existing_session():
+@pytest.mark.asyncio
+async def test_get_existing_session():
     """Test retrieving an existing session."""
-    sid1, history1 = get_or_create_session()
+    sid1, history1 = await get_or_create_session()
     history1.append({"role": "user", "content": "hello"})
 
-    sid2, history2 = get_or_create_session(sid1)
+    sid2, history2 = await get_or_create_session(sid1)
     assert sid1 == sid2
     assert len(history2) == 1
     assert history2[0]["content"] == "hello"
     # Cleanup
-    clear_session(sid1)
+    await clear_session(sid1)
 
 
-def test_clear_session():
+@pytest.mark.asyncio
+async def test_clear_session():
     """Test clearing a session."""
-    sid, _ = get_or_create_session()
-    assert clear_session(sid) is True
-    assert clear_session(sid) is False  # Already cleared
+    sid, _ = await get_or_create_session()
+    assert await clear_session(sid) is True
+    assert await clear_session(sid) is False  # Already cleared
 
 
-def test_clear_nonexistent_session():
+@pytest.mark.asyncio
+async def test_clear_nonexistent_session():
     """Test clearing a session that doesn't exist."""
-    assert clear_session("nonexistent-id") is False
+    assert await clear_session("nonexistent-id") is False
+
+
+class _StreamingStub:
+    """Stand-in LLM client that streams a fixed reply."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def astream_chat(self, message, history, system_prompt=None, summary=""):
+        for chunk in self.chunks:
+            yield chunk
+
+
+async def _collect(events):
+    return [event async for event in events]
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_yields_tokens_then_done(monkeypatch):
+    """Test that streamed tokens add up to the final message."""
+    monkeypatch.setattr(chat_engine, "llm_client", _StreamingStub(["How long ", "has it hurt?"]))
+    events = await _collect(chat_engine.chat_stream("My knee hurts"))
+
+    assert events[-1]["type"] == "done"
+    streamed = "".join(e["text"] for e in events if e["type"] == "token")
+    assert streamed == events[-1]["message"]
+    assert events[-1]["message"].startswith(AI_DISCLOSURE)
+    assert (await get_session_history(events[-1]["session_id"]))[-1]["content"] == streamed
+    await clear_session(events[-1]["session_id"])
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_appends_safety_disclaimer(monkeypatch):
+    """Test that sanitize_response still runs on streamed output."""
+    monkeypatch.setattr(chat_engine, "llm_client", _StreamingStub(["You have ", "migraine."]))
+    events = await _collect(chat_engine.chat_stream("Head pain"))
+
+    done = events[-1]
+    assert "cannot diagnose" in done["message"]
+    assert "".join(e["text"] for e in events if e["type"] == "token") == done["message"]
+    await clear_session(done["session_id"])
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_emergency_skips_llm(monkeypatch):
+    """Test that emergencies short-circuit before any LLM call."""
+    monkeypatch.setattr(chat_engine, "llm_client", None)
+    events = await _collect(chat_engine.chat_stream("I have chest pain"))
+
+    assert [e["type"] for e in events] == ["token", "done"]
+    assert events[-1]["escalation"] is True
+    assert events[-1]["message"] == EMERGENCY_RESPONSE
+    await clear_session(events[-1]["session_id"])
@@ -0,0 +1,177 @@
+"""Tests for chat turn persistence and the write-behind log."""
+
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database.db import Base
+from database.schemas import ChatSession, ChatMessageRecord, TriageRecord
+from modules.virtual_nurse.persistence import WriteBehindLog, save_turn
+
+
+def _session_factory(tmp_path):
+    path = tmp_path / "chat.db"
+    Base.metadata.create_all(bind=create_engine(f"sqlite:///{path}"))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+@pytest.mark.asyncio
+async def test_save_turn_creates_session_and_messages(tmp_path):
+    """Test that the first turn creates the session row and both messages in order."""
+    engine, factory = _session_factory(tmp_path)
+    async with factory() as db:
+        await save_turn(db, "s1", [("user", "hi"), ("assistant", "hello")], hospital_id="h1")
+
+        session = await db.get(ChatSession, "s1")
+        assert (session.session_type, session.status, session.hospital_id) == ("general", "active", "h1")
+        messages = (await db.scalars(select(ChatMessageRecord).order_by(ChatMessageRecord.timestamp))).all()
+        assert [(m.role, m.content) for m in messages] == [("user", "hi"), ("assistant", "hello")]
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_save_turn_updates_existing_session(tmp_path):
+    """Test that later turns apply escalation/completion to the existing row without replacing it."""
+    engine, factory = _session_factory(tmp_path)
+    async with factory() as db:
+        db.add(ChatSession(id="s1", session_type="intake", status="active", patient_id=None))
+        await db.commit()
+
+        await save_turn(db, "s1", [("user", "a"), ("assistant", "b")])
+        await save_turn(
+            db,
+            "s1",
+            [("user", "c"), ("assistant", "d")],
+            session_updates={"status": "completed", "escalated": True, "escalation_reason": "chest pain"},
+        )
+
+        session = (await db.scalars(select(ChatSession).execution_options(populate_existing=True))).one()
+        assert (session.session_type, session.status) == ("intake", "completed")
+        assert session.escalated and session.escalation_reason == "chest pain"
+        assert len((await db.scalars(select(ChatMessageRecord))).all()) == 4
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_group_commits_at_max_rows(tmp_path):
+    """Test that reaching max_rows flushes turns and triage rows without waiting for the interval."""
+    engine, factory = _session_factory(tmp_path)
+    log = WriteBehindLog(factory, flush_ms=60_000, max_rows=5)
+    await log.start()
+    log.add_turn("s1", [("user", "a"), ("assistant", "b")], hospital_id="h1")
+    log.add_turn("s1", [("user", "c"), ("assistant", "d")], session_updates={"escalated": True})
+    log.add_triage(hospital_id="h1", esi_level=2, reasoning="r")
+    for _ in range(50):
+        if not log.pending:
+            break
+        await asyncio.sleep(0.01)
+
+    async with factory() as db:
+        assert await db.scalar(select(func.count(ChatMessageRecord.id))) == 4
+        assert await db.scalar(select(func.count(TriageRecord.id))) == 1
+        session = await db.get(ChatSession, "s1")
+        assert session.hospital_id == "h1" and session.escalated
+    await log.stop()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_keeps_rows_after_failed_flush_and_drains_on_stop(tmp_path):
+    """Test that a failed flush keeps its rows and stop() writes them."""
+    engine, factory = _session_factory(tmp_path)
+    calls = 0
+
+    def flaky_factory():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise ConnectionError("database unavailable")
+        return factory()
+
+    log = WriteBehindLog(flaky_factory, flush_ms=60_000, max_rows=100)
+    log.add_turn("s1", [("user", "a"), ("assistant", "b")])
+    with pytest.raises(ConnectionError):
+        await log.flush()
+    assert log.pending == 2
+
+    await log.stop()
+    assert log.pending == 0
+    async with factory() as db:
+        assert await db.scalar(select(func.count(ChatMessageRecord.id))) == 2
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_isolates_and_drops_a_failing_row(tmp_path):
+    """Test that a row that keeps failing is split off, retried, then dropped without blocking the rest."""
+    engine, factory = _session_factory(tmp_path)
+    log = WriteBehindLog(factory, flush_ms=60_000, max_rows=100)
+    log.add_turn("s1", [("user", "a"), ("assistant", "b")])
+    log.add_triage(id="t1", hospital_id="h1", esi_level=3, reasoning="first")
+    log.add_triage(id="t1", hospital_id="h1", esi_level=3, reasoning="duplicate id")
+    log.add_turn("s1", [("user", "c"), ("assistant", "d")])
+
+    assert await log.flush() == 5
+    assert log.pending == 1
+    for _ in range(WriteBehindLog.MAX_ATTEMPTS - 1):
+        assert await log.flush() == 0
+    assert log.pending == 0
+
+    async with factory() as db:
+        assert await db.scalar(select(func.count(ChatMessageRecord.id))) == 4
+        assert (await db.scalars(select(TriageRecord.reasoning))).all() == ["first"]
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_stops_accepting_at_max_pending(tmp_path):
+    """Test that callers are told to write directly once the buffer is full."""
+    engine, factory = _session_factory(tmp_path)
+    log = WriteBehindLog(factory, flush_ms=60_000, max_rows=100, max_pending=3)
+    assert not log.accepting
+    await log.start()
+    log.add_turn("s1", [("user", "a"), ("assistant", "b")])
+    assert log.accepting
+    log.add_triage(hospital_id="h1", esi_level=4, reasoning="r")
+    assert not log.accepting
+
+    await log.stop()
+    assert log.pending == 0
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_escalated_turns_skip_the_write_behind_log(tmp_path, monkeypatch):
+    """Test that an escalating turn is committed at once while ordinary turns are queued."""
+    from modules.virtual_nurse import router
+
+    engine, factory = _session_factory(tmp_path)
+    log = WriteBehindLog(factory, flush_ms=60_000, max_rows=100)
+    monkeypatch.setattr(router, "chat_log", log)
+    await log.start()
+    async with factory() as db:
+        await router._record_turn(db, "hi", {"session_id": "s1", "message": "hello"}, "h1", {})
+        escalation = {"session_id": "s2", "message": "Call 911", "escalation": True, "escalation_reason": "chest pain"}
+        await router._record_turn(db, "chest pain", escalation, "h1", {})
+
+        assert log.pending == 2
+        session = await db.get(ChatSession, "s2")
+        assert session.escalated and session.escalation_reason == "chest pain"
+        assert await db.get(ChatSession, "s1") is None
+    await log.stop()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_refused_with_database_sessions(monkeypatch):
+    """Test that startup fails when write-behind is combined with the database session store."""
+    import main
+
+    monkeypatch.setattr(main.settings, "CHAT_WRITE_BEHIND", True)
+    monkeypatch.setattr(main.settings, "SESSION_STORE_BACKEND", "database")
+    with pytest.raises(RuntimeError, match="SESSION_STORE_BACKEND"):
+        async with main.lifespan(main.app):
+            pass
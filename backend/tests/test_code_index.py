@@ -0,0 +1,68 @@
+"""Tests for the local ICD-10/CPT code index."""
+
+from modules.ambient_doc.code_index import CodeIndex, get_icd10_index
+from modules.ambient_doc.code_suggester import codes_from_data
+from modules.ambient_doc.note_generator import extract_icd10_codes
+
+
+def _index(tmp_path):
+    path = tmp_path / "codes.txt"
+    path.write_text(
+        "E119    Type 2 diabetes mellitus without complications\n"
+        "G43909  Migraine, unspecified, not intractable, without status migrainosus\n"
+        "I10     Essential (primary) hypertension\n"
+        "J069    Acute upper respiratory infection, unspecified\n"
+    )
+    return CodeIndex(path, dotted=True)
+
+
+def test_lookup_exact_code(tmp_path):
+    """Test exact lookups with and without the dot."""
+    index = _index(tmp_path)
+    assert index.lookup("I10") == "Essential (primary) hypertension"
+    assert index.lookup("e11.9") == "Type 2 diabetes mellitus without complications"
+    assert index.lookup("I11") is None
+    assert index.lookup("Z99") is None
+
+
+def test_prefix_and_description_search(tmp_path):
+    """Test autocomplete by code prefix and by description words."""
+    index = _index(tmp_path)
+    assert [r["code"] for r in index.search("G43")] == ["G43.909"]
+    assert index.search("j06.")[0]["code"] == "J06.9"
+    assert [r["code"] for r in index.search("hypert")] == ["I10"]
+    assert [r["code"] for r in index.search("unspecified migraine")] == ["G43.909"]
+    assert index.search("unspecified", limit=1) == [
+        {"code": "G43.909", "description": "Migraine, unspecified, not intractable, without status migrainosus"}
+    ]
+
+
+def test_bundled_index_is_sorted():
+    """Test that the bundled ICD-10 file is sorted, as binary search requires."""
+    index = get_icd10_index()
+    codes = [index._code_at(i) for i in range(len(index))]
+    assert codes == sorted(codes)
+    assert index.lookup("J06.9") == "Acute upper respiratory infection, unspecified"
+
+
+def test_extract_skips_code_lookalikes():
+    """Test that 'vitamin B12' is not extracted as an ICD-10 code."""
+    codes = extract_icd10_codes("Vitamin B12 deficiency anemia (D51.9), HTN (I10)")
+    assert [c["code"] for c in codes] == ["D51.9", "I10"]
+    assert codes[1]["description"] == "Essential (primary) hypertension"
+
+
+def test_suggestions_are_validated_and_enriched():
+    """Test that LLM codes are normalized, checked and given official descriptions."""
+    result = codes_from_data({
+        "icd10_codes": [
+            {"code": "j06.9", "description": "URI", "confidence": "high"},
+            {"code": "J06.9", "description": "duplicate"},
+            {"code": "Q99.99", "description": "made up"},
+            {"code": "vitamin", "description": "not a code"},
+        ],
+        "cpt_codes": [{"code": "99213", "description": "Office visit"}, {"code": "9921", "description": "bad"}],
+    })
+    assert [(c.code, c.verified) for c in result.icd10_codes] == [("J06.9", True), ("Q99.99", False)]
+    assert result.icd10_codes[0].description == "Acute upper respiratory infection, unspecified"
+    assert [(c.code, c.verified) for c in result.cpt_codes] == [("99213", None)]
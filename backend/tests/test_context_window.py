@@ -0,0 +1,49 @@
+"""Tests for conversation history windowing."""
+
+from modules.shared.context_window import build_context, estimate_tokens, window_history
+
+
+def _turns(n, words=40):
+    history = []
+    for i in range(n):
+        history.append({"role": "user", "content": f"Patient message {i}. " + "word " * words})
+        history.append({"role": "assistant", "content": f"Assistant reply {i}. " + "word " * words})
+    return history
+
+
+def test_short_history_is_sent_whole():
+    """Test that history within budget is untouched and unsummarized."""
+    history = _turns(2)
+    window, summary = build_context(history, budget_tokens=10000, summary_budget_tokens=200)
+    assert window == history
+    assert summary == ""
+
+
+def test_window_respects_budget_and_starts_on_user_turn():
+    """Test that long history is trimmed to budget at a user-turn boundary."""
+    history = _turns(30)
+    older, recent = window_history(history, budget_tokens=300)
+    assert older + recent == history
+    assert recent[0]["role"] == "user"
+    assert sum(estimate_tokens(m["content"]) for m in recent) <= 300
+    assert recent[-1] == history[-1]
+
+
+def test_older_turns_are_summarized():
+    """Test that dropped turns are condensed into an extractive summary."""
+    history = _turns(30)
+    window, summary = build_context(history, budget_tokens=300, summary_budget_tokens=100)
+    older = history[: len(history) - len(window)]
+    last_patient = [m for m in older if m["role"] == "user"][-1]["content"].split(". ")[0]
+    assert f"Patient: {last_patient}." in summary  # newest older turns survive the cut
+    assert "Patient: Patient message 0." not in summary
+    assert estimate_tokens(summary) <= 100
+    assert len(window) < len(history)
+
+
+def test_collected_data_replaces_summary():
+    """Test that structured intake data is used as the summary when available."""
+    history = _turns(30)
+    collected = {"chief_complaint": "knee pain", "allergies": ["penicillin", "latex"]}
+    _, summary = build_context(history, 300, 100, collected_data=collected)
+    assert summary == "- chief complaint: knee pain\n- allergies: penicillin, latex"
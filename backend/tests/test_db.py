@@ -0,0 +1,96 @@
+"""Tests for database engine configuration."""
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from database.db import ENGINE_PROFILES, async_database_url, engine_options, make_engine
+from modules.shared.metrics import metrics
+
+
+def test_async_url_uses_asyncio_drivers():
+    """Test that SQLite and PostgreSQL URLs map to aiosqlite and asyncpg."""
+    assert async_database_url("sqlite:////tmp/careflow.db").drivername == "sqlite+aiosqlite"
+    url = async_database_url("postgresql://user:pw@db.example.com:5432/careflow")
+    assert url.drivername == "postgresql+asyncpg"
+    assert url.host == "db.example.com" and url.database == "careflow"
+
+
+def test_async_url_renames_sslmode():
+    """Test that libpq's sslmode becomes asyncpg's ssl parameter."""
+    url = async_database_url("postgresql://user:pw@db.example.com/careflow?sslmode=require")
+    assert url.query == {"ssl": "require"}
+
+
+def test_engine_options_apply_overrides(monkeypatch):
+    """Test that DB_POOL_* settings override the selected profile."""
+    from config import settings
+    monkeypatch.setattr(settings, "DB_PROFILE", "server")
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 3)
+    options = engine_options("postgresql://user:pw@db.example.com/careflow")
+    assert options["pool_size"] == 3
+    assert options["pool_recycle"] == ENGINE_PROFILES["server"]["pool_recycle"]
+    assert options["pool_pre_ping"] is False
+
+
+def test_sqlite_engine_uses_wal_and_meters_checkouts(tmp_path):
+    """Test that local SQLite connections get WAL mode and pool checkouts are counted."""
+    engine = make_engine(f"sqlite:///{tmp_path / 'careflow.db'}")
+    before = metrics.snapshot().get("db.pool.sync.checkouts", 0)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+    assert metrics.snapshot()["db.pool.sync.checkouts"] == before + 1
+    engine.dispose()
+
+
+class _DroppedConnectionSession:
+    """AsyncSession stand-in whose commit fails as if the connection dropped."""
+
+    def add(self, obj):
+        pass
+
+    async def commit(self):
+        raise OperationalError("COMMIT", {}, Exception("server closed the connection"), connection_invalidated=True)
+
+
+@pytest.mark.asyncio
+async def test_note_routes_let_database_errors_reach_the_503_handler(monkeypatch):
+    """Test that note routes re-raise database errors instead of wrapping them in a 500."""
+    from modules.ambient_doc import router
+    from modules.ambient_doc.note_generator import parse_soap_note
+    from modules.shared.models import CodeSuggestionResponse, DocumentationRequest, NoteGenerationRequest
+
+    note = parse_soap_note("S: s\nO: o\nA: a\nP: p")
+
+    async def fake_generate_note(transcript):
+        return note
+
+    async def fake_generate_documentation(transcript, encounter_type="office_visit"):
+        return note, CodeSuggestionResponse()
+
+    monkeypatch.setattr(router, "generate_note", fake_generate_note)
+    monkeypatch.setattr(router, "generate_documentation", fake_generate_documentation)
+    with pytest.raises(OperationalError):
+        await router.generate_note_endpoint(NoteGenerationRequest(transcript="t"), _DroppedConnectionSession())
+    with pytest.raises(OperationalError):
+        await router.document_endpoint(DocumentationRequest(transcript="t"), _DroppedConnectionSession())
+
+
+@pytest.mark.asyncio
+async def test_failed_connect_maps_to_503(tmp_path):
+    """Test that a database that cannot be connected to answers 503 with Retry-After."""
+    from starlette.requests import Request
+    from database.db import make_async_engine
+    from main import database_unavailable_handler
+
+    engine = make_async_engine(f"sqlite:///{tmp_path / 'missing' / 'app.db'}")
+    with pytest.raises(OperationalError) as failed:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    await engine.dispose()
+
+    request = Request({"type": "http", "method": "GET", "path": "/api/ambient/notes", "headers": []})
+    response = await database_unavailable_handler(request, failed.value)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
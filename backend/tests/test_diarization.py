@@ -0,0 +1,51 @@
+"""Tests for clinician/patient diarization."""
+
+from modules.ambient_doc.diarization import assign_roles, format_speaker_turns, two_means
+
+
+def _segments(*lines):
+    return [
+        {"start": float(i * 2), "end": float(i * 2 + 2), "text": text}
+        for i, text in enumerate(lines)
+    ]
+
+
+def test_two_means_separates_clusters():
+    """Test that two well-separated voices end up in different clusters."""
+    features = [[0.0, 0.1], [5.0, 5.2], [0.2, 0.0], [5.1, 4.9], [0.1, 0.2]]
+    labels = two_means(features)
+    assert labels[0] == labels[2] == labels[4]
+    assert labels[1] == labels[3]
+    assert labels[0] != labels[1]
+
+
+def test_assign_roles_picks_questioner_as_clinician():
+    """Test that the speaker asking clinical questions is labeled clinician."""
+    segments = _segments(
+        "I've been having headaches.",
+        "How long have you had them?",
+        "About two weeks.",
+        "Any nausea or vision changes?",
+    )
+    labeled = assign_roles(segments, [0, 1, 0, 1])
+    assert [s["speaker"] for s in labeled] == ["patient", "clinician", "patient", "clinician"]
+
+
+def test_assign_roles_single_speaker_left_unlabeled():
+    """Test that a negligible second cluster is treated as one speaker."""
+    segments = _segments("Dictation starts.", "Plan is ibuprofen.", "End of note.")
+    segments[1]["end"] = segments[1]["start"] + 0.1
+    labeled = assign_roles(segments, [0, 1, 0])
+    assert all(s["speaker"] is None for s in labeled)
+
+
+def test_format_speaker_turns_merges_consecutive_lines():
+    """Test that adjacent segments from one speaker become one turn."""
+    segments = [
+        {"speaker": "clinician", "text": "Hello."},
+        {"speaker": "clinician", "text": "What brings you in?"},
+        {"speaker": "patient", "text": "My knee hurts."},
+    ]
+    assert format_speaker_turns(segments) == (
+        "Clinician: Hello. What brings you in?\nPatient: My knee hurts."
+    )
@@ -0,0 +1,116 @@
+"""Tests for the bounded transcription engine."""
+
+import asyncio
+import threading
+
+import pytest
+
+from modules.ambient_doc.engine import TranscriptionEngine, TranscriptionBusyError
+
+
+@pytest.mark.asyncio
+async def test_engine_rejects_when_backlog_full():
+    """Test that calls beyond workers + queue depth fail fast with a busy error."""
+    engine = TranscriptionEngine(workers=1, max_queue=1)
+    release = threading.Event()
+    try:
+        running = asyncio.ensure_future(engine.run(release.wait))
+        queued = asyncio.ensure_future(engine.run(release.wait))
+        await asyncio.sleep(0)
+        assert engine.depth == 2
+
+        with pytest.raises(TranscriptionBusyError):
+            await engine.run(lambda: None)
+
+        release.set()
+        await asyncio.gather(running, queued)
+        assert engine.depth == 0
+        assert await engine.run(lambda: "ok") == "ok"
+    finally:
+        release.set()
+        engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_engine_wait_bypasses_backlog_limit():
+    """Test that already-admitted work queues instead of being rejected."""
+    engine = TranscriptionEngine(workers=1, max_queue=0)
+    release = threading.Event()
+    try:
+        running = asyncio.ensure_future(engine.run(release.wait))
+        await asyncio.sleep(0)
+        waiting = asyncio.ensure_future(engine.run(lambda: "done", wait=True))
+        release.set()
+        await running
+        assert await waiting == "done"
+    finally:
+        release.set()
+        engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_keeps_slot_until_worker_finishes():
+    """Test that cancelling a caller does not free its slot while inference still runs."""
+    engine = TranscriptionEngine(workers=1, max_queue=0)
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait()
+
+    try:
+        running = asyncio.ensure_future(engine.run(work))
+        await asyncio.to_thread(started.wait)
+        running.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await running
+        assert engine.depth == 1
+        with pytest.raises(TranscriptionBusyError):
+            await engine.run(lambda: None)
+
+        release.set()
+        assert await engine.run(lambda: "ok", wait=True) == "ok"
+        assert engine.depth == 0
+    finally:
+        release.set()
+        engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_engine_propagates_errors():
+    """Test that errors from the worker thread reach the caller."""
+    engine = TranscriptionEngine(workers=1, max_queue=1)
+    try:
+        with pytest.raises(FileNotFoundError):
+            await engine.transcribe("/nonexistent/audio.wav")
+        assert engine.depth == 0
+    finally:
+        engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_chunked_transcription_stitches_in_order(monkeypatch):
+    """Test that chunks are decoded concurrently and stitched with offsets."""
+    from modules.ambient_doc import engine as engine_module
+    from modules.ambient_doc.preprocess import PreparedAudio
+
+    prepared = PreparedAudio(list(range(48000)), 3.0, [(0.0, 0.0, 3.0)])  # 3 s at 16 kHz
+    monkeypatch.setattr(
+        engine_module, "load_chunks", lambda path, seconds, profile: (prepared, [(0, 16000), (16000, 48000)])
+    )
+    monkeypatch.setattr(
+        engine_module,
+        "transcribe_samples",
+        lambda samples, language, offset, profile: [
+            {"start": round(offset + 0.1, 2), "end": round(offset + 0.9, 2), "text": f"{len(samples)} samples"}
+        ],
+    )
+    engine = TranscriptionEngine(workers=2, max_queue=0)
+    try:
+        result = await engine.transcribe_chunked("visit.wav")
+    finally:
+        engine.shutdown()
+
+    assert result["transcript"] == "16000 samples 32000 samples"
+    assert [s["start"] for s in result["segments"]] == [0.1, 1.1]
+    assert result["duration_seconds"] == 3.0
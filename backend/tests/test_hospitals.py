@@ -0,0 +1,27 @@
+"""Tests for hospital listing queries."""
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from database.db import Base
+from database.schemas import Hospital, AdminUser, Patient
+from modules.hospitals.router import _hospitals_with_counts, _hospital_with_counts
+
+
+def test_hospital_counts_in_one_query(tmp_path):
+    """Test that admin/patient counts come back per hospital, zero when there are none."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'hospitals.db'}")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add_all([Hospital(id="h1", name="One", slug="one"), Hospital(id="h2", name="Two", slug="two")])
+        db.add_all([AdminUser(username=f"admin{i}", hashed_password="x", hospital_id="h1") for i in range(2)])
+        db.add_all([
+            Patient(hospital_id="h1", first_name="A", last_name="B", date_of_birth="1980-01-01", sex="F")
+            for _ in range(3)
+        ])
+        db.commit()
+
+        counts = {h.id: (admins, patients) for h, admins, patients in db.execute(_hospitals_with_counts())}
+        assert counts == {"h1": (2, 3), "h2": (0, 0)}
+        hospital, admins, patients = db.execute(_hospital_with_counts("h1")).one()
+        assert (hospital.name, admins, patients) == ("One", 2, 3)
@@ -0,0 +1,53 @@
+"""Tests for intake context building."""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from modules.virtual_nurse import intake
+
+
+def test_collect_answers_files_answers_by_question():
+    """Test that patient answers are filed under the field their question asked about."""
+    history = [
+        {"role": "assistant", "content": intake.INTAKE_GREETING},
+        {"role": "user", "content": "My knee hurts"},
+        {"role": "assistant", "content": "When did the pain start?"},
+        {"role": "user", "content": "Three days ago"},
+        {"role": "assistant", "content": "Are you allergic to any medications?"},
+        {"role": "user", "content": "Penicillin"},
+    ]
+    assert intake.collect_answers(history) == {
+        "chief_complaint": ["My knee hurts"],
+        "history_of_present_illness": ["Three days ago"],
+        "allergies": ["Penicillin"],
+    }
+
+
+@pytest.mark.asyncio
+async def test_collected_data_summarizes_older_turns_during_intake(monkeypatch):
+    """Test that a long, unfinished intake sends collected data instead of older turns."""
+    monkeypatch.setattr(intake.settings, "INTAKE_HISTORY_TOKEN_BUDGET", 50)
+    session_id = intake.start_intake()["session_id"]
+    reply = AsyncMock(return_value="Do you take any medications? " + "Thanks for sharing. " * 20)
+    with patch.object(intake.llm_client, "aintake_chat", reply):
+        await intake.process_intake_message(session_id, "Sharp pain in my left knee")
+        await intake.process_intake_message(session_id, "Lisinopril 10 mg daily")
+        await intake.process_intake_message(session_id, "That's all")
+
+    session = await intake.get_intake_session(session_id)
+    assert session["collected_data"]["chief_complaint"] == ["Sharp pain in my left knee"]
+    summary = reply.call_args.kwargs["summary"]
+    assert "chief complaint: Sharp pain in my left knee" in summary
+    assert "current medications: Lisinopril 10 mg daily" in summary
+
+
+@pytest.mark.asyncio
+async def test_stream_ends_with_error_when_session_disappears():
+    """Test that a session removed after the route's check ends the stream cleanly."""
+    session_id = intake.start_intake()["session_id"]
+    await intake._intake_sessions.adelete(session_id)
+
+    events = [event async for event in intake.process_intake_message_stream(session_id, "Hello")]
+
+    assert events == [{"type": "done", "error": "Session not found", "session_id": session_id}]
@@ -0,0 +1,135 @@
+"""Tests for the background job queue."""
+
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.db import Base
+from database.schemas import Job
+from modules.shared import jobs
+from modules.shared.jobs import InProcessJobQueue, JobQueue
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(jobs, "SessionLocal", factory)
+    return factory
+
+
+async def _wait_for(queue, job_id):
+    updates = queue.subscribe(job_id)
+    state = jobs.get_job(job_id)
+    while state["status"] not in jobs.TERMINAL_STATUSES:
+        state = await asyncio.wait_for(updates.get(), timeout=5)
+    queue.unsubscribe(job_id, updates)
+    return state
+
+
+@pytest.mark.asyncio
+async def test_job_runs_and_reports_progress(session_factory):
+    """Test that a job is executed, reports its stages and stores the result."""
+    queue = InProcessJobQueue(workers=1)
+    stages = []
+
+    async def handler(job):
+        await job.progress("halfway", 0.5)
+        stages.append(jobs.get_job(job.id)["stage"])
+        return {"echo": job.payload["value"]}
+
+    queue.register("echo", handler)
+    await queue.start()
+    try:
+        job_id = await queue.enqueue("echo", {"value": 42}, hospital_id=None)
+        state = await _wait_for(queue, job_id)
+    finally:
+        await queue.stop()
+
+    assert stages == ["halfway"]
+    assert state["status"] == "completed"
+    assert state["progress"] == 1.0
+    assert state["result"] == {"echo": 42}
+
+
+@pytest.mark.asyncio
+async def test_failed_job_records_error(session_factory):
+    """Test that handler exceptions mark the job failed with the message."""
+    queue = InProcessJobQueue(workers=1)
+
+    async def handler(job):
+        raise RuntimeError("model unavailable")
+
+    queue.register("broken", handler)
+    await queue.start()
+    try:
+        state = await _wait_for(queue, await queue.enqueue("broken", {}))
+    finally:
+        await queue.stop()
+
+    assert state["status"] == "failed"
+    assert state["error"] == "model unavailable"
+
+
+@pytest.mark.asyncio
+async def test_queued_jobs_recovered_on_start(session_factory):
+    """Test that jobs left queued by a previous process run after a restart."""
+    db = session_factory()
+    db.add(Job(id="left-over", job_type="echo", payload={"value": 1}))
+    db.commit()
+    db.close()
+
+    queue = InProcessJobQueue(workers=1)
+
+    async def handler(job):
+        return {"echo": job.payload["value"]}
+
+    queue.register("echo", handler)
+    updates = queue.subscribe("left-over")
+    await queue.start()
+    try:
+        state = await asyncio.wait_for(updates.get(), timeout=5)
+        while state["status"] not in jobs.TERMINAL_STATUSES:
+            state = await asyncio.wait_for(updates.get(), timeout=5)
+    finally:
+        await queue.stop()
+
+    assert state["result"] == {"echo": 1}
+
+
+@pytest.mark.asyncio
+async def test_enqueue_unknown_job_type_rejected(session_factory):
+    """Test that enqueueing a job type with no handler fails fast."""
+    with pytest.raises(ValueError):
+        await InProcessJobQueue(workers=1).enqueue("missing", {})
+
+
+def test_job_queue_backend_must_implement_dispatch():
+    """Test that a backend without ``_dispatch`` cannot be instantiated."""
+    with pytest.raises(TypeError):
+        JobQueue()
+
+
+@pytest.mark.asyncio
+async def test_watch_sees_changes_made_by_another_process(session_factory):
+    """Test that watching a job polls the row, sends keep-alives and stops when it finishes."""
+    db = session_factory()
+    db.add(Job(id="elsewhere", job_type="echo", status="running"))
+    db.commit()
+
+    states = []
+    async for state in InProcessJobQueue(workers=1).watch("elsewhere", poll_seconds=0.01):
+        states.append(state)
+        if len(states) == 2:
+            job = db.get(Job, "elsewhere")
+            job.status, job.result = "completed", {"echo": 1}
+            db.commit()
+    db.close()
+
+    assert states[0]["status"] == "running"
+    assert states[1] is None
+    assert states[-1]["status"] == "completed"
+    assert states[-1]["result"] == {"echo": 1}
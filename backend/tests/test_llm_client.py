@@ -0,0 +1,127 @@
+"""Tests for the shared LLM client layer."""
+
+import pytest
+
+from modules.shared.llm_base import BaseLLMClient
+from modules.shared.medical_prompts import INTAKE_SYSTEM, TRIAGE_SYSTEM
+
+
+class RecordingClient(BaseLLMClient):
+    """Client that records calls instead of hitting a provider."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def _acall(self, system, messages, max_tokens=None, temperature=0.3, system_context=""):
+        self.calls.append({
+            "system": system,
+            "messages": messages,
+            "temperature": temperature,
+            "system_context": system_context,
+        })
+        return '{"esi_level": 3}'
+
+    def _call(self, *args, **kwargs):
+        raise AssertionError("unexpected sync call")
+
+    async def _astream(self, *args, **kwargs):
+        raise AssertionError("unexpected stream")
+        yield
+
+    async def _acall_structured(self, *args, **kwargs):
+        raise AssertionError("unexpected structured call")
+
+
+@pytest.mark.asyncio
+async def test_async_chat_appends_user_message():
+    """Test that achat sends history plus the new message."""
+    client = RecordingClient()
+    history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    await client.achat("I have a cough", history)
+
+    call = client.calls[0]
+    assert call["messages"][-1] == {"role": "user", "content": "I have a cough"}
+    assert len(call["messages"]) == 3
+    assert call["temperature"] == 0.5
+    assert len(history) == 2  # caller's history is not mutated
+
+
+@pytest.mark.asyncio
+async def test_async_intake_uses_intake_prompt():
+    """Test that aintake_chat uses the intake system prompt."""
+    client = RecordingClient()
+    await client.aintake_chat("Headache", [])
+    assert client.calls[0]["system"] == INTAKE_SYSTEM
+
+
+@pytest.mark.asyncio
+async def test_async_triage_returns_parseable_json():
+    """Test that atriage uses the triage prompt and low temperature."""
+    client = RecordingClient()
+    raw = await client.atriage("fever", "Age: 40")
+    assert client.extract_json(raw) == {"esi_level": 3}
+    assert client.calls[0]["system"] == TRIAGE_SYSTEM
+    assert client.calls[0]["temperature"] == 0.2
+    assert "Age: 40" in client.calls[0]["messages"][0]["content"]
+
+
+def test_claude_request_marks_static_prefix_cacheable():
+    """Test that the static system prompt and prior history carry cache breakpoints."""
+    from modules.shared.claude_client import ClaudeClient
+
+    client = ClaudeClient()
+    client.prompt_caching = True
+    history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    system, messages, system_context = client._chat_request(
+        "I have a cough", history, INTAKE_SYSTEM, summary="- Patient: earlier"
+    )
+    request = client._request(system, messages, None, 0.5, system_context)
+
+    assert request["system"][0] == {"type": "text", "text": INTAKE_SYSTEM, "cache_control": {"type": "ephemeral"}}
+    assert "cache_control" not in request["system"][1]
+    assert "earlier" in request["system"][1]["text"]
+    assert request["messages"][-2]["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert request["messages"][-1] == {"role": "user", "content": "I have a cough"}
+    assert history[-1] == {"role": "assistant", "content": "hello"}  # caller's history is not mutated
+
+
+def test_claude_request_without_caching_uses_plain_system():
+    """Test that disabling prompt caching sends a single system string."""
+    from modules.shared.claude_client import ClaudeClient
+
+    client = ClaudeClient()
+    client.prompt_caching = False
+    request = client._request(TRIAGE_SYSTEM, [{"role": "user", "content": "x"}], None, 0.2, "ctx")
+    assert request["system"] == f"{TRIAGE_SYSTEM}\n\nctx"
+
+
+@pytest.mark.asyncio
+async def test_structured_soap_note_is_cached(monkeypatch):
+    """Test that structured SOAP calls go through the response cache."""
+    from config import settings
+    from modules.shared.response_cache import response_cache
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", True)
+    response_cache.clear()
+
+    class StructuredClient(RecordingClient):
+        async def _acall_structured(self, system, messages, tool, max_tokens=None, temperature=0.3):
+            self.calls.append({"tool": tool["name"]})
+            return {"subjective": "s", "objective": "o", "assessment": "a", "plan": "p"}
+
+    client = StructuredClient()
+    first = await client.agenerate_soap_note_structured("Doctor: hi")
+    second = await client.agenerate_soap_note_structured("Doctor: hi")
+
+    assert first == second == {"subjective": "s", "objective": "o", "assessment": "a", "plan": "p"}
+    assert client.calls == [{"tool": "record_soap_note"}]
+    response_cache.clear()
+
+
+def test_provider_missing_overrides_fails_at_instantiation():
+    """Test that a provider without every call method cannot be constructed."""
+    class PartialClient(BaseLLMClient):
+        async def _acall(self, system, messages, max_tokens=None, temperature=0.3, system_context=""):
+            return ""
+
+    with pytest.raises(TypeError, match="abstract"):
+        PartialClient()
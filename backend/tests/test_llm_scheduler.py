@@ -0,0 +1,100 @@
+"""Tests for the LLM call scheduler."""
+
+import asyncio
+import time
+
+import pytest
+
+from modules.shared.llm_scheduler import LLMScheduler, Priority, TokenBucket
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("rate limited")
+        self.response = type("Response", (), {"headers": {"retry-after": retry_after}})()
+
+
+async def _run_in_order(scheduler, requests):
+    """Hold the only slot, queue ``requests`` as (priority, tenant, name), then release."""
+    order = []
+    await scheduler.acquire(Priority.CHAT, "holder", 1)
+
+    async def call(priority, tenant, name):
+        await scheduler.acquire(priority, tenant, 1)
+        order.append(name)
+        scheduler.release(tenant)
+
+    tasks = [asyncio.create_task(call(*request)) for request in requests]
+    await asyncio.sleep(0)
+    scheduler.release("holder")
+    await asyncio.gather(*tasks)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_higher_priority_runs_first():
+    """Test that triage beats chat and chat beats batch regardless of arrival order."""
+    scheduler = LLMScheduler(max_concurrency=1)
+    order = await _run_in_order(scheduler, [
+        (Priority.BATCH, "h1", "batch"),
+        (Priority.CHAT, "h1", "chat"),
+        (Priority.TRIAGE, "h1", "triage"),
+    ])
+    assert order == ["triage", "chat", "batch"]
+
+
+@pytest.mark.asyncio
+async def test_hospitals_share_fairly_within_a_priority():
+    """Test that a hospital with a backlog does not starve one that arrives later."""
+    scheduler = LLMScheduler(max_concurrency=1)
+    order = await _run_in_order(scheduler, [
+        (Priority.CHAT, "busy", "busy-1"),
+        (Priority.CHAT, "busy", "busy-2"),
+        (Priority.CHAT, "busy", "busy-3"),
+        (Priority.CHAT, "quiet", "quiet-1"),
+    ])
+    assert order.index("quiet-1") == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_is_retried_after_retry_after():
+    """Test that a 429 is retried once the provider's retry-after has passed."""
+    scheduler = LLMScheduler(max_concurrency=2, retry_base_seconds=0.01)
+    attempts = []
+
+    async def call():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RateLimited("0.05")
+        return "ok"
+
+    assert await scheduler.run(call, Priority.CHAT, "h1", tokens=10) == "ok"
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.05
+    assert scheduler.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_other_errors_are_not_retried():
+    """Test that non-transient errors propagate immediately."""
+    scheduler = LLMScheduler(max_concurrency=1)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        await scheduler.run(call, Priority.DOCUMENTATION, None, tokens=10)
+    assert calls == [1]
+    assert scheduler.in_flight == 0
+
+
+def test_token_bucket_wait_time():
+    """Test that an exhausted bucket reports the refill time and 0 means unlimited."""
+    bucket = TokenBucket(per_minute=600)  # 10 per second
+    bucket.take(600)
+    assert 0.9 < bucket.wait_time(10) <= 1.0
+    assert TokenBucket(per_minute=0).wait_time(10**6) == 0.0
@@ -1,5 +1,7 @@
 """Tests for the SOAP note generator."""
 
+import pytest
+
 from modules.ambient_doc.note_generator import parse_soap_note, extract_icd10_codes
 
 
@@ -50,3 +52,145 @@ def test_parse_empty_note():
     assert note.objective == ""
     assert note.assessment == ""
     assert note.plan == ""
+
+
+def test_parse_soap_note_ignores_inline_section_letters():
+    """Test that "O:" or "Plan" inside a sentence does not start a section."""
+    text = """**Subjective:** Patient says her O: ring hurts and she made a
+Plan to rest.
+**Objective:** Afebrile.
+A: Contusion (S60.0)
+P: Ice and NSAIDs."""
+    note = parse_soap_note(text)
+    assert note.subjective == "Patient says her O: ring hurts and she made a\nPlan to rest."
+    assert note.objective == "Afebrile."
+    assert note.assessment == "Contusion (S60.0)"
+    assert note.plan == "Ice and NSAIDs."
+
+
+def test_parse_soap_note_headers_with_qualifiers():
+    """Test headers carrying a qualifier before the colon."""
+    text = """Subjective (per patient): Cough for a week.
+**Objective (vitals):** T 37.1
+Assessment: Viral URI
+Plan (discussed with patient):
+Fluids and rest."""
+    note = parse_soap_note(text)
+    assert note.subjective == "Cough for a week."
+    assert note.objective == "T 37.1"
+    assert note.assessment == "Viral URI"
+    assert note.plan == "Fluids and rest."
+
+
+def test_parse_soap_note_combined_assessment_and_plan():
+    """Test that "Assessment and Plan" and "A/P" fill both sections."""
+    for header in ("## Assessment and Plan", "**Assessment & Plan:**", "A/P:"):
+        note = parse_soap_note(f"S: Sore throat.\n{header}\nStrep pharyngitis (J02.0), amoxicillin.")
+        assert note.subjective == "Sore throat."
+        assert note.assessment == "Strep pharyngitis (J02.0), amoxicillin."
+        assert note.plan == note.assessment
+    assert parse_soap_note("S: Cough.\nSubjective and plan: none").subjective == "Cough.\nSubjective and plan: none"
+
+
+def test_note_from_structured_renders_raw_text():
+    """Test that structured output becomes a note with markdown raw text."""
+    from modules.ambient_doc.note_generator import note_from_structured
+    note = note_from_structured({
+        "subjective": "Headache x3 days.",
+        "objective": "BP 128/82",
+        "assessment": "Migraine",
+        "plan": "Sumatriptan 50mg PRN",
+        "icd10_codes": [{"code": "G43.909", "description": "Migraine, unspecified"}],
+    })
+    assert note.raw_text.startswith("## Subjective\nHeadache x3 days.")
+    assert parse_soap_note(note.raw_text).plan == "Sumatriptan 50mg PRN"
+    assert note.icd10_codes == [{
+        "code": "G43.909",
+        "description": "Migraine, unspecified, not intractable, without status migrainosus",
+        "source": "structured",
+    }]
+
+
+def test_note_from_structured_checks_codes_against_index():
+    """Test that structured ICD-10 codes get the same index check as extracted ones."""
+    from modules.ambient_doc.note_generator import note_from_structured
+    note = note_from_structured({
+        "subjective": "Headache.",
+        "objective": "Normal exam.",
+        "assessment": "Hypertension",
+        "plan": "Recheck BP",
+        "icd10_codes": [
+            {"code": "i10", "description": "HTN"},
+            {"code": "B12", "description": "vitamin"},
+            {"code": "not a code"},
+            {"code": "I10"},
+        ],
+    })
+    assert note.icd10_codes == [
+        {"code": "I10", "description": "Essential (primary) hypertension", "source": "structured"}
+    ]
+
+
+def test_note_from_structured_rejects_missing_sections():
+    """Test that incomplete structured output triggers the text fallback."""
+    from modules.ambient_doc.note_generator import note_from_structured
+    assert note_from_structured({"subjective": "x"}) is None
+
+
+@pytest.mark.asyncio
+async def test_generate_documentation_single_call(monkeypatch):
+    """Test that one structured call yields both the note and its codes."""
+    from modules.ambient_doc import note_generator
+
+    calls = []
+
+    async def fake_documentation(transcript, encounter_type="office_visit"):
+        calls.append(encounter_type)
+        return {
+            "subjective": "Cough for a week.",
+            "objective": "Lungs clear.",
+            "assessment": "Acute bronchitis",
+            "plan": "Supportive care.",
+            "icd10_codes": [{"code": "J20.9", "description": "Acute bronchitis", "confidence": "high"}],
+            "cpt_codes": [{"code": "99213", "description": "Office visit", "confidence": "medium"}],
+            "em_level": "99213",
+            "documentation_gaps": [],
+        }
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("fallback should not run")
+
+    monkeypatch.setattr(note_generator.settings, "STRUCTURED_SOAP_OUTPUT", True)
+    monkeypatch.setattr(note_generator.llm_client, "agenerate_documentation", fake_documentation)
+    monkeypatch.setattr(note_generator, "suggest_codes", fail)
+
+    note, codes = await note_generator.generate_documentation("transcript", "urgent_care")
+    assert calls == ["urgent_care"]
+    assert note.assessment == "Acute bronchitis"
+    assert [c.code for c in codes.icd10_codes] == ["J20.9"]
+    assert codes.cpt_codes[0].code == "99213"
+
+
+@pytest.mark.asyncio
+async def test_generate_documentation_falls_back_to_two_calls(monkeypatch):
+    """Test that incomplete structured output falls back to note then codes."""
+    from modules.ambient_doc import note_generator
+    from modules.shared.models import CodeSuggestionResponse
+
+    async def partial_documentation(transcript, encounter_type="office_visit"):
+        return {"subjective": "x"}
+
+    async def fake_note(transcript):
+        return parse_soap_note("S: a\nO: b\nA: c\nP: d")
+
+    async def fake_codes(note_text, encounter_type="office_visit"):
+        return CodeSuggestionResponse(em_level="99212")
+
+    monkeypatch.setattr(note_generator.settings, "STRUCTURED_SOAP_OUTPUT", True)
+    monkeypatch.setattr(note_generator.llm_client, "agenerate_documentation", partial_documentation)
+    monkeypatch.setattr(note_generator, "generate_note", fake_note)
+    monkeypatch.setattr(note_generator, "suggest_codes", fake_codes)
+
+    note, codes = await note_generator.generate_documentation("transcript")
+    assert note.plan == "d"
+    assert codes.em_level == "99212"
@@ -0,0 +1,56 @@
+"""Tests for audio pre-processing (silence trimming and decode cache)."""
+
+from modules.ambient_doc.preprocess import DecodedAudioCache, PreparedAudio, plan_keep
+
+
+def _voiced(pattern: str) -> list[bool]:
+    """One character per 0.1 s frame: '#' speech, '.' silence."""
+    return [c == "#" for c in pattern]
+
+
+def test_plan_keep_trims_edges_and_long_pauses():
+    """Test that edge silence is dropped and long pauses are shortened."""
+    voiced = _voiced("....##....." + "." * 40 + "###...")
+    keep = plan_keep(voiced, total_seconds=6.0, max_pause=2.0, keep_pause=0.5, frame_seconds=0.1, pad=0.1)
+    assert [(round(a, 2), round(b, 2)) for a, b in keep] == [(0.3, 1.2), (5.0, 5.5)]
+
+
+def test_plan_keep_keeps_short_pauses_whole():
+    """Test that pauses under the limit stay in one region."""
+    voiced = _voiced("##.....##")
+    keep = plan_keep(voiced, total_seconds=0.9, max_pause=2.0, keep_pause=0.5, frame_seconds=0.1, pad=0.0)
+    assert keep == [(0.0, 0.9)]
+
+
+def test_plan_keep_without_speech_keeps_everything():
+    """Test that a recording with no detected speech is not discarded."""
+    assert plan_keep(_voiced("......"), 0.6, 2.0, 0.5, frame_seconds=0.1) == [(0.0, 0.6)]
+
+
+def test_prepared_audio_maps_timestamps_both_ways():
+    """Test that trimmed-audio times map back to the original recording."""
+    prepared = PreparedAudio([], 10.0, [(0.0, 1.0, 2.0), (2.0, 6.0, 3.0)])
+    assert prepared.to_original(0.5) == 1.5
+    assert prepared.to_original(2.5) == 6.5
+    assert prepared.to_processed(6.5) == 2.5
+    assert prepared.to_processed(4.0) == 2.0  # inside a removed pause
+    restored = prepared.restore([{"start": 1.0, "end": 3.0, "text": "hi"}])
+    assert restored == [{"start": 2.0, "end": 7.0, "text": "hi"}]
+
+
+class _Audio:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+
+def test_decoded_audio_cache_bounded_by_bytes():
+    """Test that the decode cache evicts least recently used buffers by size."""
+    cache = DecodedAudioCache(max_bytes=100)
+    cache.set("a", PreparedAudio(_Audio(60), 1.0, []))
+    cache.set("b", PreparedAudio(_Audio(30), 1.0, []))
+    cache.get("a")
+    cache.set("c", PreparedAudio(_Audio(30), 1.0, []))
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    cache.set("huge", PreparedAudio(_Audio(500), 1.0, []))
+    assert "huge" not in cache
@@ -0,0 +1,138 @@
+"""Tests for the LLM response cache."""
+
+import asyncio
+
+import pytest
+
+from modules.shared import llm_base
+from modules.shared.llm_base import BaseLLMClient
+from modules.shared import response_cache
+from modules.shared.response_cache import ResponseCache
+
+
+class FakeClock:
+    """Manually advanced wall clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingClient(BaseLLMClient):
+    """Client that counts provider calls."""
+
+    provider = "test"
+    model = "test-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def _acall(self, system, messages, max_tokens=None, temperature=0.3, system_context=""):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return '{"esi_level": 4}'
+
+    def _call(self, *args, **kwargs):
+        raise AssertionError("unexpected sync call")
+
+    async def _astream(self, *args, **kwargs):
+        raise AssertionError("unexpected stream")
+        yield
+
+    async def _acall_structured(self, *args, **kwargs):
+        raise AssertionError("unexpected structured call")
+
+
+def test_key_depends_on_every_part():
+    """Test that changing any request part changes the key."""
+    base = dict(provider="claude", model="m", system="s", messages=[{"role": "user", "content": "x"}], temperature=0.2)
+    key = ResponseCache.make_key(**base)
+    assert key == ResponseCache.make_key(**dict(base))
+    for field, value in (("model", "m2"), ("system", "s2"), ("temperature", 0.3)):
+        assert ResponseCache.make_key(**{**base, field: value}) != key
+
+
+def test_entries_expire_and_evict():
+    """Test TTL expiry and LRU eviction."""
+    clock = FakeClock()
+    cache = ResponseCache(max_entries=2, ttl_seconds=60, clock=clock)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+    clock.now += 61
+    assert cache.get("a") is None
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    """Test that the SQLite tier is shared across cache instances."""
+    path = str(tmp_path / "llm_cache.db")
+    ResponseCache(disk_path=path).set("k", "cached text")
+    assert ResponseCache(disk_path=path).get("k") == "cached text"
+
+
+@pytest.mark.asyncio
+async def test_async_disk_writes_prune_expired_rows_on_interval(tmp_path):
+    """Test that expired disk rows are pruned once per interval, not on every write."""
+    clock = FakeClock()
+    path = str(tmp_path / "llm_cache.db")
+    cache = ResponseCache(ttl_seconds=60, disk_path=path, clock=clock)
+    await cache.aset("old", "1")
+
+    clock.now += 61
+    await cache.aset("new", "2")
+    assert cache._disk.execute("SELECT COUNT(*) FROM llm_response_cache").fetchone()[0] == 2
+
+    clock.now += response_cache.PRUNE_INTERVAL_SECONDS
+    await cache.aset("newer", "3")
+    rows = cache._disk.execute("SELECT key FROM llm_response_cache ORDER BY key").fetchall()
+    assert [row[0] for row in rows] == ["newer"]
+    assert await ResponseCache(disk_path=path, clock=clock).aget("newer") == "3"
+
+
+@pytest.mark.asyncio
+async def test_deterministic_calls_are_cached_and_chat_is_not(monkeypatch):
+    """Test that triage is served from cache while chat always hits the provider."""
+    monkeypatch.setattr(llm_base, "response_cache", ResponseCache())
+    client = CountingClient()
+
+    await client.atriage("mild rash")
+    await client.atriage("mild rash")
+    assert client.calls == 1
+
+    await client.achat("hello", [])
+    await client.achat("hello", [])
+    assert client.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_share_one_call(monkeypatch):
+    """Test that identical in-flight requests are coalesced."""
+    monkeypatch.setattr(llm_base, "response_cache", ResponseCache())
+    client = CountingClient()
+
+    results = await asyncio.gather(*(client.asuggest_codes("Note text") for _ in range(5)))
+    assert client.calls == 1
+    assert len(set(results)) == 1
+
+
+@pytest.mark.asyncio
+async def test_waiters_retry_when_the_first_caller_is_cancelled(monkeypatch):
+    """Test that cancelling the caller making a shared call does not cancel its waiters."""
+    monkeypatch.setattr(llm_base, "response_cache", ResponseCache())
+    client = CountingClient()
+
+    first = asyncio.create_task(client.asuggest_codes("Note text"))
+    await asyncio.sleep(0.002)
+    second = asyncio.create_task(client.asuggest_codes("Note text"))
+    await asyncio.sleep(0.002)
+    first.cancel()
+
+    assert await second == '{"esi_level": 4}'
+    assert first.cancelled()
+    assert client.calls == 2
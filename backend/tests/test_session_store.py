@@ -0,0 +1,84 @@
+"""Tests for the conversation session stores."""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import db as database
+from database.db import Base
+from database.schemas import ChatSession, ChatMessageRecord
+from modules.shared.session_store import DatabaseSessionStore, MemorySessionStore, history_from_records
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_memory_store_returns_same_object():
+    """Test that stored state is returned by reference for in-place updates."""
+    store = MemorySessionStore()
+    history = []
+    store.put("s1", history)
+    store.get("s1").append({"role": "user", "content": "hi"})
+    assert history == [{"role": "user", "content": "hi"}]
+    assert "s1" in store
+
+
+def test_memory_store_evicts_least_recently_used():
+    """Test that the store stays bounded and evicts the coldest session."""
+    store = MemorySessionStore(max_entries=2)
+    store.put("a", [])
+    store.put("b", [])
+    store.get("a")  # a is now more recent than b
+    store.put("c", [])
+
+    assert len(store) == 2
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.get("c") is not None
+
+
+def test_memory_store_expires_idle_sessions():
+    """Test that sessions idle past the TTL expire, and access extends it."""
+    clock = FakeClock()
+    store = MemorySessionStore(ttl_seconds=60, clock=clock)
+    store.put("active", [])
+    store.put("idle", [])
+
+    clock.now = 50
+    assert store.get("active") is not None
+    clock.now = 100
+    assert store.get("idle") is None
+    assert store.get("active") is not None
+
+
+def test_memory_store_delete():
+    """Test deleting a session."""
+    store = MemorySessionStore()
+    store.put("s1", {})
+    assert store.delete("s1") is True
+    assert store.delete("s1") is False
+
+
+@pytest.mark.asyncio
+async def test_database_store_async_access(tmp_path, monkeypatch):
+    """Test that the database store rehydrates and closes sessions through its async methods."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'sessions.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(database, "SessionLocal", factory)
+    with factory() as db:
+        db.add(ChatSession(id="s1", session_type="general", status="active"))
+        db.add(ChatMessageRecord(session_id="s1", role="user", content="hi"))
+        db.commit()
+
+    store = DatabaseSessionStore(lambda record, messages: history_from_records(messages))
+    assert await store.aget("s1") == [{"role": "user", "content": "hi"}]
+    assert await store.adelete("s1") is True
+    assert await store.aget("s1") is None
@@ -0,0 +1,170 @@
+"""Tests for incremental (sliding-window) transcription."""
+
+import asyncio
+
+import pytest
+from fastapi.websockets import WebSocketState
+
+from modules.ambient_doc.streaming import StreamingTranscriber, BYTES_PER_SECOND
+
+
+def _silence(seconds: float) -> bytes:
+    return b"\x00\x00" * int(seconds * BYTES_PER_SECOND / 2)
+
+
+class ScriptedSegments:
+    """Segment function returning canned segments per decode call."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def __call__(self, pcm, language, prompt):
+        self.calls.append((len(pcm) / BYTES_PER_SECOND, prompt))
+        return self.responses.pop(0)
+
+
+def test_segment_followed_by_silence_is_final():
+    """Test that a closed segment is finalized and cut from the buffer."""
+    segments = ScriptedSegments(
+        [{"start": 0.2, "end": 1.5, "text": "Any chest pain?"}, {"start": 2.4, "end": 3.0, "text": "No"}],
+        [{"start": 0.4, "end": 1.0, "text": "No, none."}],
+    )
+    stream = StreamingTranscriber(segment_fn=segments)
+    stream.feed(_silence(3.0))
+
+    events = stream.process()
+    assert events == [
+        {"type": "final", "start": 0.2, "end": 1.5, "text": "Any chest pain?"},
+        {"type": "partial", "start": 2.4, "end": 3.0, "text": "No"},
+    ]
+
+    stream.feed(_silence(1.0))
+    events = stream.process(flush=True)
+    assert segments.calls[1] == (2.5, "Any chest pain?")  # buffer restarts at 1.5s
+    assert events == [{"type": "final", "start": 1.9, "end": 2.5, "text": "No, none."}]
+    assert stream.result()["transcript"] == "Any chest pain? No, none."
+    assert stream.result()["duration_seconds"] == 4.0
+
+
+def test_silence_is_dropped_from_buffer():
+    """Test that audio with no speech does not grow the window."""
+    segments = ScriptedSegments([], [])
+    stream = StreamingTranscriber(segment_fn=segments)
+    stream.feed(_silence(5.0))
+    assert stream.process() == []
+
+    stream.feed(_silence(1.0))
+    stream.process()
+    assert segments.calls[1][0] == 1.5  # kept only the trailing silence margin
+
+
+def test_full_window_forces_finalization(monkeypatch):
+    """Test that continuous speech is committed once the window is full."""
+    from config import settings
+    monkeypatch.setattr(settings, "STREAM_WINDOW_SECONDS", 4.0)
+    segments = ScriptedSegments([
+        {"start": 0.0, "end": 2.0, "text": "first"},
+        {"start": 2.0, "end": 4.0, "text": "second"},
+    ])
+    stream = StreamingTranscriber(segment_fn=segments)
+    stream.feed(_silence(4.0))
+
+    events = stream.process()
+    assert [e["type"] for e in events] == ["final", "partial"]
+    assert events[0]["text"] == "first"
+
+
+def test_ready_waits_for_a_step_of_audio(monkeypatch):
+    """Test that decoding is only triggered after STREAM_STEP_SECONDS of new audio."""
+    from config import settings
+    monkeypatch.setattr(settings, "STREAM_STEP_SECONDS", 1.0)
+    stream = StreamingTranscriber(segment_fn=ScriptedSegments([]))
+    stream.feed(_silence(0.5))
+    assert not stream.ready()
+    stream.feed(_silence(0.5))
+    assert stream.ready()
+
+
+class FailingSession:
+    """Streaming session whose every decode fails."""
+
+    received_bytes = 0
+
+    def feed(self, pcm):
+        self.received_bytes += len(pcm)
+
+    def ready(self):
+        return True
+
+    def process(self, flush=False):
+        raise RuntimeError("decoder crashed")
+
+
+class InlineEngine:
+    """Inference pool stand-in that runs decodes inline."""
+
+    def has_capacity(self):
+        return True
+
+    async def run(self, fn, *args, wait=False):
+        return fn(*args)
+
+
+class FakeWebSocket:
+    """Replays client frames, then waits forever; a second close raises like Starlette."""
+
+    def __init__(self, *messages):
+        self.messages = list(messages)
+        self.sent = []
+        self.close_codes = []
+        self.application_state = WebSocketState.CONNECTED
+
+    async def accept(self):
+        pass
+
+    async def receive(self):
+        if self.messages:
+            return self.messages.pop(0)
+        await asyncio.Event().wait()
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        if self.application_state != WebSocketState.CONNECTED:
+            raise RuntimeError('Cannot call "send" once a close message has been sent.')
+        self.application_state = WebSocketState.DISCONNECTED
+        self.close_codes.append(code)
+
+
+def _failing_stream(monkeypatch):
+    from modules.ambient_doc import router
+    monkeypatch.setattr(router, "decode_token", lambda token: {"role": "clinician", "hospital_id": "h1"})
+    monkeypatch.setattr(router, "engine", InlineEngine())
+    monkeypatch.setattr(router, "StreamingTranscriber", lambda **kwargs: FailingSession())
+    return router.transcribe_stream
+
+
+@pytest.mark.asyncio
+async def test_stop_after_failed_decode_does_not_close_twice(monkeypatch):
+    """Test that stop leaves the worker's error close in place instead of raising."""
+    transcribe_stream = _failing_stream(monkeypatch)
+    websocket = FakeWebSocket({"type": "websocket.receive", "text": '{"type": "stop"}'})
+
+    await asyncio.wait_for(transcribe_stream(websocket, token="t"), timeout=5)
+
+    assert websocket.sent[-1]["type"] == "error"
+    assert websocket.close_codes == [1011]
+
+
+@pytest.mark.asyncio
+async def test_failed_decode_ends_the_receive_loop(monkeypatch):
+    """Test that the endpoint returns when the worker fails while the client is silent."""
+    transcribe_stream = _failing_stream(monkeypatch)
+    websocket = FakeWebSocket({"type": "websocket.receive", "bytes": _silence(0.5)})
+
+    await asyncio.wait_for(transcribe_stream(websocket, token="t"), timeout=5)
+
+    assert websocket.sent[-1]["type"] == "error"
+    assert websocket.close_codes == [1011]
@@ -24,3 +24,109 @@ def test_transcription_result_structure():
     assert "language" in result
     assert "duration_seconds" in result
     assert "segments" in result
+
+
+def test_plan_chunks_cuts_in_silence():
+    """Test that chunk boundaries fall midway through silence gaps."""
+    from modules.ambient_doc.transcriber import plan_chunks
+    speech = [
+        {"start": 0, "end": 40},
+        {"start": 60, "end": 90},
+        {"start": 110, "end": 150},
+        {"start": 170, "end": 190},
+    ]
+    assert plan_chunks(speech, 200, target_samples=100) == [(0, 100), (100, 200)]
+    assert plan_chunks(speech, 200, target_samples=50) == [(0, 50), (50, 100), (100, 160), (160, 200)]
+
+
+def test_plan_chunks_without_speech():
+    """Test that silent recordings produce no chunks."""
+    from modules.ambient_doc.transcriber import plan_chunks
+    assert plan_chunks([], 16000, target_samples=8000) == []
+
+
+def test_stitch_chunks_matches_transcribe_shape():
+    """Test that stitched chunk output has the transcribe_audio structure."""
+    from modules.ambient_doc.transcriber import stitch_chunks
+    result = stitch_chunks(
+        [
+            [{"start": 0.5, "end": 2.0, "text": "Hello doctor."}],
+            [{"start": 121.0, "end": 123.5, "text": "Take a seat."}],
+        ],
+        duration=180.0,
+        language="en",
+    )
+    assert result["transcript"] == "Hello doctor. Take a seat."
+    assert result["duration_seconds"] == 180.0
+    assert [s["start"] for s in result["segments"]] == [0.5, 121.0]
+
+
+def test_model_cache_evicts_least_recently_used():
+    """Test that resident models stay within the memory budget."""
+    from modules.ambient_doc.transcriber import ModelCache
+    loaded = []
+    cache = ModelCache(budget_mb=700, loader=lambda size: loaded.append(size) or size)
+
+    cache.get("small")   # 500 MB
+    cache.get("base")    # 150 MB
+    cache.get("small")   # small is now most recent
+    cache.get("tiny")    # 75 MB -> 725 MB, evicts base
+
+    assert "base" not in cache
+    assert "small" in cache and "tiny" in cache
+    assert loaded == ["small", "base", "tiny"]
+
+
+def test_model_cache_keeps_oversized_model():
+    """Test that a model larger than the budget still loads on its own."""
+    from modules.ambient_doc.transcriber import ModelCache
+    cache = ModelCache(budget_mb=100, loader=lambda size: size)
+    cache.get("tiny")
+    assert cache.get("large-v3") == "large-v3"
+    assert "tiny" not in cache
+
+
+def test_model_cache_serves_resident_models_during_a_load():
+    """Test that a slow load blocks neither resident lookups nor loads it twice."""
+    import threading
+    from modules.ambient_doc.transcriber import ModelCache
+    release = threading.Event()
+    loaded = []
+
+    def loader(size):
+        loaded.append(size)
+        if size == "medium":
+            release.wait(timeout=5)
+        return size
+
+    cache = ModelCache(budget_mb=5000, loader=loader)
+    cache.get("tiny")
+    loaders = [threading.Thread(target=cache.get, args=("medium",)) for _ in range(2)]
+    for thread in loaders:
+        thread.start()
+
+    lookup = threading.Thread(target=cache.get, args=("tiny",))
+    lookup.start()
+    lookup.join(timeout=1)
+    assert not lookup.is_alive()
+    assert not release.is_set()
+
+    release.set()
+    for thread in loaders:
+        thread.join(timeout=5)
+    assert "medium" in cache
+    assert loaded == ["tiny", "medium"]
+
+
+def test_resolve_profile_precedence(monkeypatch):
+    """Test request profile beats hospital mapping, which beats the default."""
+    from config import settings
+    from modules.ambient_doc.transcriber import resolve_profile
+    monkeypatch.setattr(settings, "TRANSCRIPTION_HOSPITAL_PROFILES", {"h1": "fast"})
+    monkeypatch.setattr(settings, "TRANSCRIPTION_DEFAULT_PROFILE", "balanced")
+
+    assert resolve_profile("accurate", "h1") == "accurate"
+    assert resolve_profile(None, "h1") == "fast"
+    assert resolve_profile(None, "h2") == "balanced"
+    with pytest.raises(ValueError):
+        resolve_profile("ultra", None)
@@ -0,0 +1,47 @@
+"""Tests for the chunked upload helper."""
+
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from modules.shared import uploads
+from modules.shared.uploads import save_upload
+
+
+@pytest.mark.asyncio
+async def test_save_upload_copies_file(tmp_path):
+    """Test that the upload lands on disk intact with its extension kept."""
+    data = b"x" * (3 * uploads.CHUNK_SIZE + 17)
+    upload = UploadFile(io.BytesIO(data), filename="visit.mp3")
+
+    path = await save_upload(upload, tmp_path, max_bytes=len(data))
+
+    assert path.parent == tmp_path
+    assert path.suffix == ".mp3"
+    assert path.read_bytes() == data
+
+
+@pytest.mark.asyncio
+async def test_save_upload_aborts_over_limit(tmp_path, monkeypatch):
+    """Test that an oversized upload is rejected mid-copy and cleaned up."""
+    monkeypatch.setattr(uploads, "CHUNK_SIZE", 4)
+    upload = UploadFile(io.BytesIO(b"0123456789"), filename="big.wav")
+
+    with pytest.raises(HTTPException) as exc:
+        await save_upload(upload, tmp_path, max_bytes=6)
+
+    assert exc.value.status_code == 413
+    assert upload.file.tell() == 8  # stopped at the first chunk over the limit
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_save_upload_rejects_declared_size(tmp_path):
+    """Test that a known upload size over the limit is rejected before copying."""
+    upload = UploadFile(io.BytesIO(b"0123456789"), filename="big.wav", size=10)
+
+    with pytest.raises(HTTPException):
+        await save_upload(upload, tmp_path, max_bytes=6)
+
+    assert upload.file.tell() == 0
@@ -0,0 +1,95 @@
+"""Tests for diff-based note versioning."""
+
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database.db import Base
+from database.schemas import Encounter, ClinicalNote, NoteRevision
+from modules.ambient_doc.router import update_note
+from modules.ambient_doc.versioning import reverse_diff, apply_diff, reconstruct
+from modules.shared.models import NoteUpdateRequest
+
+SUPER_ADMIN = {"sub": "dr-a", "role": "super_admin"}
+
+
+NOTE_V1 = "## Subjective\nHeadache x3 days.\n\n## Plan\nIbuprofen 400mg PRN.\nFollow up in 2 weeks."
+NOTE_V2 = "## Subjective\nHeadache x3 days, worse in the morning.\n\n## Plan\nIbuprofen 400mg PRN.\nFollow up in 2 weeks."
+NOTE_V3 = "## Subjective\nHeadache x3 days, worse in the morning.\n\n## Plan\nIbuprofen 400mg PRN.\nFollow up in 1 week.\n"
+
+
+def test_reverse_diff_round_trip():
+    """Test that applying the reverse diff restores the previous text exactly."""
+    diff = reverse_diff(NOTE_V2, NOTE_V1)
+    assert apply_diff(NOTE_V2, diff) == NOTE_V1
+    assert apply_diff("", reverse_diff("", "old text")) == "old text"
+    assert apply_diff("new text", reverse_diff("new text", "")) == ""
+
+
+def test_reverse_diff_stores_only_changed_lines():
+    """Test that unchanged lines are not stored in the diff."""
+    diff = reverse_diff(NOTE_V2, NOTE_V1)
+    assert diff == [[1, 2, ["Headache x3 days.\n"]]]
+
+
+def test_reconstruct_walks_back_from_latest():
+    """Test reconstructing each earlier version from the latest text."""
+    revisions = [
+        SimpleNamespace(version=2, diff=reverse_diff(NOTE_V3, NOTE_V2)),
+        SimpleNamespace(version=1, diff=reverse_diff(NOTE_V2, NOTE_V1)),
+    ]
+    assert reconstruct(NOTE_V3, revisions, 2) == NOTE_V2
+    assert reconstruct(NOTE_V3, revisions, 1) == NOTE_V1
+
+
+async def _note_factory(tmp_path):
+    path = tmp_path / "notes.db"
+    Base.metadata.create_all(bind=create_engine(f"sqlite:///{path}"))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    factory = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+    async with factory() as db:
+        db.add(Encounter(id="e1", patient_id="p1", transcript="t"))
+        db.add(ClinicalNote(id="n1", encounter_id="e1", version=1, raw_text=NOTE_V1))
+        await db.commit()
+    return engine, factory
+
+
+@pytest.mark.asyncio
+async def test_update_note_stores_revision_and_bumps_version(tmp_path):
+    """Test that a text edit keeps the old version as a revision and returns the new version."""
+    engine, factory = await _note_factory(tmp_path)
+    async with factory() as db:
+        result = await update_note("n1", NoteUpdateRequest(note_text=NOTE_V2, version=1), SUPER_ADMIN, db)
+    assert result["version"] == 2
+
+    async with factory() as db:
+        note = await db.get(ClinicalNote, "n1")
+        revisions = (await db.scalars(select(NoteRevision))).all()
+        assert (note.version, note.raw_text, note.provider_edited) == (2, NOTE_V2, True)
+        assert [(r.version, r.edited_by) for r in revisions] == [(1, "dr-a")]
+        assert reconstruct(note.raw_text, revisions, 1) == NOTE_V1
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_note_edits_conflict(tmp_path):
+    """Test that the second of two edits made on the same version gets a 409."""
+    engine, factory = await _note_factory(tmp_path)
+    async with factory() as first, factory() as second:
+        stale = await second.get(ClinicalNote, "n1")
+        await update_note("n1", NoteUpdateRequest(note_text=NOTE_V2), SUPER_ADMIN, first)
+        assert stale.version == 1
+        with pytest.raises(HTTPException) as exc:
+            await update_note("n1", NoteUpdateRequest(note_text=NOTE_V3), SUPER_ADMIN, second)
+        assert exc.value.status_code == 409
+
+    async with factory() as db:
+        with pytest.raises(HTTPException) as exc:
+            await update_note("n1", NoteUpdateRequest(note_text=NOTE_V3, version=1), SUPER_ADMIN, db)
+        assert exc.value.status_code == 409
+        note = await db.get(ClinicalNote, "n1")
+        assert (note.version, note.raw_text) == (2, NOTE_V2)
+    await engine.dispose()
@@ -49,12 +49,21 @@ export default function NoteReview() {
 
   const handleSave = async (noteText) => {
     if (!selectedEncounter?.notes?.[0]) return
+    const [note, ...olderNotes] = selectedEncounter.notes
     try {
-      await updateNote(selectedEncounter.notes[0].id, noteText, 'reviewed')
+      const saved = await updateNote(note.id, noteText, 'reviewed', note.version)
+      setSelectedEncounter({
+        ...selectedEncounter,
+        notes: [{ ...note, raw_text: noteText, version: saved.version, status: saved.status }, ...olderNotes],
+      })
       setMessage('Note saved successfully')
       setTimeout(() => setMessage(null), 3000)
     } catch (e) {
-      setMessage('Failed to save note')
+      setMessage(
+        e.response?.status === 409
+          ? 'This note was changed by someone else. Reload it before saving.'
+          : 'Failed to save note'
+      )
     }
   }
 
@@ -70,10 +70,11 @@ export async function getEncounter(encounterId) {
   return res.data
 }
 
-export async function updateNote(noteId, noteText, status = 'reviewed') {
+export async function updateNote(noteId, noteText, status = 'reviewed', version = null) {
   const res = await api.put(`/ambient/notes/${noteId}`, {
     note_text: noteText,
     status,
+    version,
   })
   return res.data
 }